@@ -13,9 +13,12 @@
 # limitations under the License.
 
 
+from .arena import BlobArena
+from .blobs import BlobCache
 from .commits import CommitCache
 from .gitignore import CachedIgnore
 from .lru import LRUCache
+from .trees import TreeResolver
 
 
 lru_cache = LRUCache(0)
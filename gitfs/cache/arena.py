@@ -0,0 +1,194 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from gitfs.log import log
+from gitfs.metrics import metrics
+
+
+MAGIC = b"GITFSBA1"
+# magic, number of index slots, size of the data region, write position
+HEADER = struct.Struct("<8sQQQ")
+HEADER_SIZE = 64
+# blob id, position of its data, its length
+SLOT = struct.Struct("<20sQQ")
+EMPTY_ID = bytes(20)
+# the slots a blob id may be kept in
+PROBES = 4
+# the average blob size the index is sized for
+AVERAGE_BLOB_SIZE = 4096
+
+
+class BlobArena:
+    """
+    A blob cache shared by all the gitfs processes of a host, kept in a
+    memory-mapped file (best placed on a tmpfs, e.g.: `/dev/shm`), so that
+    the blobs of hot history are inflated and held once per host, instead of
+    once per mount.
+
+    The file holds an index, which hashes blob ids into a fixed number of
+    slots, and a data region written as a ring: new blobs overwrite the
+    oldest ones. Writers hold a lock on the file. Readers don't lock at all:
+    they check that the data they copied still hashes to the blob's id, and
+    take it as a miss otherwise. It also means nothing another process wrote
+    in the arena is trusted blindly.
+    """
+
+    def __init__(self, path, size):
+        """
+        :param str path: the file holding the arena, made if missing
+        :param int size: its size in bytes, if it's made now
+        """
+
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self.locked():
+            self.prepare(size)
+        self.map = mmap.mmap(self.fd, 0)
+
+        self.data_offset = HEADER_SIZE + self.slots * SLOT.size
+
+    def prepare(self, size):
+        """
+        Reads the geometry of the arena, setting it up first if the file is
+        new (or not an arena).
+        """
+
+        magic, slots, data_size, _ = HEADER.unpack(
+            os.pread(self.fd, HEADER.size, 0).ljust(HEADER.size, b"\0")
+        )
+        if magic != MAGIC:
+            slots = max(size // AVERAGE_BLOB_SIZE, PROBES)
+            data_size = size - HEADER_SIZE - slots * SLOT.size
+            if data_size <= 0:
+                raise ValueError(f"A blob arena of {size} bytes is too small")
+
+            log.info("BlobArena: Set up %s, %d bytes", self.path, size)
+            # start from zeroes, so every slot is empty
+            os.ftruncate(self.fd, 0)
+            os.ftruncate(self.fd, size)
+            os.pwrite(self.fd, HEADER.pack(MAGIC, slots, data_size, 0), 0)
+
+        self.slots = slots
+        self.data_size = data_size
+
+    @contextmanager
+    def locked(self):
+        # flock() doesn't keep apart the threads sharing a descriptor
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def head(self):
+        return HEADER.unpack_from(self.map)[3]
+
+    def slot_offsets(self, blob_id):
+        first = int.from_bytes(blob_id[:8], "little") % self.slots
+        return [
+            HEADER_SIZE + (first + probe) % self.slots * SLOT.size
+            for probe in range(PROBES)
+        ]
+
+    def get(self, oid):
+        """
+        Returns the data of blob `oid`, or None if it's not in the arena.
+        """
+
+        blob_id = oid.raw
+        for offset in self.slot_offsets(blob_id):
+            slot_id, position, length = SLOT.unpack_from(self.map, offset)
+            if slot_id != blob_id:
+                continue
+
+            # overwritten since
+            if self.head() - position > self.data_size:
+                break
+
+            start = self.data_offset + position % self.data_size
+            data = self.map[start : start + length]
+            if blob_hash(data) != blob_id:
+                break
+
+            metrics.increment("blob_arena_hits")
+            return data
+
+        metrics.increment("blob_arena_misses")
+        return None
+
+    def put(self, oid, data):
+        """
+        Adds blob `oid` to the arena. Blobs bigger than a quarter of the
+        arena are left out, since they'd push out too many others.
+        """
+
+        blob_id = oid.raw
+        length = len(data)
+        if len(blob_id) != len(EMPTY_ID) or length > self.data_size // 4:
+            return
+
+        with self.locked():
+            position = self.head()
+            offset = position % self.data_size
+            if offset + length > self.data_size:
+                # blobs don't wrap around, the next one starts over
+                position += self.data_size - offset
+                offset = 0
+
+            # readers learn about the overwritten blobs before they're gone
+            HEADER.pack_into(
+                self.map, 0, MAGIC, self.slots, self.data_size, position + length
+            )
+            start = self.data_offset + offset
+            self.map[start : start + length] = data
+
+            SLOT.pack_into(self.map, self.pick_slot(blob_id), blob_id, position, length)
+
+    def pick_slot(self, blob_id):
+        """
+        The slot to keep `blob_id` in: the one already keeping it, an empty
+        one or the one keeping the oldest blob.
+        """
+
+        oldest = None
+        for offset in self.slot_offsets(blob_id):
+            slot_id, position, _ = SLOT.unpack_from(self.map, offset)
+            if slot_id in (blob_id, EMPTY_ID):
+                return offset
+            if oldest is None or position < oldest[0]:
+                oldest = (position, offset)
+
+        return oldest[1]
+
+
+def blob_hash(data):
+    """
+    The id git gives to a blob holding `data`.
+    """
+
+    digest = hashlib.sha1(f"blob {len(data)}\0".encode())
+    digest.update(data)
+    return digest.digest()
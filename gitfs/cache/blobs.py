@@ -0,0 +1,77 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from contextlib import nullcontext
+from copy import copy
+
+from gitfs.metrics import metrics
+
+from .lru import LRUCache
+
+
+class BlobCache:
+    """
+    Keeps the content of the blobs read lately, up to `max_size` bytes.
+
+    Blobs never change, so they're cached by id for as long as there's room,
+    sparing the object database (and zlib) the reads which follow each other
+    on the same file. Blobs bigger than the whole cache are read each time.
+
+    The blobs which aren't cached are looked up in the host-wide `arena`
+    (a `BlobArena`), if there's one, before they're read from the object
+    database. Reads from the object database take a slot of `admission`
+    (a semaphore), if given, so that only a few of them run at once.
+    """
+
+    def __init__(self, repo, max_size, arena=None, admission=None):
+        self.repo = repo
+        self.arena = arena
+        self.admission = admission
+        self.cache = LRUCache(max_size, getsizeof=len)
+        self.lock = threading.Lock()
+
+    def for_repository(self, repo, admission=None):
+        """
+        A cache reading from `repo`, which shares the room (and the blobs,
+        since equal ids mean equal content) of this one.
+        """
+
+        blobs = copy(self)
+        blobs.repo = repo
+        blobs.admission = admission
+        return blobs
+
+    def __getitem__(self, oid):
+        with self.lock:
+            data = self.cache.get_if_exists(oid)
+
+        if data is not None:
+            metrics.increment("blob_cache_hits")
+            return data
+
+        metrics.increment("blob_cache_misses")
+        data = self.arena.get(oid) if self.arena is not None else None
+        if data is None:
+            with self.admission or nullcontext():
+                data = self.repo[oid].data
+            if self.arena is not None:
+                self.arena.put(oid, data)
+
+        if len(data) <= self.cache.maxsize:
+            with self.lock:
+                self.cache[oid] = data
+
+        return data
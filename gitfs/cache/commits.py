@@ -13,35 +13,120 @@
 # limitations under the License.
 
 
-from bisect import insort_left
+import threading
+from bisect import bisect_right, insort_left
 from datetime import datetime
+from operator import itemgetter
 
 from pygit2 import GIT_SORT_TIME
 
+from gitfs.metrics import metrics
+
+
+# how many commits the first walk indexes between the days it shows
+INDEX_BATCH = 1000
+
 
 class CommitCache:
     def __init__(self, repo):
         self.repo = repo
         self.__commits = {}
+        # the commit times, in ascending order, and the ids of their commits
+        self.__timeline = ([], [])
+
+        # In a shallow clone, only the commits which were fetched are indexed.
+        # The history may go further back than the oldest of them.
+        self.shallow = False
+        self.oldest = None
+
+        # set once the whole history was indexed
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+        # the number of the last walk started, and of the one which is served
+        self.__walks = 0
+        self.__published = 0
 
     def update(self):
+        # Walks may overlap (e.g.: a sync's, while the history is first
+        # indexed), so they're numbered and an older index can't replace a
+        # newer one. The walk itself is done off to the side, without the
+        # lock, and only its result is swapped in.
+        with self.lock:
+            self.__walks += 1
+            walk = self.__walks
+            head = self.repo.lookup_reference("HEAD").resolve().target
+
         new_commits = {}
-        head = self.repo.lookup_reference("HEAD").resolve().target
+        indexed = {}
+        changed_dates = set()
+        timeline = []
 
         for commit in self.repo.walk(head, GIT_SORT_TIME):
+            timeline.append((commit.commit_time, commit.id))
+
             commit_time = datetime.fromtimestamp(commit.commit_time)
 
             date = commit_time.date().strftime("%Y-%m-%d")
             time = commit_time.time().strftime("%H-%M-%S")
 
-            if date not in new_commits:
-                new_commits[date] = []
+            entry = Commit(commit.commit_time, time, str(commit.id)[:10])
 
-            insort_left(
-                new_commits[date], Commit(commit.commit_time, time, str(commit.id)[:10])
+            if date not in new_commits:
+                new_commits[date] = [entry]
+            else:
+                insort_left(new_commits[date], entry)
+            changed_dates.add(date)
+
+            # The first time, days show up as they're indexed, newest first.
+            # Readers get copies, which the walk doesn't change afterwards.
+            if len(timeline) % INDEX_BATCH == 0 and not self.ready.is_set():
+                indexed = dict(indexed)
+                for changed_date in changed_dates:
+                    indexed[changed_date] = list(new_commits[changed_date])
+                changed_dates.clear()
+
+                with self.lock:
+                    if walk >= self.__published and not self.ready.is_set():
+                        self.__published = walk
+                        self.__commits = indexed
+
+        # The walk goes from the newest commits to the oldest, so the
+        # children of commits made within the same second end up last.
+        timeline.reverse()
+        timeline.sort(key=itemgetter(0))
+
+        oldest = None
+        if new_commits:
+            oldest = datetime.strptime(min(new_commits), "%Y-%m-%d").date()
+
+        with self.lock:
+            if walk < self.__published:
+                return
+
+            self.__published = walk
+            self.__commits = new_commits
+            self.__timeline = (
+                [commit_time for commit_time, _ in timeline],
+                [commit_id for _, commit_id in timeline],
             )
-
-        self.__commits = new_commits
+            self.shallow = self.repo.is_shallow is True
+            self.oldest = oldest
+
+            metrics.set("history_commits", len(timeline))
+            self.ready.set()
+
+    def at(self, timestamp):
+        """
+        The id of the newest commit made at or before `timestamp`, or None if
+        all of them were made later.
+        """
+
+        timestamps, ids = self.__timeline
+        index = bisect_right(timestamps, timestamp)
+        if not index:
+            return None
+        return ids[index - 1]
 
     def __getitem__(self, item):
         return self.__commits[item]
@@ -0,0 +1,65 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+from .lru import LRUCache
+
+
+class TreeResolver:
+    """
+    Resolves paths to the objects of a tree.
+
+    Trees never change, so the objects are cached by the id of the root tree
+    and the path, and a path is resolved starting from its closest parent
+    which was resolved before.
+    """
+
+    def __init__(self, repo, max_entries=10000):
+        self.repo = repo
+        self.cache = LRUCache(max_entries)
+        self.lock = threading.Lock()
+
+    def resolve(self, tree, path):
+        """
+        Returns the object found at `path` in `tree`, or None.
+
+        :param tree: the root `pygit2.Tree`
+        :param str path: a path relative to the root of the tree
+        """
+
+        path = path.strip("/")
+        if not path:
+            return tree
+
+        key = (tree.id, path)
+        with self.lock:
+            item = self.cache.get_if_exists(key)
+        if item is not None:
+            return item
+
+        parent_path, _, name = path.rpartition("/")
+        parent = self.resolve(tree, parent_path)
+        if parent is None or parent.type_str != "tree":
+            return None
+
+        try:
+            item = parent[name]
+        except KeyError:
+            return None
+
+        with self.lock:
+            self.cache[key] = item
+        return item
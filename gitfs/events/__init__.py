@@ -15,11 +15,11 @@
 
 import threading
 
-from atomiclong import AtomicLong
+from .state import SyncState
 
 
-syncing = threading.Event()
-sync_done = threading.Event()
+# where the sync is at and whether writers are held back
+sync_state = SyncState()
 
 push_successful = threading.Event()
 push_successful.set()
@@ -30,10 +30,15 @@ fetch_successful.set()
 idle = threading.Event()
 idle.clear()
 
+# writes are rejected, e.g.: too many commits are waiting to be pushed
 read_only = threading.Event()
+# keep accepting writes while the remote can't be reached
+local_first = threading.Event()
 fetch = threading.Event()
+# someone browsed past the oldest commit of a shallow clone
+deepen = threading.Event()
+# push pending commits right away, regardless of push_interval
+flush = threading.Event()
 shutting_down = threading.Event()
 
-writers = AtomicLong(0)
-
 remote_operation = threading.Lock()
@@ -0,0 +1,123 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+from gitfs.log import log
+
+
+IDLE = "idle"
+COLLECTING = "collecting"
+COMMITTING = "committing"
+MERGING = "merging"
+PUSHING = "pushing"
+DEGRADED = "degraded"
+
+STATES = (IDLE, COLLECTING, COMMITTING, MERGING, PUSHING, DEGRADED)
+
+
+class SyncState:
+    """
+    Where the sync of the mount is at, shared by the FUSE threads (the
+    writers) and the SyncWorker:
+
+    - idle: everything was committed and pushed
+    - collecting: writes came in, their commit jobs are being gathered
+    - committing: the gathered jobs are being committed
+    - merging: the remote's changes are being fetched and merged
+    - pushing: the local commits are being pushed
+    - degraded: the last sync failed and it's going to be retried
+
+    Independently of the state, writers can be held back while the index and
+    the working directory are changed under them. Every change is announced
+    through a condition variable, so nobody has to poll for it, and to the
+    registered listeners.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._listeners = []
+
+        self.state = IDLE
+        self.writers = 0
+        self.holding = False
+
+    def add_listener(self, listener):
+        """
+        Registers `listener(previous, current)`, called after every change of
+        state, from the thread which made it.
+        """
+
+        self._listeners.append(listener)
+
+    def transition(self, state):
+        if state not in STATES:
+            raise ValueError(f"Unknown sync state {state}")
+
+        with self._condition:
+            previous, self.state = self.state, state
+            self._condition.notify_all()
+
+        if previous == state:
+            return
+
+        log.debug("SyncState: %s -> %s", previous, state)
+        for listener in self._listeners:
+            listener(previous, state)
+
+    def wait_for(self, *states, timeout=None):
+        """
+        Waits until the sync gets to one of `states`. Returns False if it
+        didn't in `timeout` seconds.
+        """
+
+        with self._condition:
+            return self._condition.wait_for(lambda: self.state in states, timeout)
+
+    def begin_write(self, wait=True):
+        """
+        Counts a write in, once writers are let through. Writes which are
+        already under way (e.g.: files opened for writing) pass `wait=False`.
+        """
+
+        with self._condition:
+            if wait and self.holding:
+                log.debug("SyncState: Wait until writers are let through")
+                self._condition.wait_for(lambda: not self.holding)
+            self.writers += 1
+
+    def end_write(self):
+        with self._condition:
+            self.writers -= 1
+            self._condition.notify_all()
+
+    def hold_writers(self, timeout=None):
+        """
+        Waits, for at most `timeout` seconds, until no write is in progress
+        and then holds new writers back. Returns False if the writes in
+        progress didn't finish in time.
+        """
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.writers == 0, timeout):
+                return False
+
+            self.holding = True
+            return True
+
+    def release_writers(self):
+        with self._condition:
+            self.holding = False
+            self._condition.notify_all()
@@ -0,0 +1,243 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import errno
+import os
+from collections import deque
+from ctypes import c_char_p, c_int, c_void_p
+from itertools import count, islice
+
+import mfusepy
+
+from gitfs.log import log
+
+
+# readdir flags, from libfuse 3's fuse.h
+FUSE_READDIR_PLUS = 1 << 0
+FUSE_FILL_DIR_PLUS = 1 << 1
+
+# `fuse_invalidate_path` only exists in libfuse 3
+_invalidate_path = getattr(mfusepy._libfuse, "fuse_invalidate_path", None)
+if _invalidate_path is not None:
+    _invalidate_path.argtypes = [c_void_p, c_char_p]
+    _invalidate_path.restype = c_int
+
+
+class FUSE(mfusepy.FUSE):
+    """
+    mfusepy's FUSE binding, plus the few kernel-facing knobs mfusepy doesn't
+    forward to the operations object.
+    """
+
+    def __init__(self, operations, *args, **kwargs):
+        # open directories, by the handle given to the kernel
+        self.dir_handles = {}
+        self.dir_handle_ids = count(1)
+
+        super().__init__(operations, *args, **kwargs)
+
+    def open(self, path, fip):
+        result = super().open(path, fip)
+
+        # Content which never changes (e.g.: history) can stay in the kernel's
+        # page cache between opens.
+        path = path.decode(self.encoding)
+        keep_cache = self.operations.keep_cache(path)
+        fip.contents.keep_cache = 1 if keep_cache else 0
+
+        # Content generated on each read (e.g.: the status file) has no
+        # meaningful size, so it must not be served from the page cache.
+        direct_io = self.operations.direct_io(path)
+        fip.contents.direct_io = 1 if direct_io else 0
+
+        return result
+
+    def opendir(self, path, fip):
+        fh = self.operations.opendir(path.decode(self.encoding))
+
+        handle_id = next(self.dir_handle_ids)
+        self.dir_handles[handle_id] = DirHandle(fh)
+        fip.contents.fh = handle_id
+
+        return 0
+
+    def releasedir(self, path, fip):
+        handle = self.dir_handles.pop(fip.contents.fh)
+        path = None if path is None else path.decode(self.encoding)
+        return self.operations.releasedir(path, handle.fh)
+
+    def fsyncdir(self, path, datasync, fip):
+        handle = self.dir_handles[fip.contents.fh]
+        path = None if path is None else path.decode(self.encoding)
+        return self.operations.fsyncdir(path, datasync, handle.fh)
+
+    def readdir_fuse_2(self, path, buf, filler, offset, fip):
+        return self._readdir(path, buf, filler, offset, fip, 0)
+
+    def readdir_fuse_3(self, path, buf, filler, offset, fip, flags):
+        return self._readdir(path, buf, filler, offset, fip, flags)
+
+    def _readdir(self, path, buf, filler, offset, fip, flags):
+        """
+        Streams the entries of an open directory, starting at `offset`.
+
+        Each entry gets its position as offset, so the kernel can resume the
+        listing where it left off, and the view's generator is consumed only
+        as far as the kernel's buffer goes. Unlike mfusepy, the full
+        attributes views yield along with an entry are handed over when the
+        kernel asked for readdirplus, sparing it a lookup for each entry.
+        """
+
+        handle = self.dir_handles[fip.contents.fh]
+        path = None if path is None else path.decode(self.encoding)
+        handle.seek(offset, lambda: self.operations.readdir(path, handle.fh))
+
+        while True:
+            item = handle.next()
+            if item is None:
+                break
+
+            if isinstance(item, str):
+                name, st, fill_flags = item, None, 0
+            else:
+                name, attrs, _ = item
+                st = mfusepy.c_stat()
+                mfusepy.set_st_attrs(st, attrs, use_ns=self.use_ns)
+                fill_flags = FUSE_FILL_DIR_PLUS if flags & FUSE_READDIR_PLUS else 0
+
+            fill_args = (buf, name.encode(self.encoding), st, handle.offset + 1)
+            if mfusepy.fuse_version_major == 3:
+                fill_args += (fill_flags,)
+
+            if filler(*fill_args) != 0:
+                handle.push_back(item)
+                break
+
+            handle.advance(item)
+
+        return 0
+
+
+class DirHandle:
+    """
+    The state of an open directory: the view's handle, the generator of its
+    entries and how many of them were handed over to the kernel.
+
+    The entries handed over by the last readdir are kept around, since the
+    kernel resumes from an earlier offset when it couldn't pass a whole
+    batch to the reader. Earlier offsets restart the listing.
+    """
+
+    def __init__(self, fh):
+        self.fh = fh
+
+        self.entries = None
+        self.offset = 0
+
+        self.sent = []
+        self.sent_from = 0
+        self.pending = deque()
+
+    def seek(self, offset, list_entries):
+        if self.entries is None or offset == 0 or offset < self.sent_from:
+            # (re)start the listing, so rewinddir() sees fresh entries
+            self.entries = islice(list_entries(), offset, None)
+            self.pending.clear()
+        elif offset <= self.offset:
+            self.pending.extendleft(reversed(self.sent[offset - self.sent_from :]))
+        else:
+            for _ in range(offset - self.offset):
+                self.next()
+
+        self.offset = offset
+        self.sent = []
+        self.sent_from = offset
+
+    def next(self):
+        if self.pending:
+            return self.pending.popleft()
+        return next(self.entries, None)
+
+    def push_back(self, item):
+        self.pending.appendleft(item)
+
+    def advance(self, item):
+        self.sent.append(item)
+        self.offset += 1
+
+
+class KernelCache:
+    """
+    Tells the kernel to drop what it cached about paths from `current/` once
+    they were changed underneath it (by a merge or a checkout).
+
+    Each invalidated path gets its attributes and cached pages dropped. Its
+    parent directories are invalidated as well, so that added or removed
+    names are looked up again.
+
+    In a multi-repository mount, the paths of each repository are under its
+    `prefix` (e.g.: `/<name>`).
+    """
+
+    def __init__(self, current_path="current", history_path="history", prefix=""):
+        self.current_path = current_path
+        self.history_path = history_path
+        self.prefix = prefix
+        self.fuse = None
+
+    def attach(self):
+        """
+        Grabs the `struct fuse` handle of the mount. It must be called from
+        a FUSE thread (e.g.: while handling `init`).
+        """
+
+        if _invalidate_path is None:
+            log.info("KernelCache: libfuse can't invalidate paths")
+            return
+
+        self.fuse = c_void_p(mfusepy._libfuse.fuse_get_context().contents.fuse)
+
+    def mount_paths(self, paths):
+        """
+        Maps repository paths to the mount paths which need invalidation.
+        """
+
+        root = f"{self.prefix}/{self.current_path}"
+        mount_paths = {f"{self.prefix}/{self.history_path}"}
+
+        for path in paths:
+            path = os.path.join(root, path)
+            while path not in mount_paths and path != "/":
+                mount_paths.add(path)
+                path = os.path.dirname(path)
+
+        return mount_paths
+
+    def invalidate(self, paths):
+        """
+        Invalidates the given repository paths. Paths which the kernel doesn't
+        know about are skipped by libfuse.
+
+        Never call it while a FUSE request is waiting on the caller, since the
+        kernel may hold page locks for it.
+        """
+
+        if self.fuse is None or not paths:
+            return
+
+        for path in sorted(self.mount_paths(paths), reverse=True):
+            result = _invalidate_path(self.fuse, path.encode("utf-8"))
+            if result not in (0, -errno.ENOENT):
+                log.debug("KernelCache: Can't invalidate %s (%d)", path, result)
@@ -14,3 +14,10 @@
 
 
 from .accept_mine import AcceptMine
+from .in_memory import InMemoryAcceptMine
+
+
+STRATEGIES = {
+    "accept_mine": AcceptMine,
+    "accept_mine_in_memory": InMemoryAcceptMine,
+}
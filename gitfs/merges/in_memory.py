@@ -0,0 +1,136 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pygit2
+
+from gitfs.log import log
+
+from .base import Merger
+
+
+class InMemoryAcceptMine(Merger):
+    """
+    Same resolution as `AcceptMine` (on conflicts, the local version of a
+    file wins), but the merge is done by libgit2 on trees, in memory. The
+    merge commit goes straight into the object database and the working
+    directory is checked out only once, at the end.
+
+    Since the merge itself doesn't touch the working directory, writers only
+    need to be held back while the result is applied.
+    """
+
+    in_memory = True
+
+    def merged_commit(self, local_branch, remote_branch, upstream):
+        """
+        Computes the commit the local branch should point to after merging
+        the remote one, without touching any reference, the index or the
+        working directory.
+
+        :param str local_branch: name of the local branch
+        :param str remote_branch: name of the remote branch
+        :param str upstream: name of the remote
+        :returns: the id of the resulting commit
+        :rtype: `pygit2.Oid`
+        """
+
+        local = self.repository.branches.local.get(local_branch).target
+        reference = f"{upstream}/{remote_branch}"
+        remote = self.repository.branches.remote.get(reference).target
+
+        if local == remote or self.repository.descendant_of(local, remote):
+            log.debug("InMemoryAcceptMine: Nothing to merge")
+            return local
+
+        if self.repository.descendant_of(remote, local):
+            log.debug("InMemoryAcceptMine: Fast-forward to %s", remote)
+            return remote
+
+        log.debug("InMemoryAcceptMine: Merging %s into %s", local, remote)
+        index = self.repository.merge_commits(remote, local)
+
+        log.debug("InMemoryAcceptMine: Solving conflicts")
+        self.solve_conflicts(index)
+
+        tree = index.write_tree(self.repository._repo)
+        message = f"merging: {self.repository[local].message}"
+        return self.repository.create_commit(
+            None,
+            pygit2.Signature(*self.author),
+            pygit2.Signature(*self.committer),
+            message,
+            tree,
+            [remote, local],
+        )
+
+    def apply(self, local_branch, commit_id, keep=()):
+        """
+        Moves the local branch to `commit_id`, checking out only the paths
+        which differ from the current HEAD.
+
+        Paths in `keep` (e.g.: changes which weren't committed yet) are left
+        alone, as the local version wins anyway once they get committed on
+        top of `commit_id`.
+        """
+
+        reference = f"refs/heads/{local_branch}"
+        head = self.repository.lookup_reference(reference).target
+        if head == commit_id:
+            return
+
+        paths = self.repository.changed_paths(head, commit_id) - set(keep)
+        if paths:
+            log.debug("InMemoryAcceptMine: Checkout %d paths", len(paths))
+            self.repository.checkout_tree(
+                self.repository[commit_id],
+                strategy=pygit2.GIT_CHECKOUT_FORCE,
+                paths=sorted(paths),
+            )
+        self.repository.create_reference(reference, commit_id, force=True)
+
+    def merge(self, local_branch, remote_branch, upstream):
+        commit_id = self.merged_commit(local_branch, remote_branch, upstream)
+        self.apply(local_branch, commit_id)
+
+    def __call__(self, local_branch, remote_branch, upstream):
+        try:
+            self.merge(local_branch, remote_branch, upstream)
+        except:
+            log.exception("InMemoryAcceptMine: Failed to merge")
+            raise
+
+    def solve_conflicts(self, index):
+        """
+        Resolves the conflicts of an in-memory merge, where the remote is
+        "ours" and the local commit is "theirs", in favour of the local side.
+        """
+
+        if not index.conflicts:
+            log.info("InMemoryAcceptMine: No conflicts to solve")
+            return
+
+        for ancestor, remote, local in list(index.conflicts):
+            paths = {entry.path for entry in (ancestor, remote, local) if entry}
+            for path in paths:
+                # the conflicts go away (as None) along with the last one
+                if index.conflicts and path in index.conflicts:
+                    del index.conflicts[path]
+
+            if local is None:
+                log.debug("InMemoryAcceptMine: We deleted the file, remove it")
+                continue
+
+            log.debug("InMemoryAcceptMine: Keep our version of %s", local.path)
+            index.add(pygit2.IndexEntry(local.path, local.id, local.mode))
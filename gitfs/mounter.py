@@ -14,17 +14,30 @@
 
 
 import argparse
+import os
 import resource
 import sys
+import threading
+from collections import OrderedDict
 
-from mfusepy import FUSE
 from pygit2 import Keypair, RemoteCallbacks, UserPass
 
 from gitfs import __version__
+from gitfs.cache import BlobArena, BlobCache
+from gitfs.events import local_first, read_only
+from gitfs.fuse import FUSE, KernelCache
+from gitfs.merges import STRATEGIES
+from gitfs.multi_router import MultiRouter
 from gitfs.router import Router
 from gitfs.routes import prepare_routes
 from gitfs.utils import Args
-from gitfs.worker import CommitQueue, FetchWorker, SyncWorker
+from gitfs.worker import (
+    CommitQueue,
+    FetchWorker,
+    MaintenanceWorker,
+    Runtime,
+    SyncWorker,
+)
 
 
 def parse_args(parser):
@@ -51,10 +64,18 @@ def get_credentials(args):
     return RemoteCallbacks(credentials=credentials)
 
 
+def get_blob_arena(args):
+    if not args.blob_arena:
+        return None
+
+    return BlobArena(args.blob_arena, int(args.blob_arena_size * 1024 * 1024))
+
+
 def prepare_components(args):
     commit_queue = CommitQueue()
 
     credentials = get_credentials(args)
+    kernel_cache = KernelCache(args.current_path, args.history_path)
 
     try:
         # setting router
@@ -73,6 +94,19 @@ def prepare_components(args):
             credentials=credentials,
             ignore_file=args.ignore_file,
             hard_ignore=args.hard_ignore,
+            attr_timeout=args.attr_timeout,
+            entry_timeout=args.entry_timeout,
+            kernel_cache=kernel_cache,
+            max_heavy_operations=args.max_heavy_operations,
+            persistent_clone=args.persistent_clone,
+            clone_depth=args.clone_depth,
+            lazy_workdir=args.lazy_workdir,
+            bare=args.bare,
+            blob_cache_size=int(args.blob_cache_size * 1024 * 1024),
+            blob_arena=get_blob_arena(args),
+            object_store=args.object_store,
+            refs_path=args.refs_path or None,
+            at_path=args.at_path or None,
         )
     except KeyError as error:
         sys.stderr.write(
@@ -84,12 +118,27 @@ def prepare_components(args):
     routes = prepare_routes(args)
     router.register(routes)
 
+    try:
+        strategy = STRATEGIES[args.merge_strategy]
+    except KeyError as error:
+        sys.stderr.write(
+            f"Unknown merge strategy {args.merge_strategy}, "
+            f"use one of: {', '.join(STRATEGIES)}\n"
+        )
+        raise error
+
+    author = (args.committer_name, args.committer_email)
+    strategy = strategy(
+        router.repo, author=author, committer=author, repo_path=router.repo_path
+    )
+
     # setup workers
     merge_worker = SyncWorker(
         args.committer_name,
         args.committer_email,
         args.committer_name,
         args.committer_email,
+        strategy=strategy,
         commit_queue=commit_queue,
         repository=router.repo,
         upstream="origin",
@@ -98,8 +147,16 @@ def prepare_components(args):
         timeout=args.merge_timeout,
         credentials=credentials,
         min_idle_times=args.min_idle_times,
+        kernel_cache=kernel_cache,
+        push_interval=args.push_interval,
+        push_delay=args.push_delay,
+        local_first=args.local_first,
+        max_unpushed_commits=args.max_unpushed_commits,
     )
 
+    if args.local_first:
+        local_first.set()
+
     fetch_worker = FetchWorker(
         upstream="origin",
         branch=args.branch,
@@ -107,23 +164,168 @@ def prepare_components(args):
         timeout=args.fetch_timeout,
         credentials=credentials,
         idle_timeout=args.idle_fetch_timeout,
+        depth=args.clone_depth,
+        fast_forward=args.bare,
+        kernel_cache=kernel_cache,
+    )
+
+    maintenance_worker = MaintenanceWorker(
+        repository=router.repo,
+        interval=args.maintenance_interval,
+        min_loose_objects=args.maintenance_loose_objects,
     )
 
     merge_worker.daemon = True
     fetch_worker.daemon = True
+    maintenance_worker.daemon = True
+
+    router.workers = [merge_worker, fetch_worker, maintenance_worker]
 
-    router.workers = [merge_worker, fetch_worker]
+    if args.async_runtime:
+        # the workers' jobs run on a single event loop, instead of their
+        # own threads
+        runtime = Runtime(
+            sync_worker=merge_worker,
+            fetch_worker=fetch_worker,
+            maintenance_worker=maintenance_worker,
+        )
+        runtime.daemon = True
+        router.workers = [runtime]
+
+    if args.bare:
+        # nothing is written, so there's nothing to sync or to clean up
+        read_only.set()
+        router.workers = [fetch_worker]
 
     return merge_worker, fetch_worker, router
 
 
+def read_repositories(path, branch):
+    """
+    Reads the repositories of a multi-repository mount, one per line, as
+    `<name> <remote_url> [<branch>]`. Empty lines and lines starting with
+    `#` are skipped.
+
+    :rtype: list of (name, remote_url, branch)
+    """
+
+    repositories = []
+    with open(path) as repos:
+        for line in repos:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            name, remote_url, *rest = line.split()
+            if "/" in name:
+                raise ValueError(f"Invalid repository name {name}")
+            repositories.append((name, remote_url, rest[0] if rest else branch))
+
+    return repositories
+
+
+def prepare_repositories(args):
+    """
+    Prepares a read-only mount of all the repositories listed in
+    `args.repos`, each one under its name. The repositories get their own
+    Router, but share the blob cache and a Runtime running their fetches on
+    `args.max_fetches` threads.
+    """
+
+    credentials = get_credentials(args)
+    blob_cache = BlobCache(
+        None, int(args.blob_cache_size * 1024 * 1024), arena=get_blob_arena(args)
+    )
+    routes = prepare_routes(args)
+
+    routers = OrderedDict()
+    fetch_workers = []
+    for name, remote_url, branch in read_repositories(args.repos, args.branch):
+        kernel_cache = KernelCache(args.current_path, args.history_path, f"/{name}")
+        deepen_request = threading.Event()
+
+        try:
+            router = Router(
+                remote_url=remote_url,
+                mount_path=os.path.join(args.mount_point, name),
+                current_path=args.current_path,
+                history_path=args.history_path,
+                repo_path=os.path.join(args.repo_path, name),
+                branch=branch,
+                user=args.user,
+                group=args.group,
+                max_size=args.max_size * 1024 * 1024,
+                max_offset=args.max_size * 1024 * 1024,
+                commit_queue=None,
+                credentials=credentials,
+                ignore_file=args.ignore_file,
+                hard_ignore=args.hard_ignore,
+                kernel_cache=kernel_cache,
+                max_heavy_operations=args.max_heavy_operations,
+                persistent_clone=args.persistent_clone,
+                clone_depth=args.clone_depth,
+                bare=True,
+                blob_cache=blob_cache,
+                prefix=f"/{name}",
+                deepen_request=deepen_request,
+                object_store=args.object_store,
+                refs_path=args.refs_path or None,
+                at_path=args.at_path or None,
+            )
+        except KeyError as error:
+            sys.stderr.write(
+                f"Can't clone reference origin/{branch} from remote {remote_url}: {error}\n"
+            )
+            raise error
+
+        router.register(routes)
+        routers[name] = router
+
+        fetch_workers.append(
+            FetchWorker(
+                upstream="origin",
+                branch=branch,
+                repository=router.repo,
+                timeout=args.fetch_timeout,
+                credentials=credentials,
+                idle_timeout=args.idle_fetch_timeout,
+                depth=args.clone_depth,
+                fast_forward=True,
+                kernel_cache=kernel_cache,
+                lock=threading.Lock(),
+                deepen_request=deepen_request,
+            )
+        )
+
+    router = MultiRouter(
+        routers,
+        mount_path=args.mount_point,
+        user=args.user,
+        group=args.group,
+        attr_timeout=args.attr_timeout,
+        entry_timeout=args.entry_timeout,
+    )
+
+    runtime = Runtime(fetch_workers=fetch_workers, max_workers=args.max_fetches)
+    runtime.daemon = True
+    router.workers = [runtime]
+
+    # nothing is written, so there's nothing to sync or to clean up
+    read_only.set()
+
+    return router
+
+
 def start_fuse():
     parser = argparse.ArgumentParser(prog="GitFS")
     args = parse_args(parser)
 
     # try:
     print("Preparing components...", args)
-    merge_worker, fetch_worker, router = prepare_components(args)
+    if args.repos:
+        router = prepare_repositories(args)
+    else:
+        merge_worker, fetch_worker, router = prepare_components(args)
     # except:
     #     print("Error while preparing components, exiting...")
     #     return
@@ -0,0 +1,172 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+from errno import ENOENT, ENOSYS, EXDEV
+from grp import getgrnam
+from pwd import getpwnam
+from threading import Thread
+
+from mfusepy import FuseOSError
+
+from gitfs.events import fetch, shutting_down
+from gitfs.log import log
+from gitfs.router import (
+    SUPPORTED_OPERATIONS,
+    TWO_PATH_OPERATIONS,
+    UNSUPPORTED_OPERATIONS,
+)
+from gitfs.views import RepositoriesView
+
+
+class MultiRouter:
+    """
+    Serves many repositories from one mount, each one under `/<name>`.
+
+    Every repository keeps its own Router (with its clone, views, locks and
+    caches), which gets the calls for its subtree with the name stripped
+    from their paths. What's costly to have once per repository is shared:
+    the workers (a Runtime fetching all of them on a few threads), the blob
+    cache and the thread indexing their history.
+    """
+
+    def __init__(self, routers, mount_path, user="root", group="root", **kwargs):
+        """
+        :param dict routers: the Router of each repository, by name
+        :param str mount_path: where the repositories are mounted
+        """
+
+        self.routers = routers
+        self.mount_path = mount_path
+
+        self.attr_timeout = kwargs.get("attr_timeout", 1.0)
+        self.entry_timeout = kwargs.get("entry_timeout", 1.0)
+
+        self.root = RepositoriesView(
+            names=list(routers),
+            uid=getpwnam(user).pw_uid,
+            gid=getgrnam(group).gr_gid,
+            mount_time=int(time.time()),
+        )
+
+        self.workers = []
+
+    def route(self, path):
+        """
+        Finds the router serving `path`, along with the path in its subtree.
+        The root itself has no router.
+
+        :param str path: path in the mount
+        :rtype: router (or None), path
+        """
+
+        name, _, rest = path.lstrip("/").partition("/")
+        if not name:
+            return None, "/"
+
+        router = self.routers.get(name)
+        if router is None:
+            raise FuseOSError(ENOENT)
+
+        return router, f"/{rest}"
+
+    def __call__(self, operation, *args):
+        if operation in ["destroy", "init"]:
+            return getattr(self, operation)(*args)
+
+        router, path = self.route(args[0])
+        args = (path,) + args[1:]
+
+        if operation in TWO_PATH_OPERATIONS:
+            other_router, other_path = self.route(args[1])
+            if other_router is not router:
+                raise FuseOSError(EXDEV)
+            args = (path, other_path) + args[2:]
+
+        if router is not None:
+            return router(operation, *args)
+
+        if not hasattr(self.root, operation):
+            log.debug(f"No attribute {operation} on {self.root.__class__.__name__}")
+            raise FuseOSError(ENOSYS)
+
+        return getattr(self.root, operation)(*args)
+
+    def init(self, path):
+        # the history of the repositories is indexed one after the other
+        indexers = [router.history_indexer for router in self.routers.values()]
+        self.history_indexer = Thread(
+            target=lambda: [indexer.run() for indexer in indexers],
+            name="HistoryIndexer",
+            daemon=True,
+        )
+        self.history_indexer.start()
+
+        for worker in self.workers:
+            worker.start()
+
+        log.debug("Done init")
+
+    def destroy(self, path):
+        log.debug("Stopping workers")
+        shutting_down.set()
+        fetch.set()
+
+        for worker in self.workers:
+            worker.join()
+        log.debug("Workers stopped")
+
+        for router in self.routers.values():
+            router.destroy(path)
+
+    def init_with_config(self, conn_info=None, config=None):
+        """
+        Initialize filesystem with configuration.
+        Called by mfusepy during mount process.
+
+        See `Router.init_with_config`, the repositories share its settings.
+        """
+
+        if config is not None:
+            config.use_ino = 1
+            config.attr_timeout = self.attr_timeout
+            config.entry_timeout = self.entry_timeout
+
+        for router in self.routers.values():
+            if router.kernel_cache is not None:
+                router.kernel_cache.attach()
+
+        return self.init(None)
+
+    def keep_cache(self, path):
+        router, path = self.route(path)
+        return router.keep_cache(path) if router is not None else False
+
+    def direct_io(self, path):
+        router, path = self.route(path)
+        return router.direct_io(path) if router is not None else False
+
+    def __getattr__(self, operation):
+        """
+        Hands mfusepy the same operations as `Router.__getattr__`.
+        """
+
+        if operation in UNSUPPORTED_OPERATIONS:
+            return None
+
+        if operation in SUPPORTED_OPERATIONS:
+            return lambda *args: self(operation, *args)
+
+        return None
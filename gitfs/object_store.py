@@ -0,0 +1,117 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from pygit2 import GitError, init_repository
+from pygit2 import Repository as GitRepository
+from pygit2.enums import RepositoryOpenFlag
+
+from gitfs.log import log
+from gitfs.metrics import metrics
+
+
+class ObjectStore:
+    """
+    A bare repository holding the objects of a remote, shared by all the
+    clones of it on the host (whatever their branch or user) as an alternate
+    object database.
+
+    Clones get their objects from the store instead of the remote and fetches
+    go through it, so each object is transferred and stored once per host.
+    The store keeps a branch for each branch fetched, so that its objects
+    stay reachable. Its objects are never pruned, since the clones may still
+    use them.
+
+    Several gitfs processes may share a store, so it's changed only while
+    holding a lock on `<path>.lock`.
+    """
+
+    def __init__(self, path, remote_url):
+        self.path = path
+        self.remote_url = remote_url
+
+    @classmethod
+    def for_remote(cls, directory, remote_url):
+        """
+        The store of `remote_url`, among the ones kept in `directory`.
+        """
+
+        key = hashlib.sha1(remote_url.encode()).hexdigest()
+        return cls(os.path.join(directory, f"{key}.git"), remote_url)
+
+    @property
+    def objects_path(self):
+        return os.path.join(self.path, "objects")
+
+    @contextmanager
+    def lock(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def open(self):
+        """
+        Opens the store, making it first if there's none yet. It must be
+        called while holding the lock.
+        """
+
+        try:
+            return GitRepository(self.path, flags=RepositoryOpenFlag.NO_SEARCH)
+        except GitError:
+            log.info("Create the object store of %s in %s", self.remote_url, self.path)
+
+        repo = init_repository(self.path, bare=True)
+        repo.remotes.create("origin", self.remote_url)
+        # tags aren't mounted, so don't let libgit2 follow them
+        repo.config["remote.origin.tagopt"] = "--no-tags"
+        return repo
+
+    def fetch(self, branch, credentials, all_refs=False):
+        """
+        Brings the store's `branch` (or all its branches and tags) up to date
+        with the remote and returns the id of the branch's head. Only the
+        objects the store doesn't have yet are transferred.
+        """
+
+        with self.lock():
+            repo = self.open()
+
+            reference = f"refs/heads/{branch}"
+            refspecs = [f"+{reference}:{reference}"]
+            if all_refs:
+                refspecs = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+            repo.remotes["origin"].fetch(refspecs=refspecs, callbacks=credentials)
+            metrics.increment("object_store_fetches")
+
+            return repo.references[reference].target
+
+    def references(self):
+        """
+        Yields the name and the target of the branches and tags in the store,
+        as the remote has them.
+        """
+
+        repo = GitRepository(self.path, flags=RepositoryOpenFlag.NO_SEARCH)
+        for name in repo.listall_references():
+            if name.startswith(("refs/heads/", "refs/tags/")):
+                yield name, repo.references[name].target
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 
+import fcntl
 import os
+import threading
 from collections import namedtuple
 from shutil import rmtree
 from stat import S_IFDIR, S_IFLNK, S_IFREG
@@ -26,16 +28,40 @@ from pygit2 import (
     GIT_FILEMODE_TREE,
     GIT_SORT_TOPOLOGICAL,
     GIT_STATUS_CURRENT,
+    GIT_STATUS_INDEX_DELETED,
+    GIT_STATUS_WT_DELETED,
+    GitError,
+    IndexEntry,
+    RemoteCallbacks,
     Signature,
+    Tree,
     clone_repository,
+    init_repository,
 )
+from pygit2 import Repository as GitRepository
+from pygit2.enums import CheckoutStrategy, RepositoryOpenFlag, RepositoryState
 
-from gitfs.cache import CommitCache
+from gitfs.cache import CommitCache, TreeResolver
 from gitfs.log import log
+from gitfs.metrics import metrics
+from gitfs.object_store import ObjectStore
 from gitfs.utils.commits import CommitsList
 from gitfs.utils.path import split_path_into_components
 
 
+DEFAULT_STATS = {
+    GIT_FILEMODE_LINK: {"st_mode": S_IFLNK | 0o444},
+    GIT_FILEMODE_TREE: {"st_mode": S_IFDIR | 0o555, "st_nlink": 2},
+    GIT_FILEMODE_BLOB: {"st_mode": S_IFREG | 0o444},
+    GIT_FILEMODE_BLOB_EXECUTABLE: {"st_mode": S_IFREG | 0o555},
+}
+
+# read by gitfs from the working directory, so they're never left out of it
+HYDRATED_PATHS = (".gitignore", ".gitmodules")
+
+# the branches AcceptMine merges on, which it deletes once it's done
+MERGE_BRANCHES = ("merging_local", "merging_remote")
+
 DivergeCommits = namedtuple(
     "DivergeCommits", ["common_parent", "first_commits", "second_commits"]
 )
@@ -48,6 +74,27 @@ class Repository:
 
         self.behind = False
 
+        # In a lazy working directory, files are written only once someone
+        # changes them. Until then, they're only in the index (and served
+        # from the object database).
+        self.lazy = False
+
+        # the ObjectStore shared with the other clones of the remote, if any
+        self.object_store = None
+
+        # all the branches and tags are fetched, not only the mounted branch
+        self.all_refs = False
+
+        # the lock keeping other mounts from reusing the clone, if taken
+        self.clone_lock = None
+
+        # the index is shared by all the FUSE threads staging changes
+        self.index_lock = threading.Lock()
+
+        # the tree of the index, written once until the index changes
+        self._index_tree = None
+        self.trees = TreeResolver(self)
+
     def __getitem__(self, item):
         """
         Proxy method for pygit2.Repository
@@ -69,6 +116,17 @@ class Repository:
         ahead, _ = self.diverge(upstream, branch)
         return ahead
 
+    def unpushed_commits(self, upstream, branch):
+        """
+        Counts the local commits which the remote branch doesn't have yet.
+        """
+
+        remote_branch = self._repo.branches.remote.get(f"{upstream}/{branch}")
+        local_branch = self._repo.branches.local.get(branch)
+
+        ahead, _ = self._repo.ahead_behind(local_branch.target, remote_branch.target)
+        return ahead
+
     def diverge(self, upstream, branch):
         reference = f"{upstream}/{branch}"
         remote_branch = self._repo.branches.remote.get(reference)
@@ -79,11 +137,10 @@ class Repository:
         if remote_branch.target == local_branch.target:
             return False, False
 
-        diverge_commits = self.find_diverge_commits(local_branch, remote_branch)
-        behind = len(diverge_commits.second_commits) > 0
-        ahead = len(diverge_commits.first_commits) > 0
-
-        return ahead, behind
+        ahead, behind = self._repo.ahead_behind(
+            local_branch.target, remote_branch.target
+        )
+        return ahead > 0, behind > 0
 
     def checkout(self, ref, *args, **kwargs):
         result = self._repo.checkout(ref, *args, **kwargs)
@@ -91,7 +148,7 @@ class Repository:
         # update ignore cache after a checkout
         self.ignore.update()
 
-        status = self._repo.status()
+        status = self._status()
         for path, status in status.items():
             # path is in current status, move on
             if status == GIT_STATUS_CURRENT:
@@ -124,8 +181,195 @@ class Repository:
                     log.info("Repository: Checkout couldn't chmod %s", full_path)
                 self._repo.index.add(self._sanitize(path))
 
+        self.forget_index_tree()
         return result
 
+    def changed_paths(self, old_commit_id, new_commit_id):
+        """
+        Returns the paths which differ between two commits. Renamed paths are
+        reported under both names.
+
+        :param old_commit_id: the id of the first commit
+        :param new_commit_id: the id of the second commit
+        :rtype: set
+        """
+
+        if old_commit_id == new_commit_id:
+            return set()
+
+        paths = set()
+        for delta in self._repo.diff(old_commit_id, new_commit_id).deltas:
+            paths.add(delta.old_file.path)
+            paths.add(delta.new_file.path)
+
+        return paths
+
+    def dirty_paths(self):
+        """
+        Returns the paths whose working directory or index version differs
+        from HEAD.
+        """
+
+        return set(self._status())
+
+    def _status(self):
+        status = self._repo.status()
+        if not self.lazy:
+            return status
+
+        # files which weren't hydrated are missing on purpose
+        return {
+            path: flags
+            for path, flags in status.items()
+            if flags != GIT_STATUS_WT_DELETED
+        }
+
+    def checkout_head(self, **kwargs):
+        try:
+            if not self.lazy:
+                return self._repo.checkout_head(**kwargs)
+
+            self._checkout_lazily(self._repo.head.peel(Tree), **kwargs)
+        finally:
+            self.forget_index_tree()
+
+    def checkout_tree(self, treeish, **kwargs):
+        try:
+            if not self.lazy:
+                return self._repo.checkout_tree(treeish, **kwargs)
+
+            self._checkout_lazily(treeish.peel(Tree), **kwargs)
+        finally:
+            self.forget_index_tree()
+
+    def merge(self, *args, **kwargs):
+        result = self._repo.merge(*args, **kwargs)
+        self.forget_index_tree()
+        return result
+
+    def _checkout_lazily(self, tree, strategy=CheckoutStrategy.SAFE, paths=None):
+        """
+        Checks out `tree` in a lazy working directory: the files which were
+        hydrated are written as usual, while the others are updated only in
+        the index, so they stay out of the working directory.
+
+        Without `paths`, only the ones which differ from `tree` are checked
+        out.
+        """
+
+        if paths is None:
+            index_tree = self.index_tree().id
+            paths = self.dirty_paths() | self.changed_paths(index_tree, tree.id)
+
+        hydrated = sorted(
+            path
+            for path in paths
+            if path in HYDRATED_PATHS or os.path.lexists(self._full_path(path))
+        )
+        if hydrated:
+            self._repo.checkout_tree(
+                tree,
+                strategy=strategy | CheckoutStrategy.DISABLE_PATHSPEC_MATCH,
+                paths=hydrated,
+            )
+
+        with self.index_lock:
+            index = self._repo.index
+            for path in set(paths).difference(hydrated):
+                try:
+                    entry = tree[path]
+                except KeyError:
+                    if path in index:
+                        index.remove(path)
+                else:
+                    index.add(IndexEntry(path, entry.id, entry.filemode))
+            index.write()
+            self.forget_index_tree()
+
+    def index_tree(self):
+        """
+        Returns the tree of the index, which is written only once until the
+        index changes.
+        """
+
+        with self.index_lock:
+            if self._index_tree is None:
+                self._index_tree = self._repo[self._repo.index.write_tree()]
+            return self._index_tree
+
+    def forget_index_tree(self):
+        """
+        Drops the tree of the index, once the index changed (by staging,
+        checking out or merging).
+        """
+
+        self._index_tree = None
+
+    def index_object(self, path):
+        """
+        Returns the object the index tracks at `path` (the root tree for an
+        empty path), whether it's in the working directory or not, or None.
+        """
+
+        return self.trees.resolve(self.index_tree(), self._sanitize(path) or "")
+
+    def lazy_paths(self, path):
+        """
+        Lists the files tracked at or under `path` which weren't hydrated.
+        """
+
+        if not self.lazy:
+            return []
+
+        path = self._sanitize(path)
+        item = self.index_object(path)
+        if item is None:
+            return []
+
+        if item.type_str == "tree":
+            paths = self._tree_paths(item, path)
+        else:
+            paths = [path]
+
+        return [path for path in paths if not os.path.lexists(self._full_path(path))]
+
+    def _tree_paths(self, tree, prefix):
+        for item in tree:
+            path = f"{prefix}/{item.name}" if prefix else item.name
+            if item.type_str == "tree":
+                yield from self._tree_paths(item, path)
+            else:
+                yield path
+
+    def hydrate(self, path):
+        """
+        Writes the files tracked at or under `path` in the working directory,
+        if they aren't there yet, along with the parent directories of `path`
+        (which may be about to be created). Returns how many files were
+        written.
+        """
+
+        if not self.lazy:
+            return 0
+
+        path = self._sanitize(path)
+        os.makedirs(os.path.dirname(self._full_path(path)), exist_ok=True)
+
+        paths = self.lazy_paths(path)
+        if not paths:
+            return 0
+
+        log.debug("Hydrate %d files from %s", len(paths), path)
+        with self.index_lock:
+            self._repo.checkout_index(
+                paths=paths,
+                strategy=CheckoutStrategy.FORCE
+                | CheckoutStrategy.DISABLE_PATHSPEC_MATCH,
+            )
+
+        metrics.increment("hydrated_files", len(paths))
+        return len(paths)
+
     def _sanitize(self, path):
         if path is not None and path.startswith("/"):
             path = path[1:]
@@ -140,26 +384,140 @@ class Repository:
         """
 
         remote = self.get_remote(upstream)
-        remote.push([f"refs/heads/{branch}"], callbacks=credentials)
+        callbacks = PushCallbacks(credentials)
+        remote.push([f"refs/heads/{branch}"], callbacks=callbacks)
+
+        metrics.increment("pushed_bytes", callbacks.bytes_pushed)
 
     def fetch(self, upstream, branch_name, credentials):
         """
-        Fetch from remote and return True if we are behind or False otherwise
+        Fetch from remote and return True if we are behind or False otherwise.
+
+        Only the mounted branch is fetched, without tags, and only when the
+        remote advertises a different head for it than the one we know of.
+        With `all_refs`, all the branches and tags are, when any of them
+        changed. Clones sharing an object store fetch through it.
         """
 
-        remote = self.get_remote(upstream)
-        remote.fetch(callbacks=credentials)
+        if self.object_store is not None:
+            if self.remote_branch_changed(upstream, branch_name, credentials):
+                head = self.object_store.fetch(
+                    branch_name, credentials, all_refs=self.all_refs
+                )
+                self._repo.create_reference(
+                    f"refs/remotes/{upstream}/{branch_name}", head, force=True
+                )
+                if self.all_refs:
+                    for name, target in self.object_store.references():
+                        self._repo.create_reference(
+                            tracking_reference(upstream, name), target, force=True
+                        )
+        elif self.remote_branch_changed(upstream, branch_name, credentials):
+            # tags are fetched explicitly, if at all, so don't let libgit2
+            # follow them
+            tagopt = f"remote.{upstream}.tagopt"
+            if tagopt not in self._repo.config:
+                self._repo.config[tagopt] = "--no-tags"
+
+            if self.all_refs:
+                refspecs = [
+                    f"+refs/heads/*:refs/remotes/{upstream}/*",
+                    "+refs/tags/*:refs/tags/*",
+                ]
+            else:
+                refspecs = [
+                    f"+refs/heads/{branch_name}:refs/remotes/{upstream}/{branch_name}"
+                ]
+            remote = self.get_remote(upstream)
+            remote.fetch(refspecs=refspecs, callbacks=credentials)
 
         _, behind = self.diverge(upstream, branch_name)
         self.behind = behind
         return behind
 
+    def deepen(self, upstream, branch_name, depth, credentials):
+        """
+        Fetches the history of a shallow clone, down to `depth` commits from
+        the remote's head.
+        """
+
+        log.info("Deepen the history to %d commits", depth)
+        remote = self.get_remote(upstream)
+        remote.fetch(
+            refspecs=[
+                f"+refs/heads/{branch_name}:refs/remotes/{upstream}/{branch_name}"
+            ],
+            callbacks=credentials,
+            depth=depth,
+        )
+
+    def fast_forward(self, upstream, branch_name):
+        """
+        Moves the local branch to the head fetched from the remote, in a
+        single reference update, and returns the paths which changed. It's how
+        bare clones, which never commit, follow the remote.
+        """
+
+        reference = f"refs/heads/{branch_name}"
+        old_head = self._repo.lookup_reference(reference).target
+        remote_reference = f"refs/remotes/{upstream}/{branch_name}"
+        new_head = self._repo.lookup_reference(remote_reference).target
+        if old_head == new_head:
+            return set()
+
+        self._repo.create_reference(reference, new_head, force=True)
+        self.behind = False
+        return self.changed_paths(old_head, new_head)
+
+    def remote_branch_changed(self, upstream, branch_name, credentials):
+        """
+        Compare the head the remote advertises for `branch_name` with our
+        remote-tracking reference. Only the refs are listed, no objects are
+        negotiated or downloaded.
+        """
+
+        remote = self.get_remote(upstream)
+        heads = remote.list_heads(callbacks=credentials)
+
+        if self.all_refs:
+            return self._refs_changed(upstream, heads)
+
+        name = f"refs/heads/{branch_name}"
+        advertised = next((head.oid for head in heads if head.name == name), None)
+        tracking = self._repo.references.get(f"refs/remotes/{upstream}/{branch_name}")
+
+        if advertised is None or tracking is None:
+            return True
+
+        return advertised != tracking.target
+
+    def _refs_changed(self, upstream, heads):
+        """
+        Tells if any of the branches and tags the remote advertises is new or
+        points elsewhere than our copy of it.
+        """
+
+        for head in heads:
+            # the targets of the annotated tags
+            if head.name.endswith("^{}"):
+                continue
+
+            local_name = tracking_reference(upstream, head.name)
+            if local_name is None:
+                continue
+
+            reference = self._repo.references.get(local_name)
+            if reference is None or reference.target != head.oid:
+                return True
+
+        return False
+
     def commit(self, message, author, committer, parents=None, ref="HEAD"):
         """Wrapper for create_commit. It creates a commit from a given ref
         (default is HEAD)
         """
 
-        status = self._repo.status()
+        status = self._status()
         if status == {}:
             return None
 
@@ -168,8 +526,9 @@ class Repository:
         committer = Signature(committer[0], committer[1])
 
         # write index localy
-        tree = self._repo.index.write_tree()
-        self._repo.index.write()
+        with self.index_lock:
+            tree = self._repo.index.write_tree()
+            self._repo.index.write()
 
         # get parent
         if parents is None:
@@ -178,7 +537,17 @@ class Repository:
         return self._repo.create_commit(ref, author, committer, message, tree, parents)
 
     @classmethod
-    def clone(cls, remote_url, path, branch=None, credentials=None):
+    def clone(
+        cls,
+        remote_url,
+        path,
+        branch=None,
+        credentials=None,
+        depth=0,
+        lazy=False,
+        bare=False,
+        object_store=None,
+    ):
         """Clone a repo in a give path and update the working directory with
         a checkout to head (GIT_CHECKOUT_SAFE_CREATE)
 
@@ -189,11 +558,42 @@ class Repository:
         :param str branch: Branch to checkout after the
         clone. The default is to use the remote's default branch.
 
+        :param int depth: How many commits of history to clone. The default
+        is to clone all of it.
+
+        :param bool lazy: Leave the working directory empty, except for the
+        ignore files. The rest is hydrated on demand.
+
+        :param bool bare: Don't make a working directory at all.
+
+        :param ObjectStore object_store: Take the objects from this store,
+        shared with the other clones of the remote. The whole history is
+        kept in the store, so `depth` doesn't apply.
+
         """
 
+        if object_store is not None:
+            return cls._clone_from_store(
+                remote_url, path, branch, credentials, object_store, lazy, bare
+            )
+
+        if bare:
+            repo = clone_repository(
+                remote_url,
+                path,
+                bare=True,
+                checkout_branch=branch,
+                callbacks=credentials,
+                depth=depth,
+            )
+            return cls(repo)
+
+        if lazy:
+            return cls._clone_lazily(remote_url, path, branch, credentials, depth)
+
         # try:
         repo = clone_repository(
-            remote_url, path, checkout_branch=branch, callbacks=credentials
+            remote_url, path, checkout_branch=branch, callbacks=credentials, depth=depth
         )
         # except Exception:
         # log.error("Error on cloning the repository: ", exc_info=True)
@@ -201,6 +601,219 @@ class Repository:
         repo.checkout_head()
         return cls(repo)
 
+    @classmethod
+    def _clone_lazily(cls, remote_url, path, branch, credentials, depth):
+        # a bare clone skips the checkout, then it gets a working directory
+        repo = clone_repository(
+            remote_url,
+            os.path.join(path, ".git"),
+            bare=True,
+            checkout_branch=branch,
+            callbacks=credentials,
+            depth=depth,
+        )
+        repo.config["core.bare"] = False
+
+        return cls._open_lazily(path)
+
+    @classmethod
+    def _open_lazily(cls, path):
+        """
+        Opens a fresh clone, with nothing checked out, as a lazy one: only
+        the index and the ignore files are written.
+        """
+
+        repo = GitRepository(path, flags=RepositoryOpenFlag.NO_SEARCH)
+        repo.config["gitfs.lazy"] = True
+        repo.index.read_tree(repo.head.peel(Tree))
+        repo.index.write()
+
+        repository = cls(repo)
+        repository.lazy = True
+
+        for hydrated_path in HYDRATED_PATHS:
+            repository.hydrate(hydrated_path)
+        return repository
+
+    @classmethod
+    def _clone_from_store(
+        cls, remote_url, path, branch, credentials, object_store, lazy, bare
+    ):
+        """
+        Makes a clone which borrows its objects from `object_store`, through
+        git's alternates. Only what the store lacks is fetched from the
+        remote, then the clone's refs are pointed at what the store has.
+        """
+
+        if branch is None:
+            raise ValueError("Cloning from an object store needs a branch")
+
+        head = object_store.fetch(branch, credentials)
+
+        repo = init_repository(path, bare=bare)
+        alternates = os.path.join(repo.path, "objects", "info", "alternates")
+        with open(alternates, "w") as alternates_file:
+            alternates_file.write(f"{object_store.objects_path}\n")
+        repo.config["gitfs.objectstore"] = object_store.path
+
+        # the alternates are read when the repository is opened
+        repo = GitRepository(repo.path, flags=RepositoryOpenFlag.NO_SEARCH)
+        repo.remotes.create("origin", remote_url)
+        repo.config["remote.origin.tagopt"] = "--no-tags"
+        repo.config[f"branch.{branch}.remote"] = "origin"
+        repo.config[f"branch.{branch}.merge"] = f"refs/heads/{branch}"
+
+        repo.create_reference(f"refs/remotes/origin/{branch}", head)
+        repo.create_reference(f"refs/heads/{branch}", head)
+        repo.set_head(f"refs/heads/{branch}")
+        metrics.increment("object_store_clones")
+
+        if bare:
+            repository = cls(repo)
+        elif lazy:
+            repository = cls._open_lazily(path)
+        else:
+            repo.checkout_head(strategy=CheckoutStrategy.FORCE)
+            repository = cls(repo)
+
+        repository.object_store = object_store
+        return repository
+
+    @classmethod
+    def reopen(
+        cls, remote_url, path, branch=None, credentials=None, lazy=False, bare=False
+    ):
+        """Reuse the clone left in a given path by an earlier mount, instead
+        of cloning again. Only what changed on the remote in the meantime is
+        fetched, and merged by the next sync.
+
+        :param str remote_url: URL of the repository which should be there
+
+        :param str path: Where the earlier mount cloned it
+
+        :param str branch: Branch which should be checked out
+
+        :param bool lazy: Whether the working directory should be a lazy one
+
+        :param bool bare: Whether it should be a bare clone
+
+        Returns None if there's no repository in `path` and raises ValueError
+        if it's not a clone of `remote_url`, with `branch` checked out.
+        """
+
+        try:
+            repo = GitRepository(path, flags=RepositoryOpenFlag.NO_SEARCH)
+        except GitError:
+            return None
+
+        if "origin" not in repo.remotes.names():
+            raise ValueError(f"{path} has no origin remote")
+
+        url = repo.remotes["origin"].url
+        if url != remote_url:
+            raise ValueError(f"{path} is a clone of {url}, not of {remote_url}")
+
+        cloned_lazily = "gitfs.lazy" in repo.config and repo.config.get_bool(
+            "gitfs.lazy"
+        )
+        if repo.is_bare != bare:
+            kind = "bare" if repo.is_bare else "non-bare"
+            raise ValueError(f"{path} has a {kind} clone")
+
+        if cloned_lazily != lazy:
+            kind = "lazy" if cloned_lazily else "full"
+            raise ValueError(f"{path} has a {kind} working directory")
+
+        repository = cls(repo)
+        repository.lock_clone()
+
+        # a merge left halfway leaves HEAD on one of the merge's branches
+        if branch and not repo.head_is_detached:
+            if repo.head.shorthand in MERGE_BRANCHES:
+                log.info("Check %s out again, the last merge was left halfway", branch)
+                repo.set_head(f"refs/heads/{branch}")
+
+        if repo.head_is_detached or (branch and repo.head.shorthand != branch):
+            repository.clone_lock.close()
+            raise ValueError(f"{path} doesn't have {branch} checked out")
+
+        repository.lazy = lazy
+        if "gitfs.objectstore" in repo.config:
+            repository.object_store = ObjectStore(
+                repo.config["gitfs.objectstore"], remote_url
+            )
+        repository.recover()
+        repository.fetch("origin", repo.head.shorthand, credentials)
+        return repository
+
+    def lock_clone(self):
+        """
+        Keeps other processes from reusing the clone while it's mounted, with
+        a lock on a file of its git directory, held for as long as the process
+        runs. Raises ValueError if another process holds it.
+        """
+
+        lock_file = open(os.path.join(self._repo.path, "gitfs.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise ValueError(f"{self._repo.path} is used by another mount") from None
+
+        self.clone_lock = lock_file
+
+    def recover(self):
+        """
+        Cleans up after a mount which didn't stop cleanly: drops a stale index
+        lock and throws away a merge left halfway, along with its branches,
+        which the next sync makes again.
+        """
+
+        index_lock = os.path.join(self._repo.path, "index.lock")
+        if os.path.exists(index_lock):
+            log.info("Remove stale %s", index_lock)
+            os.remove(index_lock)
+
+        merge_branches = [
+            reference
+            for reference in (f"refs/heads/{name}" for name in MERGE_BRANCHES)
+            if self._repo.references.get(reference) is not None
+        ]
+
+        if merge_branches or self._repo.state() != RepositoryState.NONE:
+            log.info("Abort the merge left by the last mount")
+            self._repo.state_cleanup()
+            self.checkout_head(strategy=CheckoutStrategy.FORCE)
+
+        for reference in merge_branches:
+            self._repo.references.delete(reference)
+
+    def stage_all(self, ignore=()):
+        """
+        Stages every change in the working directory (e.g.: writes which
+        weren't committed before the last mount went away), except for the
+        ignored paths. Returns the added and the removed paths.
+        """
+
+        added, removed = [], []
+        with self.index_lock:
+            for path, status in self._status().items():
+                if path in ignore:
+                    continue
+
+                if status & GIT_STATUS_INDEX_DELETED:
+                    removed.append(path)
+                elif status & GIT_STATUS_WT_DELETED:
+                    self._repo.index.remove(path)
+                    removed.append(path)
+                else:
+                    self._repo.index.add(path)
+                    added.append(path)
+            self._repo.index.write()
+            self.forget_index_tree()
+
+        return sorted(added), sorted(removed)
+
     def _is_searched_entry(self, entry_name, searched_entry, path_components):
         """
         Checks if a tree entry is the one that is being searched for. For
@@ -310,27 +923,77 @@ class Repository:
             lambda entry: self._repo[entry.id],
         )
 
-    def get_git_object_default_stats(self, ref, path):
-        types = {
-            GIT_FILEMODE_LINK: {"st_mode": S_IFLNK | 0o444},
-            GIT_FILEMODE_TREE: {"st_mode": S_IFDIR | 0o555, "st_nlink": 2},
-            GIT_FILEMODE_BLOB: {"st_mode": S_IFREG | 0o444},
-            GIT_FILEMODE_BLOB_EXECUTABLE: {"st_mode": S_IFREG | 0o555},
-        }
+    def get_git_object_id(self, tree, path):
+        """
+        Returns the id of the git object with the relative path <path>,
+        looked up directly by path instead of walking the whole tree.
+
+        :param tree: a `pygit2.Tree` instance
+        :param path: the relative path of the object
+        :type path: str
+        :returns: the object's id in case of success, or None otherwise.
+        :rtype: `pygit2.Oid`, None
+        """
+
+        if path == "/":
+            return tree.id
+
+        try:
+            return tree[path.lstrip("/")].id
+        except KeyError:
+            return None
 
+    def get_git_object_default_stats(self, ref, path):
         if path == "/":
-            return types[GIT_FILEMODE_TREE]
+            return dict(DEFAULT_STATS[GIT_FILEMODE_TREE])
 
         obj_type = self.get_git_object_type(ref, path)
         if obj_type is None:
             return obj_type
 
-        stats = types[obj_type]
+        stats = dict(DEFAULT_STATS[obj_type])
         if obj_type in [GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE]:
             stats["st_size"] = self.get_blob_size(ref, path)
 
         return stats
 
+    def get_tree_entry_stats(self, entry):
+        """
+        Returns the same stats as `get_git_object_default_stats`, for an entry
+        of an already resolved tree.
+
+        :param entry: an object from a `pygit2.Tree`
+        :returns: the stats of the entry, or None for entries which aren't
+            files, links or directories (e.g.: submodules)
+        :rtype: dict, None
+        """
+
+        stats = DEFAULT_STATS.get(entry.filemode)
+        if stats is None:
+            return None
+
+        stats = dict(stats)
+        if entry.filemode in [GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE]:
+            stats["st_size"] = self.get_object_size(entry.id)
+
+        return stats
+
+    def get_object_size(self, oid):
+        """
+        Returns the size of an object, reading only its header when libgit2
+        allows it.
+
+        :param oid: the id of the object
+        :rtype: int
+        """
+
+        read_header = getattr(self._repo.odb, "read_header", None)
+        if read_header is None:
+            return self._repo[oid].size
+
+        _, size = read_header(oid)
+        return size
+
     def get_blob_size(self, tree, path):
         """
         Returns the size of a the data contained by a blob object
@@ -461,38 +1124,60 @@ class Repository:
         :rtype: DivergeCommits (namedtuple)
         """
 
-        common_parent = None
-        first_commits = CommitsList()
-        second_commits = CommitsList()
+        first, second = first_branch.target, second_branch.target
+
+        common_parent = self._repo.merge_base(first, second)
+        if common_parent is not None:
+            common_parent = self._repo[common_parent]
+
+        first_commits = self._commits_not_in(first, second)
+        second_commits = self._commits_not_in(second, first)
+
+        return DivergeCommits(common_parent, first_commits, second_commits)
+
+    def _commits_not_in(self, target, other):
+        """
+        Walks the commits reachable from `target`, but not from `other`,
+        newest first. libgit2 stops the walk at the commits both share, so
+        the cost depends on the divergence, not on the history's length.
+        """
+
+        commits = CommitsList()
 
-        walker = self.walk_branches(GIT_SORT_TOPOLOGICAL, first_branch, second_branch)
+        walker = self._repo.walk(target, GIT_SORT_TOPOLOGICAL)
+        walker.hide(other)
+        for commit in walker:
+            commits.append(commit)
 
-        for first_commit, second_commit in walker:
-            if first_commit in second_commits or second_commit in first_commits:
-                break
+        return commits
 
-            if first_commit not in first_commits:
-                first_commits.append(first_commit)
-            if second_commit not in second_commits:
-                second_commits.append(second_commit)
 
-            if second_commit.id == first_commit.id:
-                break
+class PushCallbacks(RemoteCallbacks):
+    """
+    The callbacks of a single push: credentials and certificate checks are
+    borrowed from the mount's callbacks, while the pushed bytes are counted.
+    """
 
-        try:
-            index = second_commits.index(first_commit)
-        except ValueError:
-            pass
-        else:
-            second_commits = second_commits[:index]
-            common_parent = first_commit
+    def __init__(self, callbacks=None):
+        super().__init__(
+            credentials=getattr(callbacks, "credentials", None),
+            certificate_check=getattr(callbacks, "certificate_check", None),
+        )
+        self.bytes_pushed = 0
 
-        try:
-            index = first_commits.index(second_commit)
-        except ValueError:
-            pass
-        else:
-            first_commits = first_commits[:index]
-            common_parent = second_commit
+    def push_transfer_progress(self, objects_pushed, total_objects, bytes_pushed):
+        self.bytes_pushed = bytes_pushed
 
-        return DivergeCommits(common_parent, first_commits, second_commits)
+
+def tracking_reference(upstream, name):
+    """
+    The name of our copy of the remote's reference `name`: its branches are
+    kept as remote-tracking branches and its tags as they are. Other
+    references aren't kept.
+    """
+
+    if name.startswith("refs/heads/"):
+        return f"refs/remotes/{upstream}/{name[len('refs/heads/') :]}"
+    if name.startswith("refs/tags/"):
+        return name
+    return None
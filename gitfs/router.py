@@ -17,6 +17,7 @@ import inspect
 import os
 import re
 import shutil
+import threading
 import time
 from errno import ENOSYS
 from grp import getgrnam
@@ -24,10 +25,82 @@ from pwd import getpwnam
 
 from mfusepy import FUSE, FuseOSError
 
-from gitfs.cache import CachedIgnore, lru_cache
+from gitfs.cache import BlobCache, CachedIgnore, lru_cache
 from gitfs.events import fetch, idle, shutting_down
 from gitfs.log import log
+from gitfs.metrics import metrics
+from gitfs.object_store import ObjectStore
 from gitfs.repository import Repository
+from gitfs.utils.locks import PathLocks
+from gitfs.worker.history import HistoryIndexer
+
+
+# operations which change the paths they get, so they can't run along with
+# other operations on the same paths
+MUTATING_OPERATIONS = frozenset(
+    [
+        "chmod",
+        "chown",
+        "create",
+        "fsync",
+        "link",
+        "mkdir",
+        "release",
+        "removexattr",
+        "rename",
+        "rmdir",
+        "setxattr",
+        "symlink",
+        "truncate",
+        "unlink",
+        "utimens",
+        "write",
+    ]
+)
+
+# operations which get a second path, besides the one they are routed by
+TWO_PATH_OPERATIONS = frozenset(["link", "rename"])
+
+# operations mfusepy should leave to libfuse's defaults
+UNSUPPORTED_OPERATIONS = frozenset(
+    ["bmap", "ioctl", "poll", "flock", "fallocate", "lock", "read_buf"]
+)
+
+# operations which are routed to the views
+SUPPORTED_OPERATIONS = frozenset(
+    [
+        "getattr",
+        "readdir",
+        "read",
+        "write",
+        "create",
+        "mkdir",
+        "rmdir",
+        "unlink",
+        "rename",
+        "chmod",
+        "chown",
+        "truncate",
+        "open",
+        "release",
+        "fsync",
+        "symlink",
+        "readlink",
+        "link",
+        "mknod",
+        "statfs",
+        "flush",
+        "opendir",
+        "releasedir",
+        "fsyncdir",
+        "access",
+        "getxattr",
+        "listxattr",
+        "removexattr",
+        "setxattr",
+        "utimens",
+    ]
+)
 
 
 class Router:
@@ -55,6 +128,10 @@ class Router:
 
         """
 
+        # time to first read and to full history are measured from here
+        self.started = time.monotonic()
+        self.first_read = None
+
         self.remote_url = remote_url
         self.repo_path = repo_path
         self.mount_path = mount_path
@@ -66,14 +143,85 @@ class Router:
 
         self.routes = []
 
-        log.info(f"Cloning into {self.repo_path}")
+        # where the repository is served, in a multi-repository mount
+        self.prefix = kwargs.get("prefix", "")
+        # asks the repository's fetch worker for older history
+        self.deepen_request = kwargs.get("deepen_request")
+        # where the branches and the tags are served, if at all
+        self.refs_path = kwargs.get("refs_path")
+        # where the trees as of given instants are served, if at all
+        self.at_path = kwargs.get("at_path")
+
+        # a persistent clone is kept on unmount and reused by the next mount
+        self.persistent_clone = kwargs.get("persistent_clone", False)
+
+        # files are written in the working directory only once they change
+        lazy_workdir = kwargs.get("lazy_workdir", False)
+        # read-only mounts, served from the object database, need no
+        # working directory at all
+        self.bare = kwargs.get("bare", False)
+
+        self.repo = None
+        if self.persistent_clone:
+            self.repo = Repository.reopen(
+                self.remote_url,
+                self.repo_path,
+                self.branch,
+                credentials,
+                lazy=lazy_workdir,
+                bare=self.bare,
+            )
+
+        if self.repo is None:
+            log.info(f"Cloning into {self.repo_path}")
+
+            # clones of the same remote share their objects, if asked to
+            object_store = None
+            if kwargs.get("object_store"):
+                object_store = ObjectStore.for_remote(
+                    kwargs["object_store"], self.remote_url
+                )
+
+            self.repo = Repository.clone(
+                self.remote_url,
+                self.repo_path,
+                self.branch,
+                credentials,
+                depth=kwargs.get("clone_depth", 0),
+                lazy=lazy_workdir,
+                bare=self.bare,
+                object_store=object_store,
+            )
+            log.info("Done cloning")
+
+            if self.persistent_clone:
+                self.repo.lock_clone()
+        else:
+            log.info(f"Reusing the clone in {self.repo_path}")
+
+        self.repo.credentials = credentials
+        self.repo.all_refs = bool(self.refs_path)
 
-        self.repo = Repository.clone(
-            self.remote_url, self.repo_path, self.branch, credentials
+        # Blobs which aren't cached are read from the object database (and
+        # inflated), which may take long. Those reads are capped, so they
+        # can't keep all the FUSE threads busy.
+        self.admission = threading.BoundedSemaphore(
+            kwargs.get("max_heavy_operations", 4)
         )
-        log.info("Done cloning")
 
-        self.repo.credentials = credentials
+        # the repositories of a multi-repository mount share one blob cache
+        blob_cache = kwargs.get("blob_cache")
+        if blob_cache is not None:
+            self.repo.blobs = blob_cache.for_repository(
+                self.repo, admission=self.admission
+            )
+        else:
+            self.repo.blobs = BlobCache(
+                self.repo,
+                kwargs.get("blob_cache_size", 64 * 1024 * 1024),
+                arena=kwargs.get("blob_arena"),
+                admission=self.admission,
+            )
 
         submodules = os.path.join(self.repo_path, ".gitmodules")
         ignore = os.path.join(self.repo_path, ".gitignore")
@@ -93,11 +241,43 @@ class Router:
         self.max_size = kwargs["max_size"]
         self.max_offset = kwargs["max_offset"]
 
-        self.repo.commits.update()
+        self.attr_timeout = kwargs.get("attr_timeout", 1.0)
+        self.entry_timeout = kwargs.get("entry_timeout", 1.0)
+        self.kernel_cache = kwargs.get("kernel_cache")
+
+        # Operations on different paths run in parallel, while the ones on
+        # the same path are serialized if any of them changes it.
+        self.locks = PathLocks()
+        self.views_lock = threading.Lock()
+
+        # history/ is indexed in the background, once the mount is up
+        self.history_indexer = HistoryIndexer(
+            repository=self.repo, started=self.started, daemon=True
+        )
+
+        if self.persistent_clone and not self.bare:
+            self.recover_changes()
 
         self.workers = []
 
+    def recover_changes(self):
+        """
+        Commits what the last mount wrote in the working directory, but
+        didn't get to commit.
+        """
+
+        added, removed = self.repo.stage_all(ignore=self.repo.ignore)
+        if added or removed:
+            log.info("Recover %d changes from the last mount", len(added + removed))
+            self.commit_queue.commit(
+                add=added,
+                remove=removed,
+                message="Recover changes from the last mount",
+            )
+
     def init(self, path):
+        self.history_indexer.start()
+
         for worker in self.workers:
             worker.start()
 
@@ -112,7 +292,8 @@ class Router:
             worker.join()
         log.debug("Workers stopped")
 
-        shutil.rmtree(self.repo_path)
+        if not self.persistent_clone:
+            shutil.rmtree(self.repo_path)
         log.info("Successfully umounted %s", self.mount_path)
 
     def __call__(self, operation, *args):
@@ -134,11 +315,21 @@ class Router:
 
         if operation in ["destroy", "init"]:
             view = self
+            paths = []
         else:
             path = args[0]
+            paths = [path]
+            if operation in TWO_PATH_OPERATIONS:
+                paths.append(args[1])
+
             view, relative_path = self.get_view(path)
             args = (relative_path,) + args[1:]
 
+            if operation == "read" and self.first_read is None:
+                self.first_read = time.monotonic() - self.started
+                metrics.set("time_to_first_read", round(self.first_read, 3))
+                log.info("First read, %.3f seconds after startup", self.first_read)
+
         log.debug(f"Call {operation} {view.__class__.__name__} with {args!r}")
 
         if not hasattr(view, operation):
@@ -146,7 +337,14 @@ class Router:
             raise FuseOSError(ENOSYS)
 
         idle.clear()
-        return getattr(view, operation)(*args)
+
+        # Listings are streamed, so readdir's generator is consumed after the
+        # locks are released. That's fine, since it only reads: it walks a
+        # git tree, which never changes, or the working directory, through
+        # scandir, which copes with entries coming and going meanwhile.
+        exclusive = operation in MUTATING_OPERATIONS
+        with self.locks.hold(paths, exclusive=exclusive):
+            return getattr(view, operation)(*args)
 
     def register(self, routes):
         for regex, view in routes:
@@ -169,55 +367,96 @@ class Router:
             if result is None:
                 continue
 
-            groups = result.groups()
             relative_path = re.sub(route["regex"], "", path)
             relative_path = "/" if not relative_path else relative_path
 
-            cache_key = result.group(0)
+            cache_key = f"{self.prefix}{result.group(0)}"
             log.debug("Router: Cache key for %s: %s", path, cache_key)
 
-            view = lru_cache.get_if_exists(cache_key)
-            if view is not None:
-                log.debug("Router: Serving %s from cache", path)
-                return view, relative_path
-
-            kwargs = result.groupdict()
-
-            # TODO: move all this to a nice config variable
-            kwargs["repo"] = self.repo
-            kwargs["ignore"] = self.repo.ignore
-            kwargs["repo_path"] = self.repo_path
-            kwargs["mount_path"] = self.mount_path
-            kwargs["regex"] = route["regex"]
-            kwargs["relative_path"] = relative_path
-            kwargs["current_path"] = self.current_path
-            kwargs["history_path"] = self.history_path
-            kwargs["uid"] = self.uid
-            kwargs["gid"] = self.gid
-            kwargs["branch"] = self.branch
-            kwargs["mount_time"] = self.mount_time
-            kwargs["queue"] = self.commit_queue
-            kwargs["max_size"] = self.max_size
-            kwargs["max_offset"] = self.max_offset
-
-            args = set(groups) - set(kwargs.values())
-            view = route["view"](*args, **kwargs)
-
-            lru_cache[cache_key] = view
-            log.debug("Router: Added %s to cache", path)
+            # views hold state (e.g.: the files opened for writing), so all
+            # the threads must get the same one
+            with self.views_lock:
+                view = lru_cache.get_if_exists(cache_key)
+                if view is not None:
+                    log.debug("Router: Serving %s from cache", path)
+                    return view, relative_path
+
+                view = self.create_view(route, result, relative_path)
+                lru_cache[cache_key] = view
+                log.debug("Router: Added %s to cache", path)
 
             return view, relative_path
 
         raise ValueError(f"Found no view for '{path}'")
 
+    def create_view(self, route, result, relative_path):
+        groups = result.groups()
+        kwargs = result.groupdict()
+
+        # TODO: move all this to a nice config variable
+        kwargs["repo"] = self.repo
+        kwargs["ignore"] = self.repo.ignore
+        kwargs["repo_path"] = self.repo_path
+        kwargs["mount_path"] = self.mount_path
+        kwargs["regex"] = route["regex"]
+        kwargs["relative_path"] = relative_path
+        kwargs["current_path"] = self.current_path
+        kwargs["history_path"] = self.history_path
+        kwargs["uid"] = self.uid
+        kwargs["gid"] = self.gid
+        kwargs["branch"] = self.branch
+        kwargs["mount_time"] = self.mount_time
+        kwargs["queue"] = self.commit_queue
+        kwargs["max_size"] = self.max_size
+        kwargs["max_offset"] = self.max_offset
+        kwargs["prefix"] = self.prefix
+        kwargs["deepen_request"] = self.deepen_request
+        kwargs["refs_path"] = self.refs_path
+        kwargs["at_path"] = self.at_path
+
+        args = set(groups) - set(kwargs.values())
+        return route["view"](*args, **kwargs)
+
     def init_with_config(self, conn_info=None, config=None):
         """
         Initialize filesystem with configuration.
         Called by mfusepy during mount process.
+
+        Views report their own inode numbers (history ones are derived from
+        git object ids, so they are stable across mounts). The entry and
+        attribute timeouts apply to the whole mount, since libfuse's
+        high-level API doesn't allow them to be set per path. Longer timeouts
+        are safe for current/, since merges invalidate the paths they change.
         """
+
+        if config is not None:
+            config.use_ino = 1
+            config.attr_timeout = self.attr_timeout
+            config.entry_timeout = self.entry_timeout
+
+        if self.kernel_cache is not None:
+            self.kernel_cache.attach()
+
         # Delegate to the regular init method
         return self.init(None)
 
+    def keep_cache(self, path):
+        """
+        Tells if the kernel may keep the cached pages of `path` between opens.
+        """
+
+        view, _ = self.get_view(path)
+        return view.keep_cache
+
+    def direct_io(self, path):
+        """
+        Tells if reads and writes of `path` should bypass the kernel's page
+        cache.
+        """
+
+        view, _ = self.get_view(path)
+        return view.direct_io
+
     def __getattr__(self, operation):
         """
         Handle FUSE operations by either returning None for unsupported operations
@@ -230,54 +469,11 @@ class Router:
 
         # Operations that are not supported should return None
         # so that mfusepy can ignore them completely
-        unsupported_operations = {
-            "bmap",
-            "ioctl",
-            "poll",
-            "flock",
-            "fallocate",
-            "lock",
-            "read_buf",
-        }
-
-        if operation in unsupported_operations:
+        if operation in UNSUPPORTED_OPERATIONS:
             return None
 
         # For supported FUSE operations, return a callable that delegates to __call__
-        supported_operations = {
-            "getattr",
-            "readdir",
-            "read",
-            "write",
-            "create",
-            "mkdir",
-            "rmdir",
-            "unlink",
-            "rename",
-            "chmod",
-            "chown",
-            "truncate",
-            "open",
-            "release",
-            "fsync",
-            "symlink",
-            "readlink",
-            "link",
-            "mknod",
-            "statfs",
-            "flush",
-            "opendir",
-            "releasedir",
-            "fsyncdir",
-            "access",
-            "getxattr",
-            "listxattr",
-            "removexattr",
-            "setxattr",
-            "utimens",
-        }
-
-        if operation in supported_operations:
+        if operation in SUPPORTED_OPERATIONS:
             return lambda *args: self(operation, *args)
 
         # For any other operation, return None (unsupported)
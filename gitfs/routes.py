@@ -13,7 +13,19 @@
 # limitations under the License.
 
 
-from gitfs.views import CommitView, CurrentView, HistoryView, IndexView
+import re
+
+from gitfs.views import (
+    AtView,
+    CommitView,
+    CurrentView,
+    HeadView,
+    HistoryView,
+    IndexView,
+    RefsView,
+    StatusView,
+)
+from gitfs.views.status import STATUS_FILE
 
 
 # TODO: replace regex with the strict one for the Historyview
@@ -31,11 +43,23 @@ def prepare_routes(args):
         (rf"^/{args.history_path}/(?P<date>\d{{4}}-\d{{1,2}}-\d{{1,2}})", HistoryView)
     )
     routes.append((rf"^/{args.history_path}", HistoryView))
+    routes.append((rf"^/{re.escape(STATUS_FILE)}$", StatusView))
+
+    if args.refs_path:
+        routes.append((rf"^/{re.escape(args.refs_path)}(?=/|$)", RefsView))
+
+    if args.at_path:
+        at_path = re.escape(args.at_path)
+        routes.append((rf"^/{at_path}/(?P<timestamp>[^/]+)", AtView))
+        routes.append((rf"^/{at_path}(?=/|$)", AtView))
+
+    # bare mounts serve current/ from the object database
+    current_view = HeadView if args.bare else CurrentView
 
     if "/" == args.current_path:
-        routes.append((r"^/", CurrentView))
+        routes.append((r"^/", current_view))
     else:
-        routes.append((rf"^/{args.current_path}", CurrentView))
+        routes.append((rf"^/{args.current_path}", current_view))
         routes.append((r"^/", IndexView))
 
     return routes
@@ -15,6 +15,7 @@
 
 import getpass
 import grp
+import hashlib
 import logging
 import os
 import socket
@@ -33,6 +34,8 @@ class Args:
     def __init__(self, parser):
         self.DEFAULTS = OrderedDict(
             [
+                # needed before repo_path, which depends on it
+                ("persistent_clone", (False, "bool")),
                 ("repo_path", (self.get_repo_path, "string")),
                 ("user", (self.get_current_user, "string")),
                 ("group", (self.get_current_group, "string")),
@@ -61,6 +64,28 @@ class Args:
                 ("max_open_files", (-1, "int")),
                 ("history_path", ("history", "string")),
                 ("current_path", ("current", "string")),
+                ("attr_timeout", (1, "float")),
+                ("entry_timeout", (1, "float")),
+                ("merge_strategy", ("accept_mine", "string")),
+                ("maintenance_interval", (10 * 60, "float")),  # 10 min
+                ("maintenance_loose_objects", (512, "int")),
+                ("push_interval", (0, "float")),
+                ("push_delay", (0, "float")),
+                ("local_first", (False, "bool")),
+                ("max_unpushed_commits", (0, "int")),
+                ("async_runtime", (False, "bool")),
+                ("max_heavy_operations", (4, "int")),
+                ("clone_depth", (0, "int")),
+                ("lazy_workdir", (False, "bool")),
+                ("bare", (False, "bool")),
+                ("blob_cache_size", (64, "float")),
+                ("repos", ("", "string")),
+                ("max_fetches", (4, "int")),
+                ("object_store", ("", "string")),
+                ("blob_arena", ("", "string")),
+                ("blob_arena_size", (256, "float")),
+                ("refs_path", ("", "string")),
+                ("at_path", ("", "string")),
             ]
         )
         self.config = self.build_config(parser.parse_args())
@@ -81,6 +106,16 @@ class Args:
         else:
             args.allow_root = True
 
+        # AcceptMine merges in the working directory, which a lazy one can't
+        # do without hydrating every file
+        if args.lazy_workdir and args.merge_strategy == "accept_mine":
+            args.merge_strategy = "accept_mine_in_memory"
+
+        # the repositories of a multi-repository mount are served read-only,
+        # since the state of the syncs is shared by the whole process
+        if args.repos:
+            args.bare = True
+
         # check log_level
         if args.debug:
             args.log_level = "debug"
@@ -184,6 +219,12 @@ class Args:
         return f"{args.user}@{socket.gethostname()}"
 
     def get_repo_path(self, args):
+        if args.persistent_clone:
+            # the same remote and branch get the same clone on every mount
+            branch = getattr(args, "branch", None) or self.DEFAULTS["branch"][0]
+            key = f"{args.remote_url}#{branch}".encode()
+            return os.path.join("/var/lib/gitfs", hashlib.sha1(key).hexdigest())
+
         return tempfile.mkdtemp(dir="/var/lib/gitfs")
 
     def get_ssh_key(self, args):
@@ -0,0 +1,42 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+
+
+class Backoff:
+    """
+    An exponentially growing delay, between `minimum` and `maximum` seconds.
+
+    Delays are jittered downwards, so that mounts which started together
+    don't keep hitting the remote at the same time.
+    """
+
+    def __init__(self, minimum, maximum, factor=2, jitter=0.2):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.factor = factor
+        self.jitter = jitter
+
+        self.current = minimum
+
+    def reset(self):
+        self.current = self.minimum
+
+    def increase(self):
+        self.current = min(self.current * self.factor, self.maximum)
+
+    def delay(self):
+        return self.current * random.uniform(1 - self.jitter, 1)
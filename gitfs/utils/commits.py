@@ -18,11 +18,19 @@ class CommitsList:
         self.commits = commits or []
         self.hashes = hashes or []
 
+        # first position of each hash, for constant time lookups
+        self.positions = {}
+        for index, commit_hash in enumerate(self.hashes):
+            self.positions.setdefault(commit_hash, index)
+
     def __contains__(self, commit):
-        return str(commit.id) in self.hashes
+        return str(commit.id) in self.positions
 
     def index(self, commit):
-        return self.hashes.index(str(commit.id))
+        try:
+            return self.positions[str(commit.id)]
+        except KeyError:
+            raise ValueError(f"{commit.id} is not in list") from None
 
     def __getitem__(self, val):
         commits = self.commits[val]
@@ -33,8 +41,11 @@ class CommitsList:
         return self.commits.__iter__()
 
     def append(self, commit):
+        commit_hash = str(commit.id)
+        self.positions.setdefault(commit_hash, len(self.hashes))
+
         self.commits.append(commit)
-        self.hashes.append(str(commit.id))
+        self.hashes.append(commit_hash)
 
     def __repr__(self):
         return self.commits.__repr__()
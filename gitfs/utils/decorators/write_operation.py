@@ -18,27 +18,30 @@ from functools import wraps
 
 from mfusepy import FuseOSError
 
-from gitfs.events import fetch_successful, push_successful, sync_done, syncing, writers
-from gitfs.log import log
+from gitfs.events import (
+    fetch_successful,
+    local_first,
+    push_successful,
+    read_only,
+    sync_state,
+)
 
 
 def write_operation(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        if not fetch_successful.is_set() or not push_successful.is_set():
+        if read_only.is_set():
             raise FuseOSError(EROFS)
 
-        global writers
-        writers += 1
-
-        if syncing.is_set():
-            log.debug("WriteOperation: Wait until syncing is done")
-            sync_done.wait()
+        remote_failed = not fetch_successful.is_set() or not push_successful.is_set()
+        if remote_failed and not local_first.is_set():
+            raise FuseOSError(EROFS)
 
+        sync_state.begin_write()
         try:
             result = f(*args, **kwargs)
         finally:
-            writers -= 1
+            sync_state.end_write()
 
         return result
 
@@ -0,0 +1,70 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from hashlib import blake2b
+
+
+# Virtual inodes live above 2**62, far away from the inode numbers the
+# filesystem holding the working directory hands out for current/.
+VIRTUAL_INODE_BASE = 1 << 62
+VIRTUAL_INODE_MASK = VIRTUAL_INODE_BASE - 1
+
+ROOT_INODE = 1
+
+
+def oid_to_inode(oid):
+    """
+    Derive a stable inode number from a git object id.
+
+    The same object always gets the same inode, on every mount, so the
+    kernel can keep serving immutable history from its caches.
+
+    :param oid: a `pygit2.Oid`
+    :rtype: int
+    """
+
+    return (int.from_bytes(oid.raw[:8], "big") & VIRTUAL_INODE_MASK) | (
+        VIRTUAL_INODE_BASE
+    )
+
+
+def path_to_inode(path, prefix=""):
+    """
+    Derive a stable inode number for a virtual directory which isn't backed
+    by a git object (e.g.: `/history/2014-09-20`).
+
+    :param str path: the full path of the virtual entry
+    :param str prefix: where the repository is served, in a multi-repository
+                       mount, so that its entries don't share inodes with
+                       the other repositories' ones
+    :rtype: int
+    """
+
+    if prefix:
+        path = f"{prefix}:{path}"
+    digest = blake2b(path.encode("utf-8"), digest_size=8).digest()
+    return (int.from_bytes(digest, "big") & VIRTUAL_INODE_MASK) | VIRTUAL_INODE_BASE
+
+
+def root_inode(prefix=""):
+    """
+    The inode of a repository's root: the root of the mount, unless the
+    repository is served under `prefix` in a multi-repository mount.
+
+    :param str prefix: where the repository is served, if not at the root
+    :rtype: int
+    """
+
+    return path_to_inode("/", prefix) if prefix else ROOT_INODE
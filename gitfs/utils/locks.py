@@ -0,0 +1,117 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    A reader/writer lock: any number of readers or a single writer.
+
+    Waiting writers keep new readers out, so a steady stream of reads can't
+    starve them. It isn't reentrant.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self.writer and not self.waiting_writers
+            )
+            self.readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self.readers -= 1
+            if not self.readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            self.waiting_writers += 1
+            try:
+                self._condition.wait_for(lambda: not self.writer and not self.readers)
+            finally:
+                self.waiting_writers -= 1
+            self.writer = True
+
+    def release_write(self):
+        with self._condition:
+            self.writer = False
+            self._condition.notify_all()
+
+
+class PathLocks:
+    """
+    A `RWLock` for each path in use. Locks are created on demand and thrown
+    away once nobody holds or waits for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def _get(self, path):
+        with self._lock:
+            entry = self._locks.setdefault(path, [RWLock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _put(self, path):
+        with self._lock:
+            entry = self._locks[path]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[path]
+
+    def __len__(self):
+        return len(self._locks)
+
+    @contextmanager
+    def hold(self, paths, exclusive=False):
+        """
+        Holds the locks of all `paths`, shared or exclusive. They are taken
+        in order, so that two operations on the same paths (e.g.: renames
+        in opposite directions) can't deadlock.
+        """
+
+        held = []
+        try:
+            for path in sorted(set(paths)):
+                lock = self._get(path)
+                try:
+                    if exclusive:
+                        lock.acquire_write()
+                    else:
+                        lock.acquire_read()
+                except BaseException:
+                    self._put(path)
+                    raise
+                held.append((path, lock))
+
+            yield
+        finally:
+            for path, lock in reversed(held):
+                if exclusive:
+                    lock.release_write()
+                else:
+                    lock.release_read()
+                self._put(path)
@@ -15,6 +15,7 @@
 
 import datetime
 import re
+from functools import lru_cache
 
 
 MONTHS = [
@@ -60,6 +61,11 @@ SPEC = {
     "%%": r"%",
 }
 
+# the ISO 8601 forms of the instants `parse_timestamp` takes, most precise first
+TIMESTAMP_FORMATS = ["%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"]
+# their zone designator: `Z` (UTC) or an offset from UTC, like `+02:00`
+TIMEZONE = re.compile(r"(?:Z|(?P<sign>[+-])(?P<hours>\d\d):?(?P<minutes>\d\d))$")
+
 
 class TimeParser:
     def __init__(self, format):
@@ -77,9 +83,9 @@ class TimeParser:
 
         self.pattern = re.compile(r"(?i)" + "".join(pattern))
 
-    def match(self, daytime):
-        # match time string
-        match = self.pattern.match(daytime)
+    def match(self, daytime, whole=False):
+        # match time string, or all of it
+        match = (self.pattern.fullmatch if whole else self.pattern.match)(daytime)
         if not match:
             raise ValueError("format mismatch")
         get = match.groupdict().get
@@ -132,8 +138,18 @@ class TimeParser:
         return tuple(tm)
 
 
+@lru_cache(maxsize=32)
+def time_parser(format):
+    """
+    The TimeParser of `format`, compiled once, since the same few formats
+    are parsed over and over.
+    """
+
+    return TimeParser(format)
+
+
 def strptime(string, format="%a %b %d %H:%M:%S %Y", to_datetime=False):
-    date = TimeParser(format).match(string)
+    date = time_parser(format).match(string)
     result = datetime.date(date[0], date[1], date[2])
 
     if to_datetime and len(date) > 3:
@@ -142,3 +158,39 @@ def strptime(string, format="%a %b %d %H:%M:%S %Y", to_datetime=False):
         result = result.replace(tzinfo=None)
 
     return result
+
+
+def parse_timestamp(string):
+    """
+    Parses an instant, given as seconds since the epoch or in ISO 8601 (e.g.:
+    `2014-08-21T14:05`). ISO 8601 instants without a zone designator (`Z` or
+    an offset, like `+02:00`) are in local time, like the dates of history/.
+
+    :rtype: seconds since the epoch
+    """
+
+    if string.isdigit():
+        return int(string)
+
+    tzinfo = None
+    zone = TIMEZONE.search(string)
+    if zone is not None:
+        string = string[: zone.start()]
+        tzinfo = datetime.UTC
+        if zone.group("sign"):
+            offset = datetime.timedelta(
+                hours=int(zone.group("hours")), minutes=int(zone.group("minutes"))
+            )
+            if zone.group("sign") == "-":
+                offset = -offset
+            tzinfo = datetime.timezone(offset)
+
+    for format in TIMESTAMP_FORMATS:
+        try:
+            date = time_parser(format).match(string, whole=True)
+        except ValueError:
+            continue
+
+        return int(datetime.datetime(*date[:6], tzinfo=tzinfo).timestamp())
+
+    raise ValueError(f"invalid timestamp: {string}")
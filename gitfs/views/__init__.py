@@ -13,9 +13,14 @@
 # limitations under the License.
 
 
+from .at import AtView
 from .commit import CommitView
 from .current import CurrentView
+from .head import HeadView
 from .history import HistoryView
 from .index import IndexView
 from .passthrough import PassthroughView
 from .read_only import ReadOnlyView
+from .refs import RefsView
+from .repositories import RepositoriesView
+from .status import StatusView
@@ -0,0 +1,126 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT
+from stat import S_IFDIR
+
+from mfusepy import FuseOSError
+
+from gitfs.events import deepen, fetch
+from gitfs.log import log
+from gitfs.utils.inode import path_to_inode
+from gitfs.utils.strptime import parse_timestamp
+
+from .head import HeadView
+from .read_only import ReadOnlyView
+
+
+class AtView(HeadView):
+    """
+    Serves the tree of the mounted branch as of an instant, as
+    `at/<timestamp>/`, where the timestamp is either seconds since the epoch
+    or an ISO 8601 date, with an optional time, in local time (e.g.:
+    `at/2014-08-21T14:05/`). It's the tree of the newest commit made at or
+    before that instant, looked up in the history index on each call, so
+    that instants which the fetches catch up with follow them.
+
+    `at/` itself can't be listed, only looked up into.
+    """
+
+    # the instant, as given in the path (None for `at/` itself)
+    timestamp = None
+    # While the history is indexed in the background, lookups wait this long
+    # for it, then go on with what was indexed so far.
+    history_wait = 1
+    # the event asking for older history, if not the mount-wide one
+    deepen_request = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.instant = None
+        if self.timestamp is not None:
+            try:
+                self.instant = parse_timestamp(self.timestamp)
+            except ValueError:
+                log.debug("AtView: Invalid timestamp %s", self.timestamp)
+
+    def _commit(self):
+        if self.instant is None:
+            return None
+
+        commits = self.repo.commits
+        if not commits.ready.is_set():
+            log.debug("AtView: Wait for the history to be indexed")
+            commits.ready.wait(self.history_wait)
+
+        commit_id = commits.at(self.instant)
+        if commit_id is None:
+            self._deepen_history()
+            return None
+
+        return self.repo[commit_id]
+
+    def _deepen_history(self):
+        """
+        Asks for older history, in the background, when the instant is older
+        than all the commits a shallow clone has.
+        """
+
+        deepen_request = self.deepen_request or deepen
+        if self.repo.commits.shallow and not deepen_request.is_set():
+            log.debug("AtView: Ask for history older than %s", self.timestamp)
+            deepen_request.set()
+            fetch.set()
+
+    def _resolve(self, path):
+        commit = self._commit()
+        if commit is None:
+            return None, None
+
+        return commit, self.repo.trees.resolve(commit.tree, path)
+
+    def getattr(self, path, fh=None):
+        if self.timestamp is not None:
+            return super().getattr(path, fh)
+
+        if path != "/":
+            raise FuseOSError(ENOENT)
+
+        attrs = ReadOnlyView.getattr(self, path, fh)
+        attrs.update(
+            {
+                "st_mode": S_IFDIR | 0o555,
+                "st_nlink": 2,
+                "st_ino": path_to_inode("at:/", self.prefix),
+            }
+        )
+        return attrs
+
+    def access(self, path, amode):
+        if self.timestamp is None:
+            if path != "/":
+                raise FuseOSError(ENOENT)
+            return ReadOnlyView.access(self, path, amode)
+
+        return super().access(path, amode)
+
+    def readdir(self, path, fh):
+        if self.timestamp is None:
+            if path != "/":
+                raise FuseOSError(ENOENT)
+            return [".", ".."]
+
+        return super().readdir(path, fh)
@@ -25,6 +25,7 @@ from pygit2 import (
 )
 
 from gitfs.utils import split_path_into_components
+from gitfs.utils.inode import oid_to_inode
 
 from .read_only import ReadOnlyView
 
@@ -38,6 +39,9 @@ VALID_FILE_MODES = [
 
 
 class CommitView(ReadOnlyView):
+    # a commit's content never changes
+    keep_cache = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -75,8 +79,12 @@ class CommitView(ReadOnlyView):
         return is_valid
 
     def read(self, path, size, offset, fh):
-        data = self.repo.get_blob_data(self.commit.tree, path)
-        return data[offset : offset + size]
+        oid = self.repo.get_git_object_id(self.commit.tree, path)
+        if oid is None:
+            raise FuseOSError(ENOENT)
+
+        # hot blobs are kept by the repository's blob cache
+        return self.repo.blobs[oid][offset : offset + size]
 
     def readlink(self, path):
         obj_name = os.path.split(path)[1]
@@ -107,6 +115,9 @@ class CommitView(ReadOnlyView):
             raise FuseOSError(ENOENT)
 
         attrs.update(stats)
+        attrs["st_ino"] = oid_to_inode(
+            self.repo.get_git_object_id(self.commit.tree, path)
+        )
 
         return attrs
 
@@ -128,5 +139,22 @@ class CommitView(ReadOnlyView):
         if tree_name:
             dir_tree = self.repo.get_git_object(self.commit.tree, path)
 
-        dir_entries = [".", ".."] + [entry.name for entry in dir_tree]
-        yield from dir_entries
+        yield from [".", ".."]
+
+        base_attrs = super().getattr(path, fh)
+        base_attrs.update(
+            {"st_ctime": self.commit.commit_time, "st_mtime": self.commit.commit_time}
+        )
+
+        # The attributes of each entry come straight from the tree, sparing
+        # the kernel a getattr (and a path lookup) for each of them.
+        for entry in dir_tree:
+            stats = self.repo.get_tree_entry_stats(entry)
+            if stats is None:
+                yield entry.name
+                continue
+
+            attrs = dict(base_attrs, **stats)
+            attrs["st_ino"] = oid_to_inode(entry.id)
+
+            yield entry.name, attrs, 0
@@ -16,28 +16,48 @@
 import errno
 import os
 import re
+from itertools import count
 
 from mfusepy import FuseOSError
 
-from gitfs.events import writers
+from gitfs.events import flush, sync_state
 from gitfs.log import log
 from gitfs.utils.decorators.not_in import not_in
 from gitfs.utils.decorators.write_operation import write_operation
+from gitfs.utils.inode import path_to_inode
 
-from .passthrough import STATS, PassthroughView
+from .passthrough import PassthroughView
+
+
+# handles of files read from the object database, far above the descriptors
+# of the files from the working directory
+BLOB_HANDLES_BASE = 1 << 32
 
 
 class CurrentView(PassthroughView):
+    """
+    Serves the working directory. If it's a lazy one, the files which weren't
+    hydrated yet are served from the index (and the object database) and
+    written in the working directory right before they're changed.
+    """
+
+    blob_handles = count(BLOB_HANDLES_BASE)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.dirty = {}
 
         self.current_path = kwargs.get("current_path", "current")
+        self.lazy = getattr(self.repo, "lazy", False) is True
+
+        # the blobs opened for reading, by handle
+        self.blobs = {}
 
     @write_operation
     @not_in("ignore", check=["old", "new"])
     def rename(self, old, new):
         new = re.sub(self.regex, "", new)
+        self._hydrate(old, new)
         result = super().rename(old, new)
 
         message = f"Rename {old} to {new}"
@@ -49,6 +69,7 @@ class CurrentView(PassthroughView):
     @write_operation
     @not_in("ignore", check=["target"])
     def symlink(self, name, target):
+        self._hydrate(name)
         result = os.symlink(target, self.repo._full_path(name))
 
         message = f"Create symlink to {target} for {name}"
@@ -63,6 +84,7 @@ class CurrentView(PassthroughView):
         if target.startswith(f"/{self.current_path}/"):
             target = target.replace(f"/{self.current_path}/", "/")
 
+        self._hydrate(target, name)
         result = super().link(target, name)
 
         message = f"Create link to {target} for {name}"
@@ -73,18 +95,117 @@ class CurrentView(PassthroughView):
 
     def readlink(self, path):
         log.debug("CurrentView: Read link %s", path)
+
+        item = self._lazy_object(path)
+        if item is not None:
+            return item.data.decode()
+
         return os.readlink(self.repo._full_path(path))
 
     def getattr(self, path, fh=None):
         full_path = self.repo._full_path(path)
-        status = os.lstat(full_path)
+        try:
+            status = os.lstat(full_path)
+        except FileNotFoundError:
+            item = self._lazy_object(path)
+            if item is None:
+                raise
+            attrs = self._get_lazy_attrs(path, item)
+        else:
+            attrs = self._get_attrs(status)
 
-        attrs = {key: getattr(status, key) for key in STATS}
+        log.debug("CurrentView: Get attributes %s for %s", str(attrs), path)
+        return attrs
+
+    def _get_attrs(self, status):
+        attrs = super()._get_attrs(status)
         attrs.update({"st_uid": self.uid, "st_gid": self.gid})
+        return attrs
+
+    def _get_lazy_attrs(self, path, item):
+        """
+        Attributes of an object which wasn't hydrated: the times are the
+        ones of the working directory, the mode and the size are git's.
+        """
+
+        attrs = self._get_attrs(os.lstat(self.root))
+        attrs["st_ino"] = path_to_inode(f"/{self.current_path}{path}", self.prefix)
+
+        if item.type_str == "tree":
+            attrs.update({"st_mode": item.filemode | 0o755, "st_nlink": 2})
+        else:
+            attrs.update(
+                {"st_mode": item.filemode, "st_nlink": 1, "st_size": item.size}
+            )
 
-        log.debug("CurrentView: Get attributes %s for %s", str(attrs), path)
         return attrs
 
+    def _lazy_object(self, path):
+        """
+        Returns the object tracked at `path` if it's missing from a lazy
+        working directory, because it wasn't hydrated yet.
+        """
+
+        if not self.lazy or os.path.lexists(self.repo._full_path(path)):
+            return None
+
+        return self.repo.index_object(path)
+
+    def _hydrate(self, *paths):
+        if self.lazy:
+            for path in paths:
+                self.repo.hydrate(path)
+
+    def readdir(self, path, fh):
+        names = set()
+        for entry in super().readdir(path, fh):
+            names.add(entry if isinstance(entry, str) else entry[0])
+            yield entry
+
+        if not self.lazy:
+            return
+
+        tree = self.repo.index_object(path)
+        if tree is None or tree.type_str != "tree":
+            return
+
+        for item in tree:
+            if item.name in names or item.name == ".keep":
+                continue
+
+            item_path = os.path.join(path, item.name)
+            yield item.name, self._get_lazy_attrs(item_path, item), 0
+
+    def access(self, path, mode):
+        if self._lazy_object(path) is not None:
+            return 0
+
+        return super().access(path, mode)
+
+    def statfs(self, path):
+        if self._lazy_object(path) is not None:
+            path = "/"
+
+        return super().statfs(path)
+
+    def chown(self, path, uid, gid):
+        # git doesn't track owners (nor times, for utimens), so there's no
+        # need to hydrate the file for it
+        if self._lazy_object(path) is not None:
+            return 0
+
+        return super().chown(path, uid, gid)
+
+    def utimens(self, path, times=None):
+        if self._lazy_object(path) is not None:
+            return 0
+
+        return super().utimens(path, times)
+
+    def truncate(self, path, length, fh=None):
+        self._hydrate(path)
+        return super().truncate(path, length, fh)
+
     @write_operation
     @not_in("ignore", check=["path"])
     def write(self, path, buf, offset, fh):
@@ -106,14 +227,14 @@ class CurrentView(PassthroughView):
     @write_operation
     @not_in("ignore", check=["path"])
     def mkdir(self, path, mode):
+        self._hydrate(path)
         result = super().mkdir(path, mode)
 
         keep_path = f"{path}/.keep"
         full_path = self.repo._full_path(keep_path)
         if not os.path.exists(keep_path):
-            global writers
             fh = os.open(full_path, os.O_WRONLY | os.O_CREAT)
-            writers += 1
+            sync_state.begin_write(wait=False)
             log.info("CurrentView: Open %s for write", full_path)
 
             super().chmod(keep_path, 0o644)
@@ -148,6 +269,7 @@ class CurrentView(PassthroughView):
         if str_mode not in ["0755", "0644"]:
             raise FuseOSError(errno.EINVAL)
 
+        self._hydrate(path)
         result = super().chmod(path, mode)
 
         if os.path.isdir(self.repo._full_path(path)):
@@ -163,13 +285,18 @@ class CurrentView(PassthroughView):
     @not_in("ignore", check=["path"])
     def fsync(self, path, fdatasync, fh):
         """
-        Each time you fsync, a new commit and push are made
+        Each time you fsync, a new commit and push are made. The push goes
+        out right away, along with the commits waiting for `push_interval`.
         """
 
+        if fh in self.blobs:
+            return 0
+
         result = super().fsync(path, fdatasync, fh)
 
         message = f"Fsync {path}"
         self._stage(add=path, message=message)
+        flush.set()
 
         log.debug("CurrentView: Fsync %s", path)
         return result
@@ -177,9 +304,9 @@ class CurrentView(PassthroughView):
     @write_operation
     @not_in("ignore", check=["path"])
     def open_for_write(self, path, flags):
-        global writers
+        self._hydrate(path)
         fh = self.open_for_read(path, flags)
-        writers += 1
+        sync_state.begin_write(wait=False)
         self.dirty[fh] = {"message": f"Opened {path} for write", "stage": False}
 
         log.debug("CurrentView: Open %s for write", path)
@@ -188,13 +315,34 @@ class CurrentView(PassthroughView):
     @write_operation
     @not_in("ignore", check=["path"])
     def lock(self, path, fip, cmd, lock):
+        if fip in self.blobs:
+            return 0
         return super().lock(path, fip, cmd, lock)
 
     def open_for_read(self, path, flags):
         full_path = self.repo._full_path(path)
         log.info("CurrentView: Open %s for read", path)
+
+        item = self._lazy_object(path)
+        if item is not None:
+            fh = next(self.blob_handles)
+            self.blobs[fh] = memoryview(item)
+            return fh
+
         return os.open(full_path, flags)
 
+    def read(self, path, length, offset, fh):
+        if fh in self.blobs:
+            return bytes(self.blobs[fh][offset : offset + length])
+
+        return super().read(path, length, offset, fh)
+
+    def flush(self, path, fh):
+        if fh in self.blobs:
+            return 0
+
+        return super().flush(path, fh)
+
     def open(self, path, flags):
         write_mode = flags & (os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT)
         if write_mode:
@@ -207,13 +355,17 @@ class CurrentView(PassthroughView):
         the changed to upstream.
         """
 
+        if fh in self.blobs:
+            del self.blobs[fh]
+            log.debug("CurrentView: Release %s", path)
+            return 0
+
         if fh in self.dirty:
             message = self.dirty[fh]["message"]
             should_stage = self.dirty[fh].get("stage", False)
             del self.dirty[fh]
 
-            global writers
-            writers -= 1
+            sync_state.end_write()
             if should_stage:
                 log.debug("CurrentView: Staged %s for commit", path)
                 self._stage(add=path, message=message)
@@ -226,6 +378,11 @@ class CurrentView(PassthroughView):
     def rmdir(self, path):
         message = f"Delete the {path} directory"
 
+        # Files which weren't hydrated are only in the index
+        if self.lazy:
+            for lazy_path in self.repo.lazy_paths(path):
+                self._stage(remove=lazy_path, message=message)
+
         # Unlink all the files
         full_path = self.repo._full_path(path)
         for root, _dirs, files in os.walk(full_path):
@@ -236,6 +393,8 @@ class CurrentView(PassthroughView):
                     self._stage(remove=os.path.join(path, _file), message=message)
 
         # Delete the actual directory
+        if self.lazy and not os.path.lexists(full_path):
+            return 0
         result = super().rmdir(f"{path}/")
         log.debug("CurrentView: %s", message)
 
@@ -244,7 +403,10 @@ class CurrentView(PassthroughView):
     @write_operation
     @not_in("ignore", check=["path"])
     def unlink(self, path):
-        result = super().unlink(path)
+        if self._lazy_object(path) is not None:
+            result = None
+        else:
+            result = super().unlink(path)
 
         message = f"Deleted {path}"
         self._stage(remove=path, message=message)
@@ -255,30 +417,35 @@ class CurrentView(PassthroughView):
     def _stage(self, message, add=None, remove=None):
         non_empty = False
 
-        if remove is not None:
-            remove = self._sanitize(remove)
+        # other threads may be staging at the same time
+        with self.repo.index_lock:
+            if remove is not None:
+                remove = self._sanitize(remove)
+                if add is not None:
+                    add = self._sanitize(add)
+                    paths = self._get_files_from_path(add)
+                    if paths:
+                        for path in paths:
+                            path = path.replace(f"{add}/", f"{remove}/")
+                            self.repo.index.remove(path)
+                    else:
+                        self.repo.index.remove(remove)
+                else:
+                    self.repo.index.remove(remove)
+                non_empty = True
+
             if add is not None:
                 add = self._sanitize(add)
                 paths = self._get_files_from_path(add)
                 if paths:
                     for path in paths:
-                        path = path.replace(f"{add}/", f"{remove}/")
-                        self.repo.index.remove(path)
+                        self.repo.index.add(path)
                 else:
-                    self.repo.index.remove(remove)
-            else:
-                self.repo.index.remove(remove)
-            non_empty = True
-
-        if add is not None:
-            add = self._sanitize(add)
-            paths = self._get_files_from_path(add)
-            if paths:
-                for path in paths:
-                    self.repo.index.add(path)
-            else:
-                self.repo.index.add(add)
-            non_empty = True
+                    self.repo.index.add(add)
+                non_empty = True
+
+            if non_empty:
+                self.repo.forget_index_tree()
 
         if non_empty:
             self.queue.commit(add=add, remove=remove, message=message)
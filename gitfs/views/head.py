@@ -0,0 +1,133 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT
+from itertools import count
+
+from mfusepy import FuseOSError
+from pygit2 import Commit
+
+from gitfs.utils.inode import oid_to_inode
+
+from .read_only import ReadOnlyView
+
+
+class HeadView(ReadOnlyView):
+    """
+    Serves the tree of the mounted branch straight from the object database,
+    for bare mounts, which have no working directory.
+
+    The fetch worker moves the branch to each new head it fetches, in a
+    single reference update, so each operation sees either the old tree or
+    the new one. Open files keep reading the blob they were opened on.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # the blobs of the open files, by handle
+        self.handles = {}
+        self.next_handle = count(1)
+
+    def _resolve(self, path):
+        commit = self.repo.head.peel(Commit)
+        return commit, self.repo.trees.resolve(commit.tree, path)
+
+    def getattr(self, path, fh=None):
+        commit, item = self._resolve(path)
+        if item is None:
+            raise FuseOSError(ENOENT)
+
+        return self._get_attrs(path, fh, commit, item, root=path == "/")
+
+    def _get_attrs(self, path, fh, commit, item, root=False):
+        attrs = super().getattr(path, fh)
+        attrs.update({"st_ctime": commit.commit_time, "st_mtime": commit.commit_time})
+
+        if root:
+            stats = self.repo.get_git_object_default_stats(commit.tree, "/")
+        else:
+            stats = self.repo.get_tree_entry_stats(item)
+        if stats is None:
+            raise FuseOSError(ENOENT)
+
+        attrs.update(stats)
+        attrs["st_ino"] = oid_to_inode(item.id)
+        return attrs
+
+    def access(self, path, amode):
+        _, item = self._resolve(path)
+        if item is None:
+            raise FuseOSError(ENOENT)
+
+        return super().access(path, amode)
+
+    def readdir(self, path, fh):
+        commit, tree = self._resolve(path)
+        return self._list_tree(path, fh, commit, tree)
+
+    def _list_tree(self, path, fh, commit, tree):
+        if tree is None or tree.type_str != "tree":
+            raise FuseOSError(ENOENT)
+
+        yield from [".", ".."]
+
+        base_attrs = super().getattr(path, fh)
+        base_attrs.update(
+            {"st_ctime": commit.commit_time, "st_mtime": commit.commit_time}
+        )
+
+        for entry in tree:
+            stats = self.repo.get_tree_entry_stats(entry)
+            if stats is None:
+                yield entry.name
+                continue
+
+            attrs = dict(base_attrs, **stats)
+            attrs["st_ino"] = oid_to_inode(entry.id)
+
+            yield entry.name, attrs, 0
+
+    def readlink(self, path):
+        _, item = self._resolve(path)
+        if item is None:
+            raise FuseOSError(ENOENT)
+
+        return self.repo.blobs[item.id].decode()
+
+    def open(self, path, flags):
+        super().open(path, flags)
+
+        _, item = self._resolve(path)
+        if item is None or item.type_str != "blob":
+            raise FuseOSError(ENOENT)
+
+        fh = next(self.next_handle)
+        self.handles[fh] = item.id
+        return fh
+
+    def read(self, path, size, offset, fh):
+        oid = self.handles.get(fh)
+        if oid is None:
+            _, item = self._resolve(path)
+            if item is None:
+                raise FuseOSError(ENOENT)
+            oid = item.id
+
+        return self.repo.blobs[oid][offset : offset + size]
+
+    def release(self, path, fh):
+        self.handles.pop(fh, None)
+        return 0
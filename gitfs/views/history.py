@@ -15,17 +15,39 @@
 
 import os
 import time
+from datetime import datetime
 from errno import ENOENT
 from stat import S_IFDIR
 
 from mfusepy import FuseOSError
 
+from gitfs.events import deepen, fetch
 from gitfs.log import log
+from gitfs.utils.inode import path_to_inode
 
 from .read_only import ReadOnlyView
 
 
 class HistoryView(ReadOnlyView):
+    # While the history is indexed in the background, lookups wait this long
+    # for it, then go on with what was indexed so far.
+    history_wait = 1
+    # the event asking for older history, if not the mount-wide one
+    deepen_request = None
+
+    def _wait_for_history(self):
+        ready = self.repo.commits.ready
+        if not ready.is_set():
+            log.debug("HistoryView: Wait for the history to be indexed")
+            ready.wait(self.history_wait)
+
+    def _get_commit_dates(self):
+        dates = self.repo.get_commit_dates()
+        if not self.repo.commits.ready.is_set():
+            self._wait_for_history()
+            dates = self.repo.get_commit_dates()
+        return dates
+
     def getattr(self, path, fh=None):
         """
         Returns a dictionary with keys identical to the stat C structure of
@@ -38,9 +60,13 @@ class HistoryView(ReadOnlyView):
         the directory, while Linux counts only the subdirectories.
         """
 
-        if path not in self.repo.get_commit_dates() and path != "/":
+        if path != "/" and path not in self._get_commit_dates():
             raise FuseOSError(ENOENT)
 
+        date = getattr(self, "date", "")
+        if date:
+            self._deepen_history(date)
+
         attrs = super().getattr(path, fh)
         attrs.update(
             {
@@ -48,6 +74,48 @@ class HistoryView(ReadOnlyView):
                 "st_nlink": 2,
                 "st_ctime": self._get_first_commit_time(),
                 "st_mtime": self._get_last_commit_time(),
+                "st_ino": path_to_inode(f"history:{date}:{path}", self.prefix),
+            }
+        )
+
+        return attrs
+
+    def _deepen_history(self, date):
+        """
+        Asks for older history, in the background, when someone browses the
+        oldest date a shallow clone has, or an older one.
+        """
+
+        commits = self.repo.commits
+        if not commits.shallow or commits.oldest is None:
+            return
+
+        try:
+            date = datetime.strptime(date, "%Y-%m-%d").date()
+        except ValueError:
+            return
+
+        deepen_request = self.deepen_request or deepen
+        if date <= commits.oldest and not deepen_request.is_set():
+            log.debug("HistoryView: Ask for history older than %s", commits.oldest)
+            deepen_request.set()
+            fetch.set()
+
+    def _get_date_attrs(self, date):
+        """
+        The attributes of a date directory, as its own view reports them.
+        """
+
+        commits = self.repo.commits[date]
+
+        attrs = super().getattr("/")
+        attrs.update(
+            {
+                "st_mode": S_IFDIR | 0o555,
+                "st_nlink": 2,
+                "st_ctime": commits[0].timestamp,
+                "st_mtime": commits[-1].timestamp,
+                "st_ino": path_to_inode(f"history:{date}:/", self.prefix),
             }
         )
 
@@ -57,10 +125,11 @@ class HistoryView(ReadOnlyView):
         if getattr(self, "date", None):
             log.info("PATH: %s", path)
             if path == "/":
-                available_dates = self.repo.get_commit_dates()
+                available_dates = self._get_commit_dates()
                 if self.date not in available_dates:
                     raise FuseOSError(ENOENT)
             else:
+                self._wait_for_history()
                 commits = self.repo.get_commits_by_date(self.date)
                 dirname = os.path.split(path)[1]
                 if dirname not in commits:
@@ -71,13 +140,16 @@ class HistoryView(ReadOnlyView):
         return 0
 
     def readdir(self, path, fh):
+        yield from [".", ".."]
+
+        self._wait_for_history()
         if getattr(self, "date", None):
-            additional_entries = self.repo.get_commits_by_date(self.date)
-        else:
-            additional_entries = self.repo.get_commit_dates()
+            self._deepen_history(self.date)
+            yield from self.repo.get_commits_by_date(self.date)
+            return
 
-        dir_entries = [".", ".."] + additional_entries
-        yield from dir_entries
+        for date in self.repo.get_commit_dates():
+            yield date, self._get_date_attrs(date), 0
 
     def _get_commit_time(self, index):
         date = getattr(self, "date", None)
@@ -18,7 +18,10 @@ from stat import S_IFDIR
 
 from mfusepy import FuseOSError
 
+from gitfs.utils.inode import root_inode
+
 from .read_only import ReadOnlyView
+from .status import STATUS_FILE
 
 
 class IndexView(ReadOnlyView):
@@ -27,6 +30,8 @@ class IndexView(ReadOnlyView):
 
         self.current_path = kwargs.get("current_path", "current")
         self.history_path = kwargs.get("history_path", "history")
+        self.refs_path = kwargs.get("refs_path")
+        self.at_path = kwargs.get("at_path")
 
     def getattr(self, path, fh=None):
         """
@@ -44,9 +49,20 @@ class IndexView(ReadOnlyView):
             raise FuseOSError(ENOENT)
 
         attrs = super().getattr(path, fh)
-        attrs.update({"st_mode": S_IFDIR | 0o555, "st_nlink": 2})
+        attrs.update(
+            {
+                "st_mode": S_IFDIR | 0o555,
+                "st_nlink": 2,
+                "st_ino": root_inode(self.prefix),
+            }
+        )
 
         return attrs
 
     def readdir(self, path, fh):
-        return [".", "..", self.current_path, self.history_path]
+        entries = [".", "..", self.current_path, self.history_path, STATUS_FILE]
+        if self.refs_path:
+            entries.append(self.refs_path)
+        if self.at_path:
+            entries.append(self.at_path)
+        return entries
@@ -26,6 +26,7 @@ STATS = (
     "st_atime",
     "st_ctime",
     "st_gid",
+    "st_ino",
     "st_mode",
     "st_mtime",
     "st_nlink",
@@ -75,22 +76,37 @@ class PassthroughView(View):
     def getattr(self, path, fh=None):
         full_path = self.repo._full_path(path)
         status = os.lstat(full_path)
+        return self._get_attrs(status)
+
+    def _get_attrs(self, status):
         return {key: getattr(status, key) for key in STATS}
 
     def readdir(self, path, fh):
+        """
+        Yields the entries along with their attributes, which spares the
+        kernel a getattr for each of them.
+        """
+
         full_path = self.repo._full_path(path)
 
-        dirents = [".", ".."]
+        yield from [".", ".."]
+
         hidden_items = [".git", ".keep"]
         if os.path.isdir(full_path):
-            for entry in os.listdir(full_path):
-                if entry not in hidden_items:
-                    dirents.append(entry)
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.name in hidden_items:
+                        continue
 
-        if self.is_current_path_root:
-            dirents.append(self.history_path)
+                    try:
+                        status = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+
+                    yield entry.name, self._get_attrs(status), 0
 
-        yield from dirents
+        if self.is_current_path_root:
+            yield self.history_path
 
     def readlink(self, path):
         pathname = os.readlink(self.repo._full_path(path))
@@ -0,0 +1,129 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT
+from stat import S_IFDIR
+
+from mfusepy import FuseOSError
+from pygit2 import Commit
+
+from gitfs.utils import split_path_into_components
+from gitfs.utils.inode import path_to_inode
+
+from .head import HeadView
+from .read_only import ReadOnlyView
+
+
+# where the refs of each directory are kept in the clone
+NAMESPACES = {"branches": "refs/remotes/origin/", "tags": "refs/tags/"}
+
+
+class RefsView(HeadView):
+    """
+    Serves the branches and the tags fetched from the remote, read-only,
+    as `branches/<name>/` and `tags/<name>/`, straight from the object
+    database. Names with slashes (e.g.: `feature/login`) are nested
+    directories, which git keeps from clashing with other names.
+
+    The refs are looked up on each call, so they follow the fetches.
+    """
+
+    def _refs(self, kind):
+        prefix = NAMESPACES[kind]
+        return {
+            reference[len(prefix) :]: reference
+            for reference in self.repo.listall_references()
+            if reference.startswith(prefix) and reference != f"{prefix}HEAD"
+        }
+
+    def _locate(self, path):
+        """
+        Splits `path` into the ref it's in and its path in the ref's tree.
+
+        The directories which hold refs (or other directories) have no ref,
+        so the names they hold are returned instead.
+
+        :rtype: the ref's name (or None), path (or names)
+        """
+
+        components = split_path_into_components(path)
+        if not components:
+            return None, list(NAMESPACES)
+
+        kind, names = components[0], components[1:]
+        if kind not in NAMESPACES:
+            raise FuseOSError(ENOENT)
+
+        refs = self._refs(kind)
+        for index in range(1, len(names) + 1):
+            name = "/".join(names[:index])
+            if name in refs:
+                return refs[name], "/".join(names[index:])
+
+        prefix = "".join(f"{name}/" for name in names)
+        children = {
+            name[len(prefix) :].split("/")[0]
+            for name in refs
+            if name.startswith(prefix)
+        }
+        if names and not children:
+            raise FuseOSError(ENOENT)
+
+        return None, sorted(children)
+
+    def _resolve_ref(self, reference, path):
+        commit = self.repo.lookup_reference(reference).peel(Commit)
+        return commit, self.repo.trees.resolve(commit.tree, path)
+
+    def _resolve(self, path):
+        reference, path = self._locate(path)
+        if reference is None:
+            return None, None
+
+        return self._resolve_ref(reference, path)
+
+    def getattr(self, path, fh=None):
+        reference, ref_path = self._locate(path)
+        if reference is not None:
+            commit, item = self._resolve_ref(reference, ref_path)
+            if item is None:
+                raise FuseOSError(ENOENT)
+
+            return self._get_attrs(path, fh, commit, item, root=not ref_path)
+
+        attrs = ReadOnlyView.getattr(self, path, fh)
+        attrs.update(
+            {
+                "st_mode": S_IFDIR | 0o555,
+                "st_nlink": 2,
+                "st_ino": path_to_inode(f"refs:{path}", self.prefix),
+            }
+        )
+        return attrs
+
+    def access(self, path, amode):
+        reference, _ = self._locate(path)
+        if reference is None:
+            return ReadOnlyView.access(self, path, amode)
+
+        return super().access(path, amode)
+
+    def readdir(self, path, fh):
+        reference, ref_path = self._locate(path)
+        if reference is None:
+            return [".", ".."] + ref_path
+
+        commit, tree = self._resolve_ref(reference, ref_path)
+        return self._list_tree(path, fh, commit, tree)
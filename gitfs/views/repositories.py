@@ -0,0 +1,42 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT
+from stat import S_IFDIR
+
+from mfusepy import FuseOSError
+
+from gitfs.utils.inode import ROOT_INODE
+
+from .read_only import ReadOnlyView
+
+
+class RepositoriesView(ReadOnlyView):
+    """
+    The root of a multi-repository mount, listing the repositories served
+    under it.
+    """
+
+    def getattr(self, path, fh=None):
+        if path != "/":
+            raise FuseOSError(ENOENT)
+
+        attrs = super().getattr(path, fh)
+        attrs.update({"st_mode": S_IFDIR | 0o555, "st_nlink": 2, "st_ino": ROOT_INODE})
+
+        return attrs
+
+    def readdir(self, path, fh):
+        return [".", ".."] + list(self.names)
@@ -0,0 +1,84 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT
+from stat import S_IFREG
+
+from mfusepy import FuseOSError
+
+from gitfs.events import (
+    fetch_successful,
+    local_first,
+    push_successful,
+    read_only,
+    sync_state,
+)
+from gitfs.metrics import metrics
+from gitfs.utils.inode import path_to_inode
+
+from .read_only import ReadOnlyView
+
+
+STATUS_FILE = ".gitfs-status"
+
+
+class StatusView(ReadOnlyView):
+    """
+    A virtual file, at the root of the mount, telling how the mount is doing:
+    whether the remote can be reached, if writes are accepted, where the sync
+    is at and the counters from `gitfs.metrics` (e.g.: how many commits wait to be pushed).
+    """
+
+    # the content changes all the time, so bypass the kernel's page cache
+    direct_io = True
+
+    def status(self):
+        remote_ok = fetch_successful.is_set() and push_successful.is_set()
+        if read_only.is_set():
+            writes = "rejected"
+        elif remote_ok or local_first.is_set():
+            writes = "accepted"
+        else:
+            writes = "rejected"
+
+        lines = [
+            f"remote: {'ok' if remote_ok else 'degraded'}",
+            f"writes: {writes}",
+            f"local_first: {'yes' if local_first.is_set() else 'no'}",
+            f"sync: {sync_state.state}",
+        ]
+        for name, value in sorted(metrics.snapshot().items()):
+            lines.append(f"{name}: {value}")
+
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def getattr(self, path, fh=None):
+        if path != "/":
+            raise FuseOSError(ENOENT)
+
+        attrs = super().getattr(path, fh)
+        attrs.update(
+            {
+                "st_mode": S_IFREG | 0o444,
+                "st_nlink": 1,
+                "st_size": len(self.status()),
+                "st_ino": path_to_inode(f"/{STATUS_FILE}", self.prefix),
+            }
+        )
+
+        return attrs
+
+    def read(self, path, size, offset, fh):
+        return self.status()[offset : offset + size]
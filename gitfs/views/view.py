@@ -19,6 +19,15 @@ from mfusepy import LoggingMixIn, Operations
 
 
 class View(LoggingMixIn, Operations, metaclass=ABCMeta):
+    # views serving immutable content can let the kernel keep their pages
+    # cached between opens
+    keep_cache = False
+    # views serving content which changes behind the kernel's back bypass
+    # its page cache
+    direct_io = False
+    # where the repository is served, in a multi-repository mount
+    prefix = ""
+
     def __init__(self, *args, **kwargs):
         self.args = args
 
@@ -15,4 +15,7 @@
 
 from .commit_queue import CommitQueue
 from .fetch import FetchWorker
+from .history import HistoryIndexer
+from .maintenance import MaintenanceWorker
+from .runtime import Runtime
 from .sync import SyncWorker
@@ -13,22 +13,78 @@
 # limitations under the License.
 
 
-from gitfs.events import fetch, fetch_successful, idle, remote_operation, shutting_down
+import time
+
+from gitfs.events import (
+    deepen,
+    fetch,
+    fetch_successful,
+    idle,
+    remote_operation,
+    shutting_down,
+)
 from gitfs.log import log
+from gitfs.metrics import metrics
+from gitfs.utils.backoff import Backoff
 from gitfs.worker.peasant import Peasant
 
 
 class FetchWorker(Peasant):
+    """
+    Fetches from the remote every `timeout` seconds while the mount is in
+    use. Once idle, the interval doubles after each fetch which brought
+    nothing new (or failed), up to `idle_timeout`, and drops back to
+    `timeout` as soon as the remote changes or someone wakes us up (e.g.:
+    writes started again). `timeout` is the shortest interval.
+
+    Failed fetches are retried on a backoff of their own, in use or not,
+    so that mounts don't keep hitting a remote which is down all at once.
+
+    In a shallow clone, the history is deepened, twice as deep each time,
+    whenever someone browses past its oldest commit.
+
+    In a bare clone (`fast_forward`), the mounted branch is moved to each new
+    head that is fetched, since there's nobody else to merge it.
+
+    The repositories of a multi-repository mount each bring their own `lock`
+    and `deepen_request`, instead of the mount-wide ones, so that they are
+    fetched side by side.
+    """
+
     name = "FetchWorker"
+    timeout = 30
+    idle_timeout = 30 * 60
+    depth = 0
+    fast_forward = False
+    kernel_cache = None
+    lock = None
+    deepen_request = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.backoff = Backoff(self.timeout, self.idle_timeout)
+        self.retry_backoff = Backoff(self.timeout, self.idle_timeout)
+        self.failing = False
+
+    def interval(self):
+        """
+        How long to wait before the next fetch.
+        """
+
+        if idle.is_set():
+            return self.backoff.delay()
+        if self.failing:
+            return self.retry_backoff.delay()
+        return self.timeout
 
     def work(self):
         while True:
-            timeout = self.timeout
-            if idle.is_set():
-                timeout = self.idle_timeout
+            timeout = self.interval()
 
             log.debug(f"Wait for {timeout}")
-            fetch.wait(timeout)
+            if fetch.wait(timeout):
+                self.backoff.reset()
 
             if shutting_down.is_set():
                 log.info("Stop fetch worker")
@@ -38,7 +94,7 @@ class FetchWorker(Peasant):
 
     def fetch(self):
         log.debug("Lock fetching operation")
-        with remote_operation:
+        with self.lock or remote_operation:
             fetch.clear()
 
             try:
@@ -47,10 +103,52 @@ class FetchWorker(Peasant):
                     self.upstream, self.branch, self.credentials
                 )
                 fetch_successful.set()
+                metrics.set("last_fetch", time.time())
+                self.failing = False
+                self.retry_backoff.reset()
                 if was_behind:
                     log.info("Fetch done")
+                    self.backoff.reset()
+                    if self.fast_forward:
+                        self.switch_head()
                 else:
                     log.debug("Nothing to fetch")
+                    self.backoff.increase()
             except:
                 fetch_successful.clear()
+                metrics.increment("failed_fetches")
                 log.exception("Fetch failed")
+                self.backoff.increase()
+                self.failing = True
+                self.retry_backoff.increase()
+
+        if (self.deepen_request or deepen).is_set():
+            self.deepen()
+
+    def switch_head(self):
+        changed_paths = self.repository.fast_forward(self.upstream, self.branch)
+        self.repository.commits.update()
+        metrics.increment("head_switches")
+        log.info("Switched to the new head, %d paths changed", len(changed_paths))
+
+        if self.kernel_cache is not None:
+            self.kernel_cache.invalidate(changed_paths)
+
+    def deepen(self):
+        with self.lock or remote_operation:
+            (self.deepen_request or deepen).clear()
+            if self.repository.is_shallow is not True:
+                return
+
+            depth = max(self.depth, 1) * 2
+            try:
+                self.repository.deepen(
+                    self.upstream, self.branch, depth, self.credentials
+                )
+                self.depth = depth
+                self.repository.commits.update()
+                metrics.increment("history_deepenings")
+                metrics.set("history_depth", depth)
+            except Exception:
+                metrics.increment("failed_deepenings")
+                log.exception("Deepening the history failed")
@@ -0,0 +1,38 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+
+from gitfs.log import log
+from gitfs.metrics import metrics
+from gitfs.worker.peasant import Peasant
+
+
+class HistoryIndexer(Peasant):
+    """
+    Indexes the commits behind history/ in the background, so that mounting
+    (and serving current/) doesn't wait for it. Until it's done, history/
+    lists the days which were indexed so far, the newest first.
+    """
+
+    name = "HistoryIndexer"
+
+    def work(self):
+        log.info("Index the history")
+        self.repository.commits.update()
+
+        elapsed = time.monotonic() - self.started
+        metrics.set("time_to_full_history", round(elapsed, 3))
+        log.info("History indexed, %.3f seconds after startup", elapsed)
@@ -0,0 +1,155 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import subprocess
+
+from pygit2 import Oid
+
+from gitfs.events import idle, remote_operation, shutting_down
+from gitfs.log import log
+from gitfs.worker.peasant import Peasant
+
+
+class MaintenanceWorker(Peasant):
+    """
+    Keeps the clone in shape while the mount is idle: packs the loose
+    objects left by auto-commits and merges and, when the git binary is
+    around, prunes the unreachable ones and writes the commit-graph.
+
+    It runs at most once every `interval` seconds and gives up as soon as
+    the mount stops being idle.
+    """
+
+    name = "MaintenanceWorker"
+
+    # unreachable objects younger than this are kept, since they may belong
+    # to a commit which is being made
+    prune_expire = "1.hour.ago"
+
+    def work(self):
+        while not shutting_down.wait(self.interval):
+            if self.wait_for_idle():
+                self.maintain()
+
+        log.info("Stop maintenance worker")
+
+    def wait_for_idle(self):
+        while not idle.wait(1):
+            if shutting_down.is_set():
+                return False
+
+        return not shutting_down.is_set()
+
+    def maintain(self):
+        # don't get in the way of fetches and pushes
+        if not remote_operation.acquire(blocking=False):
+            log.debug("MaintenanceWorker: Remote operation in progress, skipping")
+            return
+
+        try:
+            steps = [self.prune, self.pack_loose_objects, self.write_commit_graph]
+            for step in steps:
+                if not idle.is_set() or shutting_down.is_set():
+                    log.debug("MaintenanceWorker: No longer idle, stopping")
+                    return
+                step()
+        except Exception:
+            log.exception("MaintenanceWorker: Maintenance failed")
+        finally:
+            remote_operation.release()
+
+    def loose_objects(self):
+        """
+        Yields the id and the path of the loose objects of this repository,
+        leaving alone the ones of alternate object stores.
+        """
+
+        objects = os.path.join(self.repository.path, "objects")
+        for prefix in os.listdir(objects):
+            if len(prefix) != 2:
+                continue
+
+            directory = os.path.join(objects, prefix)
+            for name in os.listdir(directory):
+                if len(name) == 38:
+                    yield Oid(hex=prefix + name), os.path.join(directory, name)
+
+    def pack_loose_objects(self):
+        loose_objects = list(self.loose_objects())
+        if len(loose_objects) < self.min_loose_objects:
+            log.debug(
+                "MaintenanceWorker: Only %d loose objects, not packing",
+                len(loose_objects),
+            )
+            return
+
+        def add_objects(pack_builder):
+            for oid, _ in loose_objects:
+                pack_builder.add(oid)
+
+        log.info("MaintenanceWorker: Packing %d loose objects", len(loose_objects))
+        self.repository.pack(pack_delegate=add_objects, n_threads=1)
+
+        # the objects are in the new pack, the loose copies can go
+        for _, path in loose_objects:
+            if not idle.is_set():
+                log.debug("MaintenanceWorker: No longer idle, keep loose copies")
+                return
+
+            try:
+                os.unlink(path)
+            except OSError:
+                log.debug("MaintenanceWorker: Can't remove %s", path)
+
+    def prune(self):
+        self.run_git("prune", f"--expire={self.prune_expire}")
+
+    def write_commit_graph(self):
+        self.run_git("commit-graph", "write", "--reachable")
+
+    def run_git(self, *args):
+        """
+        Runs a git command in the repository, killing it if the mount stops
+        being idle. Both commands used here leave the repository consistent
+        when interrupted.
+        """
+
+        git = shutil.which("git")
+        if git is None:
+            log.debug("MaintenanceWorker: No git binary, skipping %s", args[0])
+            return
+
+        log.debug("MaintenanceWorker: Running git %s", " ".join(args))
+        process = subprocess.Popen(
+            [git, "-C", self.repository.path, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        while True:
+            try:
+                process.wait(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if not idle.is_set() or shutting_down.is_set():
+                    log.debug("MaintenanceWorker: No longer idle, stop git")
+                    process.kill()
+                    process.wait()
+                    return
+
+        if process.returncode != 0:
+            log.info("MaintenanceWorker: git %s failed", args[0])
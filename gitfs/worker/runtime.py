@@ -0,0 +1,240 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count
+
+from gitfs.events import fetch, idle, shutting_down
+from gitfs.log import log
+from gitfs.metrics import metrics
+from gitfs.worker.peasant import Peasant
+
+
+# job priorities, the lowest goes first
+SYNC = 0
+FETCH = 1
+MAINTENANCE = 2
+
+
+class Runtime(Peasant):
+    """
+    Runs the work of the SyncWorker, the FetchWorker and the
+    MaintenanceWorker on a single asyncio event loop, instead of a thread
+    for each of them.
+
+    The loop only keeps the time: each worker gets a timer, scheduled from
+    the previous tick rather than from when the work was done, so that slow
+    fetches or pushes don't make the periods drift. The blocking work (the
+    pygit2 calls) runs on at most `max_workers` threads, by priority: syncs
+    before fetches before maintenance. A fetch or a maintenance run which
+    couldn't start before its deadline is dropped, since the next tick will
+    bring another one.
+
+    A multi-repository mount runs the `fetch_workers` of all its
+    repositories on the same threads. They keep to their schedule, spread
+    over their period so that they don't all fetch at once.
+
+    Once `shutting_down` is set the timers are cancelled, the jobs which
+    haven't started are dropped and the pending commits are flushed.
+    """
+
+    name = "Runtime"
+    max_workers = 2
+
+    sync_worker = None
+    fetch_worker = None
+    maintenance_worker = None
+    fetch_workers = ()
+
+    def work(self):
+        asyncio.run(self.main())
+        log.info("Stop runtime")
+
+    def prepare(self):
+        self.loop = asyncio.get_running_loop()
+        self.jobs = asyncio.PriorityQueue()
+        self.slots = asyncio.Semaphore(self.max_workers)
+        self.sequence = count()
+
+        self.executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix=self.name
+        )
+        # threads blocked on the events set from FUSE threads
+        self.waiters = ThreadPoolExecutor(2, thread_name_prefix=f"{self.name}Waiter")
+
+    async def main(self):
+        self.prepare()
+
+        coroutines = [self.dispatch()]
+        if self.sync_worker is not None:
+            coroutines.append(self.syncing())
+        if self.fetch_worker is not None:
+            coroutines.append(self.fetching())
+        if self.maintenance_worker is not None:
+            coroutines.append(self.maintaining())
+
+        for position, worker in enumerate(self.fetch_workers):
+            spread = worker.timeout * position / len(self.fetch_workers)
+            coroutines.append(self.fetching_on_schedule(worker, spread))
+
+        tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        for task in tasks:
+            task.add_done_callback(self.check)
+
+        try:
+            await self.loop.run_in_executor(self.waiters, shutting_down.wait)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # the jobs in progress are let to finish
+            await asyncio.to_thread(
+                self.executor.shutdown, wait=True, cancel_futures=True
+            )
+            if self.sync_worker is not None:
+                await asyncio.to_thread(self.sync_worker.flush)
+            self.waiters.shutdown(wait=False)
+
+    def check(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Runtime: A task stopped", exc_info=task.exception())
+
+    def next_tick(self, previous, interval):
+        """
+        The tick following `previous`, or right now if it was missed.
+        """
+
+        return max(previous + interval, self.loop.time())
+
+    async def sleep_until(self, when):
+        await asyncio.sleep(max(when - self.loop.time(), 0))
+
+    async def wait_event(self, event, timeout):
+        return await self.loop.run_in_executor(
+            self.waiters, event.wait, max(timeout, 0)
+        )
+
+    async def submit(self, priority, name, job, deadline=None):
+        """
+        Runs `job` on the executor, once a thread is free and the jobs with
+        a higher priority went first. Returns False if it was dropped, since
+        it couldn't start before `deadline` (in loop time).
+        """
+
+        done = self.loop.create_future()
+        self.jobs.put_nowait((priority, next(self.sequence), name, job, deadline, done))
+        return await done
+
+    async def dispatch(self):
+        while True:
+            await self.slots.acquire()
+            _, _, name, job, deadline, done = await self.jobs.get()
+
+            if done.done():
+                # whoever submitted it gave up
+                self.slots.release()
+                continue
+
+            if deadline is not None and self.loop.time() > deadline:
+                log.debug("Runtime: %s missed its deadline, dropping it", name)
+                metrics.increment("expired_jobs")
+                self.slots.release()
+                done.set_result(False)
+                continue
+
+            log.debug("Runtime: Start %s", name)
+            running = self.loop.run_in_executor(self.executor, job)
+            running.add_done_callback(partial(self.finish, name, done))
+
+    def finish(self, name, done, running):
+        self.slots.release()
+
+        if not running.cancelled() and running.exception() is not None:
+            log.error("Runtime: %s failed", name, exc_info=running.exception())
+
+        if not done.done():
+            done.set_result(not running.cancelled())
+
+    async def syncing(self):
+        worker = self.sync_worker
+        tick = self.loop.time()
+
+        while True:
+            tick = self.next_tick(tick, worker.timeout)
+            await self.sleep_until(tick)
+
+            jobs = worker.pending_jobs()
+            for job in jobs:
+                worker.collect(job)
+
+            if not jobs:
+                await self.submit(SYNC, "sync", worker.rest)
+
+    async def fetching(self):
+        worker = self.fetch_worker
+        tick = self.loop.time()
+
+        while True:
+            tick = self.next_tick(tick, worker.interval())
+
+            if await self.wait_event(fetch, tick - self.loop.time()):
+                # someone wants a fetch right away
+                worker.backoff.reset()
+                tick = self.loop.time()
+
+            if shutting_down.is_set():
+                return
+
+            await self.submit(
+                FETCH, "fetch", worker.fetch, deadline=tick + worker.timeout
+            )
+
+    async def fetching_on_schedule(self, worker, spread=0):
+        """
+        Fetches with `worker` every `timeout` seconds (or on its backoff, once
+        idle or while the remote fails), starting `spread` seconds late.
+        """
+
+        tick = self.loop.time() + spread
+
+        while True:
+            tick = self.next_tick(tick, worker.interval())
+            await self.sleep_until(tick)
+
+            if shutting_down.is_set():
+                return
+
+            await self.submit(
+                FETCH, "fetch", worker.fetch, deadline=tick + worker.timeout
+            )
+
+    async def maintaining(self):
+        worker = self.maintenance_worker
+        tick = self.loop.time()
+
+        while True:
+            tick = self.next_tick(tick, worker.interval)
+            await self.sleep_until(tick)
+
+            if idle.is_set():
+                await self.submit(
+                    MAINTENANCE,
+                    "maintenance",
+                    worker.maintain,
+                    deadline=tick + worker.interval,
+                )
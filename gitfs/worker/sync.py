@@ -13,27 +13,53 @@
 # limitations under the License.
 import random
 import time
+from contextlib import contextmanager
 from queue import Empty
 
 import pygit2
 
 from gitfs.events import (
     fetch,
+    flush,
     idle,
     push_successful,
+    read_only,
     remote_operation,
     shutting_down,
-    sync_done,
-    syncing,
-    writers,
+    sync_state,
+)
+from gitfs.events.state import (
+    COLLECTING,
+    COMMITTING,
+    DEGRADED,
+    IDLE,
+    MERGING,
+    PUSHING,
 )
 from gitfs.log import log
 from gitfs.merges import AcceptMine
+from gitfs.metrics import metrics
+from gitfs.utils.backoff import Backoff
 from gitfs.worker.peasant import Peasant
 
 
 class SyncWorker(Peasant):
     name = "SyncWorker"
+    kernel_cache = None
+    state = sync_state
+
+    # Pushes wait until no commit was made for `push_interval` seconds, so
+    # that bursts of commits go out together, but no commit waits for more
+    # than `push_delay` seconds (if set).
+    push_interval = 0
+    push_delay = 0
+
+    # In local-first mode, failed syncs are retried in the background, at
+    # growing intervals, while commits pile up locally. Writes are rejected
+    # once `max_unpushed_commits` (if set) are waiting to be pushed.
+    local_first = False
+    max_unpushed_commits = 0
+    max_retry_interval = 5 * 60
 
     def __init__(
         self,
@@ -57,31 +83,68 @@ class SyncWorker(Peasant):
             repo_path=self.repo_path,
         )
         self.strategy = strategy
+        # in-memory merges let writers through while talking to the remote
+        self.in_memory = getattr(strategy, "in_memory", False) is True
         self.commits = []
+        self.changed_paths = set()
+
+        # when the oldest and the newest unpushed commits were made
+        self.first_pending = None
+        self.last_pending = None
+
+        self.retry_backoff = None
+        self.next_sync = 0
+
+        # how many times in a row nothing came in for `timeout` seconds
+        self.idle_times = 0
 
     def work(self):
-        idle_times = 0
         while True:
             if shutting_down.is_set():
+                self.flush()
                 log.info("Stop sync worker")
                 break
 
             try:
                 job = self.commit_queue.get(timeout=self.timeout, block=True)
-                if job["type"] == "commit":
-                    self.commits.append(job)
-                log.debug("Got a commit job")
-
-                idle_times = 0
-                idle.clear()
             except Empty:
-                log.debug("Nothing to do right now, going idle")
+                self.rest()
+            else:
+                self.collect(job)
+
+    def collect(self, job):
+        if job["type"] == "commit":
+            self.commits.append(job)
+        log.debug("Got a commit job")
+        self.state.transition(COLLECTING)
 
-                if idle_times > self.min_idle_times:
-                    idle.set()
+        if self.idle_times > self.min_idle_times:
+            # writes started again, see what happened meanwhile
+            fetch.set()
 
-                idle_times += 1
-                self.on_idle()
+        self.idle_times = 0
+        idle.clear()
+
+    def rest(self):
+        log.debug("Nothing to do right now, going idle")
+
+        if self.idle_times > self.min_idle_times:
+            idle.set()
+
+        self.idle_times += 1
+        self.on_idle()
+
+    def pending_jobs(self):
+        """
+        Takes the jobs waiting in the commit queue, without blocking.
+        """
+
+        jobs = []
+        while True:
+            try:
+                jobs.append(self.commit_queue.get(block=False))
+            except Empty:
+                return jobs
 
     def on_idle(self):
         """
@@ -94,36 +157,142 @@ class SyncWorker(Peasant):
         In this case we are safe to merge and push.
         """
 
-        if not syncing.is_set():
-            log.debug("Set syncing event (%d pending writes)", writers.value)
-            syncing.set()
+        if not self.state.hold_writers(timeout=0):
+            log.debug("Idling (%d pending writes)", self.state.writers)
+            return
+
+        if self.commits:
+            log.info("Get some commits")
+            self.state.transition(COMMITTING)
+            self.commit(self.commits)
+            self.commits = []
+
+        if self.in_memory:
+            # Writes made from now on are committed on top of whatever this
+            # sync brings, by the next idle round.
+            self.state.release_writers()
+
+        if self.local_first:
+            self.sync_with_backoff()
         else:
-            log.debug("Idling (%d pending writes)", writers.value)
+            self.sync_with_retries()
+
+        self.update_backlog()
 
-        if writers.value == 0:
-            if self.commits:
-                log.info("Get some commits")
-                self.commit(self.commits)
-                self.commits = []
+    def sync_with_retries(self):
+        count = 0
+        log.debug("Start syncing, first attempt.")
+        while not self.sync() and count < 5:
+            fuzz = random.randint(0, 1000) / 1000
+            wait = 2**count + fuzz
+
+            log.debug("Failed to sync. Going to sleep for %d seconds", wait)
+            if shutting_down.wait(wait):
+                break
+
+            count += 1
+            log.debug("Retry-ing to sync with remote. Attempt #%d", count)
+
+        if count >= 5:
+            log.error("Didn't manage to sync, I need some help")
+
+    def sync_with_backoff(self):
+        """
+        Tries to sync once. If it fails, writers are let through and the next
+        attempt is put off, for longer and longer, while the remote is down.
+        """
 
-            count = 0
-            log.debug("Start syncing, first attempt.")
-            while not self.sync() and count < 5:
-                fuzz = random.randint(0, 1000) / 1000
-                wait = 2**count + fuzz
+        if self.retry_backoff is None:
+            self.retry_backoff = Backoff(self.timeout, self.max_retry_interval)
 
-                log.debug("Failed to sync. Going to sleep for %d seconds", wait)
-                time.sleep(wait)
+        if time.monotonic() < self.next_sync:
+            log.debug("Remote is unavailable, sync later")
+            # writes go on, until the next attempt
+            self.state.release_writers()
+            self.state.transition(DEGRADED)
+            return
 
-                count += 1
-                log.debug("Retry-ing to sync with remote. Attempt #%d", count)
+        if self.sync():
+            self.retry_backoff.reset()
+            self.next_sync = 0
+            return
 
-            if count >= 5:
-                log.error("Didn't manage to sync, I need some help")
+        self.state.release_writers()
+
+        delay = self.retry_backoff.delay()
+        self.retry_backoff.increase()
+        self.next_sync = time.monotonic() + delay
+        log.info("Failed to sync, retrying in %d seconds", delay)
+
+    def update_backlog(self):
+        unpushed = self.repository.unpushed_commits(self.upstream, self.branch)
+        metrics.set("unpushed_commits", unpushed)
+
+        if self.max_unpushed_commits and unpushed >= self.max_unpushed_commits:
+            if not read_only.is_set():
+                log.error("%d commits weren't pushed, rejecting writes", unpushed)
+            read_only.set()
+        else:
+            read_only.clear()
+
+    def flush(self):
+        """
+        Commits and pushes whatever is pending, without waiting for
+        `push_interval`. It's used on unmount, right before the clone goes
+        away.
+        """
+
+        for job in self.pending_jobs():
+            if job["type"] == "commit":
+                self.commits.append(job)
+
+        if self.commits:
+            self.commit(self.commits)
+            self.commits = []
+
+        if self.first_pending is None:
+            return
+
+        log.info("Push pending commits before stopping")
+        flush.set()
+        if not self.sync():
+            log.error("Couldn't push pending commits")
+
+    def push_due(self):
+        if flush.is_set() or self.first_pending is None:
+            return True
+
+        now = time.monotonic()
+        if self.push_delay and now - self.first_pending >= self.push_delay:
+            return True
+
+        return now - self.last_pending >= self.push_interval
 
     def merge(self):
+        if self.kernel_cache is not None:
+            old_head = self.repository.head.target
+            remote_head = self.repository.remote_head(self.upstream, self.branch).id
+
         log.debug("Start merging")
-        self.strategy(self.branch, self.branch, self.upstream)
+        try:
+            if self.in_memory:
+                commit_id = self.strategy.merged_commit(
+                    self.branch, self.branch, self.upstream
+                )
+                with self.hold_writers():
+                    keep = self.repository.dirty_paths()
+                    self.strategy.apply(self.branch, commit_id, keep=keep)
+            else:
+                self.strategy(self.branch, self.branch, self.upstream)
+        finally:
+            if self.kernel_cache is not None:
+                # The strategy may pass through the remote's tree before
+                # settling on the merged one, so both diffs are relevant.
+                new_head = self.repository.head.target
+                self.changed_paths |= self.repository.changed_paths(
+                    old_head, remote_head
+                )
+                self.changed_paths |= self.repository.changed_paths(old_head, new_head)
 
         log.debug("Update commits cache")
         self.repository.commits.update()
@@ -131,13 +300,30 @@ class SyncWorker(Peasant):
         log.debug("Update ignore list")
         self.repository.ignore.update()
 
+    @contextmanager
+    def hold_writers(self):
+        """
+        Holds new writers back and waits, for at most `timeout` seconds, for
+        the ones in progress to finish, so that the working directory and the
+        index can be changed under them.
+        """
+
+        if not self.state.hold_writers(timeout=self.timeout):
+            raise TimeoutError(f"{self.state.writers} writers still busy")
+
+        try:
+            yield
+        finally:
+            self.state.release_writers()
+
     def sync(self):
         log.debug("Check if I'm ahead")
         need_to_push = self.repository.ahead(self.upstream, self.branch)
-        sync_done.clear()
 
+        merged = False
         if self.repository.behind:
             log.debug("I'm behind so I start merging")
+            self.state.transition(MERGING)
             try:
                 log.debug("Start fetching")
                 self.repository.fetch(self.upstream, self.branch, self.credentials)
@@ -145,36 +331,69 @@ class SyncWorker(Peasant):
                 log.debug("Start merging")
                 self.merge()
                 log.debug("Merge done with success, ready to push")
-                need_to_push = True
+                need_to_push = merged = True
             except:
                 log.exception("Merge failed")
+                self.state.transition(DEGRADED)
                 return False
 
+        # merges are pushed right away, before the remote moves again
+        if need_to_push and not merged and not self.push_due():
+            log.debug("Hold back the push, more commits may follow")
+            metrics.increment("deferred_pushes")
+            need_to_push = False
+
         if need_to_push:
+            self.state.transition(PUSHING)
             try:
                 with remote_operation:
                     log.debug("Start pushing")
                     self.repository.push(self.upstream, self.branch, self.credentials)
                     self.repository.behind = False
                     log.info("Push done")
-                log.debug("Clear syncing")
-                syncing.clear()
-                log.debug("Set sync_done")
-                sync_done.set()
+                metrics.increment("pushes")
+                metrics.set("last_push", time.time())
+                self.first_pending = self.last_pending = None
+                flush.clear()
+                log.debug("Let writers through")
+                self.state.release_writers()
+                self.state.transition(IDLE)
                 log.debug("Set push_successful")
                 push_successful.set()
             except Exception as error:
+                metrics.increment("failed_pushes")
                 push_successful.clear()
                 fetch.set()
                 log.debug("Push failed because of %s", error)
+                self.state.transition(DEGRADED)
                 return False
         else:
-            log.debug("Sync done, clearing")
-            sync_done.set()
-            syncing.clear()
+            log.debug("Sync done, letting writers through")
+            self.state.release_writers()
+            if self.first_pending is None:
+                flush.clear()
+                self.state.transition(IDLE)
+            else:
+                self.state.transition(COLLECTING)
 
+        self.invalidate_kernel_cache()
         return True
 
+    def invalidate_kernel_cache(self):
+        """
+        Drops what the kernel cached about the paths changed by merges.
+
+        It runs only once writers were let through, since the kernel may hold
+        page locks for a write which is waiting on us.
+        """
+
+        if self.kernel_cache is None or not self.changed_paths:
+            return
+
+        log.debug("Invalidate %d paths in kernel cache", len(self.changed_paths))
+        self.kernel_cache.invalidate(self.changed_paths)
+        self.changed_paths = set()
+
     def commit(self, jobs):
         if len(jobs) == 1:
             message = jobs[0]["params"]["message"]
@@ -207,6 +426,10 @@ class SyncWorker(Peasant):
             )
             self.repository.commits.update()
             log.debug("Update commits cache")
+
+            self.last_pending = time.monotonic()
+            if self.first_pending is None:
+                self.first_pending = self.last_pending
         else:
             self.repository.create_reference(
                 f"refs/heads/{self.branch}", old_head, force=True
@@ -0,0 +1,91 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from multiprocessing import get_context
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pygit2 import Oid
+
+from gitfs.cache.arena import SLOT, BlobArena, blob_hash
+
+
+def blob(data):
+    return Oid(raw=blob_hash(data)), data
+
+
+def read_from_another_process(path, oid):
+    return BlobArena(path, 0).get(Oid(hex=oid))
+
+
+class TestBlobArena:
+    def test_put_and_get(self, tmp_path):
+        arena = BlobArena(str(tmp_path / "arena"), 64 * 1024)
+        oid, data = blob(b"content")
+        mocked_metrics = MagicMock()
+
+        with patch("gitfs.cache.arena.metrics", mocked_metrics):
+            assert arena.get(oid) is None
+            arena.put(oid, data)
+            assert arena.get(oid) == data
+
+        mocked_metrics.increment.assert_any_call("blob_arena_misses")
+        mocked_metrics.increment.assert_any_call("blob_arena_hits")
+
+    def test_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / "arena")
+        arena = BlobArena(path, 64 * 1024)
+        oid, data = blob(b"shared content")
+        arena.put(oid, data)
+
+        with get_context("spawn").Pool(1) as pool:
+            assert pool.apply(read_from_another_process, (path, str(oid))) == data
+
+        # the geometry comes from the file, not from the size asked for
+        assert BlobArena(path, 0).data_size == arena.data_size
+
+    def test_oldest_blobs_are_overwritten(self, tmp_path):
+        arena = BlobArena(str(tmp_path / "arena"), 16 * 1024)
+        blobs = [blob(bytes([index]) * 1000) for index in range(30)]
+
+        for oid, data in blobs:
+            arena.put(oid, data)
+
+        assert arena.get(blobs[0][0]) is None
+        assert arena.get(blobs[-1][0]) == blobs[-1][1]
+
+    def test_damaged_blobs_are_missed(self, tmp_path):
+        arena = BlobArena(str(tmp_path / "arena"), 64 * 1024)
+        oid, data = blob(b"content")
+        arena.put(oid, data)
+
+        arena.map[arena.data_offset] = ord("C")
+        assert arena.get(oid) is None
+
+    def test_big_blobs_are_left_out(self, tmp_path):
+        arena = BlobArena(str(tmp_path / "arena"), 64 * 1024)
+        oid, data = blob(b"x" * arena.data_size)
+
+        arena.put(oid, data)
+
+        assert all(
+            SLOT.unpack_from(arena.map, offset)[2] == 0
+            for offset in arena.slot_offsets(oid.raw)
+        )
+        assert arena.get(oid) is None
+
+    def test_too_small(self, tmp_path):
+        with pytest.raises(ValueError):
+            BlobArena(str(tmp_path / "arena"), 64)
@@ -0,0 +1,100 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest.mock import MagicMock, patch
+
+from gitfs.cache.blobs import BlobCache
+
+
+class TestBlobCache:
+    def test_blobs_are_read_once(self):
+        mocked_repo = MagicMock()
+        mocked_repo.__getitem__.side_effect = lambda oid: MagicMock(data=oid * 2)
+        mocked_metrics = MagicMock()
+
+        with patch("gitfs.cache.blobs.metrics", mocked_metrics):
+            blobs = BlobCache(mocked_repo, 8)
+
+            assert blobs[b"ab"] == b"abab"
+            assert blobs[b"ab"] == b"abab"
+            assert mocked_repo.__getitem__.call_count == 1
+
+            # evicts the least recently used blob
+            assert blobs[b"cd"] == b"cdcd"
+            assert blobs[b"ef"] == b"efef"
+            assert b"ab" not in blobs.cache
+
+        mocked_metrics.increment.assert_any_call("blob_cache_hits")
+        mocked_metrics.increment.assert_any_call("blob_cache_misses")
+
+    def test_blobs_bigger_than_the_cache(self):
+        mocked_repo = MagicMock()
+        mocked_repo.__getitem__.return_value = MagicMock(data=b"too big")
+
+        blobs = BlobCache(mocked_repo, 4)
+
+        assert blobs["oid"] == b"too big"
+        assert blobs["oid"] == b"too big"
+        assert mocked_repo.__getitem__.call_count == 2
+        assert len(blobs.cache) == 0
+
+    def test_only_reads_from_the_object_database_take_a_slot(self):
+        mocked_repo = MagicMock()
+        mocked_admission = MagicMock()
+
+        def read(oid):
+            assert mocked_admission.__enter__.call_count == 1
+            return MagicMock(data=b"data")
+
+        mocked_repo.__getitem__.side_effect = read
+
+        blobs = BlobCache(mocked_repo, 16, admission=mocked_admission)
+
+        assert blobs["oid"] == b"data"
+        assert blobs["oid"] == b"data"
+        assert mocked_admission.__enter__.call_count == 1
+        assert mocked_admission.__exit__.call_count == 1
+
+    def test_shared_between_repositories(self):
+        first_repo = MagicMock()
+        first_repo.__getitem__.return_value = MagicMock(data=b"first")
+        second_repo = MagicMock()
+        second_repo.__getitem__.return_value = MagicMock(data=b"second")
+
+        blobs = BlobCache(None, 16)
+        first = blobs.for_repository(first_repo)
+        second = blobs.for_repository(second_repo)
+
+        assert first["a"] == b"first"
+        assert second["b"] == b"second"
+        # equal ids mean equal content, whichever repository read it
+        assert second["a"] == b"first"
+        second_repo.__getitem__.assert_called_once_with("b")
+        assert first.cache is second.cache is blobs.cache
+        assert first.lock is second.lock
+
+    def test_blobs_from_the_arena(self):
+        mocked_repo = MagicMock()
+        mocked_repo.__getitem__.return_value = MagicMock(data=b"from odb")
+        mocked_arena = MagicMock()
+        mocked_arena.get.side_effect = [None, b"from arena"]
+
+        blobs = BlobCache(mocked_repo, 1, arena=mocked_arena)
+
+        # read from the object database, then shared through the arena
+        assert blobs["first"] == b"from odb"
+        mocked_arena.put.assert_called_once_with("first", b"from odb")
+        assert blobs["second"] == b"from arena"
+        assert mocked_repo.__getitem__.call_count == 1
@@ -14,7 +14,8 @@
 
 
 from datetime import datetime
-from unittest.mock import MagicMock, call
+from threading import Thread
+from unittest.mock import MagicMock, call, patch
 
 from pygit2 import GIT_SORT_TIME
 
@@ -46,7 +47,9 @@ class TestCommitCache:
         cache["2014-09-20"] = Commit(1, 1, "1111111111")
         assert sorted(cache.keys()) == ["2014-09-19", "2014-09-20"]
         asserted_time = datetime.fromtimestamp(mocked_commit.commit_time)
-        asserted_time = f"{asserted_time.hour}-{asserted_time.minute}-{asserted_time.second}"
+        asserted_time = (
+            f"{asserted_time.hour}-{asserted_time.minute}-{asserted_time.second}"
+        )
         assert repr(cache["2014-09-19"]) == f"[{asserted_time}-1111111111]"
         del cache["2014-09-20"]
         for commit_date in cache:
@@ -55,3 +58,92 @@ class TestCommitCache:
         mocked_repo.lookup_reference.assert_has_calls([call("HEAD")])
         mocked_repo.walk.assert_called_once_with("head", GIT_SORT_TIME)
         assert mocked_repo.lookup_reference().resolve.call_count == 2
+
+    def test_shallow_cache(self):
+        mocked_repo = MagicMock(is_shallow=True)
+        mocked_repo.walk.return_value = [
+            MagicMock(commit_time=1411135000, id="1111111111"),
+            MagicMock(commit_time=1410135000, id="2222222222"),
+        ]
+        mocked_metrics = MagicMock()
+
+        with patch("gitfs.cache.commits.metrics", mocked_metrics):
+            cache = CommitCache(mocked_repo)
+            cache.update()
+
+        assert cache.shallow is True
+        assert cache.oldest == datetime.fromtimestamp(1410135000).date()
+        mocked_metrics.set.assert_called_once_with("history_commits", 2)
+
+    def test_ready_once_indexed(self):
+        mocked_repo = MagicMock(is_shallow=False)
+        mocked_repo.walk.return_value = []
+
+        cache = CommitCache(mocked_repo)
+        assert not cache.ready.is_set()
+
+        cache.update()
+        assert cache.ready.is_set()
+
+    def test_at(self):
+        mocked_repo = MagicMock(is_shallow=False)
+        mocked_repo.walk.return_value = [
+            MagicMock(commit_time=300, id="child"),
+            MagicMock(commit_time=300, id="parent"),
+            MagicMock(commit_time=200, id="second"),
+            MagicMock(commit_time=100, id="first"),
+        ]
+
+        cache = CommitCache(mocked_repo)
+        assert cache.at(1000) is None
+
+        cache.update()
+        assert cache.at(99) is None
+        assert cache.at(100) == "first"
+        assert cache.at(250) == "second"
+        assert cache.at(300) == "child"
+        assert cache.at(1000) == "child"
+
+    def test_first_walk_shows_copies_of_the_days_indexed_so_far(self):
+        mocked_repo = MagicMock(is_shallow=False)
+        date = datetime.fromtimestamp(1411135000).strftime("%Y-%m-%d")
+        shown = []
+
+        def walk(head, sort):
+            yield MagicMock(commit_time=1411135000, id="2222222222")
+            shown.append(cache[date])
+            yield MagicMock(commit_time=1411134990, id="1111111111")
+            shown.append(cache[date])
+
+        mocked_repo.walk.side_effect = walk
+
+        with patch("gitfs.cache.commits.INDEX_BATCH", 1):
+            cache = CommitCache(mocked_repo)
+            cache.update()
+
+        # what was shown isn't changed by the rest of the walk
+        assert [len(commits) for commits in shown] == [1, 2]
+        assert [commit.id for commit in cache[date]] == ["1111111111", "2222222222"]
+
+    def test_update_during_a_walk(self):
+        mocked_repo = MagicMock(is_shallow=False)
+        updates = []
+
+        def walk(head, sort):
+            if not updates:
+                # a sync updates the index while the history is first indexed
+                updates.append(Thread(target=cache.update))
+                updates[0].start()
+                updates[0].join(timeout=1)
+                yield MagicMock(commit_time=100, id="older")
+            else:
+                yield MagicMock(commit_time=200, id="newer")
+
+        mocked_repo.walk.side_effect = walk
+
+        cache = CommitCache(mocked_repo)
+        cache.update()
+
+        # the sync didn't wait for the walk, whose older index is dropped
+        assert not updates[0].is_alive()
+        assert cache.at(1000) == "newer"
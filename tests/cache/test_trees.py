@@ -0,0 +1,46 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from pygit2 import GIT_FILEMODE_BLOB, GIT_FILEMODE_TREE, init_repository
+
+from gitfs.cache.trees import TreeResolver
+
+
+class TestTreeResolver:
+    def test_resolve(self, tmp_path):
+        repo = init_repository(str(tmp_path), bare=True)
+        blob = repo.create_blob(b"content")
+
+        builder = repo.TreeBuilder()
+        builder.insert("file", blob, GIT_FILEMODE_BLOB)
+        subtree = builder.write()
+        builder = repo.TreeBuilder()
+        builder.insert("dir", subtree, GIT_FILEMODE_TREE)
+        builder.insert("file", blob, GIT_FILEMODE_BLOB)
+        tree = repo[builder.write()]
+
+        resolver = TreeResolver(repo)
+
+        assert resolver.resolve(tree, "/") == tree
+        assert resolver.resolve(tree, "/dir").id == subtree
+        assert resolver.resolve(tree, "/dir/file").id == blob
+        assert resolver.resolve(tree, "/dir/missing") is None
+        assert resolver.resolve(tree, "/file/file") is None
+
+        assert set(resolver.cache) == {
+            (tree.id, "dir"),
+            (tree.id, "dir/file"),
+            (tree.id, "file"),
+        }
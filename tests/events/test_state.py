@@ -0,0 +1,77 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from threading import Thread
+from unittest.mock import MagicMock
+
+import pytest
+
+from gitfs.events.state import COMMITTING, IDLE, MERGING, SyncState
+
+
+class TestSyncState:
+    def test_transition(self):
+        listener = MagicMock()
+        state = SyncState()
+        state.add_listener(listener)
+
+        state.transition(COMMITTING)
+        state.transition(COMMITTING)
+
+        assert state.state == COMMITTING
+        listener.assert_called_once_with(IDLE, COMMITTING)
+
+    def test_transition_to_unknown_state(self):
+        with pytest.raises(ValueError):
+            SyncState().transition("sleeping")
+
+    def test_wait_for(self):
+        state = SyncState()
+
+        assert not state.wait_for(MERGING, timeout=0.01)
+
+        Thread(target=state.transition, args=(MERGING,)).start()
+        assert state.wait_for(MERGING, timeout=1)
+
+    def test_hold_writers_waits_for_writes_in_progress(self):
+        state = SyncState()
+        state.begin_write()
+
+        assert not state.hold_writers(timeout=0.01)
+        assert not state.holding
+
+        state.end_write()
+        assert state.hold_writers(timeout=0)
+        assert state.holding
+
+    def test_begin_write_while_holding(self):
+        state = SyncState()
+        state.hold_writers()
+
+        # writes already under way go on
+        state.begin_write(wait=False)
+        assert state.writers == 1
+        state.end_write()
+
+        writer = Thread(target=state.begin_write)
+        writer.start()
+        writer.join(0.05)
+        assert writer.is_alive()
+        assert state.writers == 0
+
+        state.release_writers()
+        writer.join(1)
+        assert not writer.is_alive()
+        assert state.writers == 1
@@ -0,0 +1,220 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from unittest.mock import MagicMock, patch
+
+import pygit2
+import pytest
+from pygit2 import GIT_CHECKOUT_FORCE
+
+from gitfs.merges.in_memory import InMemoryAcceptMine
+from gitfs.repository import Repository
+
+
+class TestInMemoryAcceptMine:
+    def get_merger(self, mocked_repo):
+        return InMemoryAcceptMine(
+            mocked_repo, author=("name", "email"), committer=("name", "email")
+        )
+
+    def get_repo(self, local, remote):
+        mocked_repo = MagicMock()
+        mocked_repo.branches.local.get.return_value.target = local
+        mocked_repo.branches.remote.get.return_value.target = remote
+        return mocked_repo
+
+    def test_merged_commit_when_up_to_date(self):
+        mocked_repo = self.get_repo("local", "local")
+
+        assert self.get_merger(mocked_repo).merged_commit("main", "main", "origin") == (
+            "local"
+        )
+        assert mocked_repo.merge_commits.call_count == 0
+
+    def test_merged_commit_fast_forwards(self):
+        mocked_repo = self.get_repo("local", "remote")
+        mocked_repo.descendant_of.side_effect = lambda first, second: first == "remote"
+
+        merger = self.get_merger(mocked_repo)
+        assert merger.merged_commit("main", "main", "origin") == "remote"
+
+        mocked_repo.branches.remote.get.assert_called_once_with("origin/main")
+        assert mocked_repo.merge_commits.call_count == 0
+
+    def test_merged_commit(self):
+        mocked_repo = self.get_repo("local", "remote")
+        mocked_repo.descendant_of.return_value = False
+        mocked_repo.__getitem__.return_value.message = "local message"
+        mocked_repo.create_commit.return_value = "merged"
+        mocked_index = mocked_repo.merge_commits.return_value
+        mocked_index.write_tree.return_value = "tree"
+
+        merger = self.get_merger(mocked_repo)
+        merger.solve_conflicts = MagicMock()
+
+        with patch("gitfs.merges.in_memory.pygit2.Signature") as mocked_signature:
+            mocked_signature.return_value = "signature"
+            assert merger.merged_commit("main", "main", "origin") == "merged"
+
+        mocked_repo.merge_commits.assert_called_once_with("remote", "local")
+        merger.solve_conflicts.assert_called_once_with(mocked_index)
+        mocked_index.write_tree.assert_called_once_with(mocked_repo._repo)
+        mocked_repo.create_commit.assert_called_once_with(
+            None,
+            "signature",
+            "signature",
+            "merging: local message",
+            "tree",
+            ["remote", "local"],
+        )
+
+    def test_apply(self):
+        mocked_repo = MagicMock()
+        mocked_repo.lookup_reference.return_value.target = "local"
+        mocked_repo.__getitem__.return_value = "commit"
+        mocked_repo.changed_paths.return_value = {"b", "a", "dirty"}
+
+        self.get_merger(mocked_repo).apply("main", "merged", keep={"dirty"})
+
+        mocked_repo.lookup_reference.assert_called_once_with("refs/heads/main")
+        mocked_repo.changed_paths.assert_called_once_with("local", "merged")
+        mocked_repo.checkout_tree.assert_called_once_with(
+            "commit", strategy=GIT_CHECKOUT_FORCE, paths=["a", "b"]
+        )
+        mocked_repo.create_reference.assert_called_once_with(
+            "refs/heads/main", "merged", force=True
+        )
+
+    def test_apply_when_only_kept_paths_changed(self):
+        mocked_repo = MagicMock()
+        mocked_repo.lookup_reference.return_value.target = "local"
+        mocked_repo.changed_paths.return_value = {"dirty"}
+
+        self.get_merger(mocked_repo).apply("main", "merged", keep={"dirty"})
+
+        assert mocked_repo.checkout_tree.call_count == 0
+        mocked_repo.create_reference.assert_called_once_with(
+            "refs/heads/main", "merged", force=True
+        )
+
+    def test_apply_without_changes(self):
+        mocked_repo = MagicMock()
+        mocked_repo.lookup_reference.return_value.target = "local"
+
+        self.get_merger(mocked_repo).apply("main", "local")
+
+        assert mocked_repo.checkout_tree.call_count == 0
+        assert mocked_repo.create_reference.call_count == 0
+
+    def test_call_reraises(self):
+        merger = self.get_merger(MagicMock())
+        merger.merge = MagicMock(side_effect=ValueError)
+
+        with pytest.raises(ValueError):
+            merger("main", "main", "origin")
+
+    def test_merge_keeps_local_version_of_conflicting_files(self, tmp_path):
+        git_repo = pygit2.init_repository(str(tmp_path))
+        signature = pygit2.Signature("name", "email")
+
+        def commit(ref, files, parents):
+            index = pygit2.Index()
+            if parents:
+                index.read_tree(git_repo[parents[0]].tree)
+            for path, content in files.items():
+                if content is None:
+                    index.remove(path)
+                else:
+                    blob = git_repo.create_blob(content)
+                    index.add(pygit2.IndexEntry(path, blob, pygit2.GIT_FILEMODE_BLOB))
+            tree = index.write_tree(git_repo)
+            commit_id = git_repo.create_commit(
+                None, signature, signature, "message", tree, parents
+            )
+            git_repo.references.create(ref, commit_id, force=True)
+            return commit_id
+
+        base = commit(
+            "refs/heads/main",
+            {"both": b"base", "deleted_by_us": b"base", "deleted_by_them": b"base"},
+            [],
+        )
+        git_repo.references.create("refs/remotes/origin/main", base)
+        git_repo.set_head("refs/heads/main")
+        local = commit(
+            "refs/heads/main",
+            {"both": b"mine", "deleted_by_us": None, "deleted_by_them": b"mine"},
+            [base],
+        )
+        remote = commit(
+            "refs/remotes/origin/main",
+            {"both": b"theirs", "deleted_by_us": b"theirs", "deleted_by_them": None},
+            [base],
+        )
+        commit("refs/remotes/origin/main", {"new": b"theirs"}, [remote])
+        git_repo.checkout_head(strategy=GIT_CHECKOUT_FORCE)
+
+        merger = self.get_merger(Repository(git_repo))
+        merger("main", "main", "origin")
+
+        head = git_repo.head.peel()
+        assert head.parent_ids[1] == local
+        assert {entry.name: git_repo[entry.id].data for entry in head.tree} == {
+            "both": b"mine",
+            "deleted_by_them": b"mine",
+            "new": b"theirs",
+        }
+        assert (tmp_path / "both").read_bytes() == b"mine"
+        assert (tmp_path / "new").read_bytes() == b"theirs"
+        assert not (tmp_path / "deleted_by_us").exists()
+        assert git_repo.status() == {}
+
+    def test_apply_keeps_uncommitted_changes(self, tmp_path):
+        git_repo = pygit2.init_repository(str(tmp_path))
+        signature = pygit2.Signature("name", "email")
+
+        for name in ["remote", "both", "deleted", "local"]:
+            (tmp_path / name).write_bytes(b"base")
+        git_repo.index.add_all()
+        git_repo.index.write()
+        base = git_repo.create_commit(
+            "HEAD", signature, signature, "base", git_repo.index.write_tree(), []
+        )
+
+        builder = git_repo.TreeBuilder(git_repo[base].tree)
+        for name in ["remote", "both", "new"]:
+            blob = git_repo.create_blob(b"theirs")
+            builder.insert(name, blob, pygit2.GIT_FILEMODE_BLOB)
+        builder.remove("deleted")
+        merged = git_repo.create_commit(
+            None, signature, signature, "merged", builder.write(), [base]
+        )
+
+        # written and staged while the merge was being computed
+        for name in ["both", "local"]:
+            (tmp_path / name).write_bytes(b"mine")
+            git_repo.index.add(name)
+        git_repo.index.write()
+
+        repository = Repository(git_repo)
+        self.get_merger(repository).apply(
+            "master", merged, keep=repository.dirty_paths()
+        )
+
+        assert git_repo.head.target == merged
+        assert (tmp_path / "remote").read_bytes() == b"theirs"
+        assert (tmp_path / "new").read_bytes() == b"theirs"
+        assert (tmp_path / "both").read_bytes() == b"mine"
+        assert (tmp_path / "local").read_bytes() == b"mine"
+        assert not (tmp_path / "deleted").exists()
+        assert set(git_repo.status()) == {"both", "local"}
@@ -15,17 +15,31 @@
 
 import time
 from collections import namedtuple
+from pathlib import Path
 from stat import S_IFDIR, S_IFREG
 from unittest.mock import ANY, MagicMock, call, patch
 
 import pytest
 from pygit2 import (
     GIT_BRANCH_REMOTE,
+    GIT_CHECKOUT_FORCE,
     GIT_FILEMODE_BLOB,
+    GIT_FILEMODE_COMMIT,
+    GIT_FILEMODE_TREE,
+    GIT_OBJECT_COMMIT,
     GIT_SORT_TIME,
+    GIT_SORT_TOPOLOGICAL,
     GIT_STATUS_CURRENT,
+    GIT_STATUS_INDEX_DELETED,
+    GIT_STATUS_WT_DELETED,
+    GIT_STATUS_WT_NEW,
+    RemoteCallbacks,
+    Signature,
+    clone_repository,
+    init_repository,
 )
 
+from gitfs.object_store import ObjectStore
 from gitfs.repository import Repository
 
 from .base import RepositoryBaseTest
@@ -44,9 +58,26 @@ class TestRepository(RepositoryBaseTest):
         repo = Repository(mocked_repo)
         repo.push("origin", "master", "credentials")
 
-        mocked_remote.push.assert_called_once_with(
-            ["refs/heads/master"], callbacks="credentials"
-        )
+        mocked_remote.push.assert_called_once_with(["refs/heads/master"], callbacks=ANY)
+
+    def test_push_counts_pushed_bytes(self):
+        mocked_repo = MagicMock()
+        mocked_remote = MagicMock()
+        mocked_remote.name = "origin"
+        mocked_repo.remotes = [mocked_remote]
+        credentials = RemoteCallbacks(credentials="credentials")
+
+        def push(refspecs, callbacks):
+            assert callbacks.credentials == "credentials"
+            callbacks.push_transfer_progress(1, 2, 100)
+            callbacks.push_transfer_progress(2, 2, 250)
+
+        mocked_remote.push.side_effect = push
+
+        with patch("gitfs.repository.metrics") as mocked_metrics:
+            Repository(mocked_repo).push("origin", "master", credentials)
+
+            mocked_metrics.increment.assert_called_once_with("pushed_bytes", 250)
 
     def test_fetch(self):
         class MockedCommit:
@@ -62,11 +93,328 @@ class TestRepository(RepositoryBaseTest):
         mocked_repo.remotes = [mocked_remote]
         mocked_repo.lookup_branch().get_object.return_value = MockedCommit()
         mocked_repo.walk.return_value = [MockedCommit()]
+        mocked_repo.ahead_behind.return_value = (0, 1)
 
         repo = Repository(mocked_repo)
         repo.fetch("origin", "master", "credentials")
 
-        assert mocked_remote.fetch.call_count == 1
+        mocked_remote.fetch.assert_called_once_with(
+            refspecs=["+refs/heads/master:refs/remotes/origin/master"],
+            callbacks="credentials",
+        )
+
+    def test_fetch_when_remote_branch_did_not_change(self):
+        mocked_repo = MagicMock()
+        mocked_remote = MagicMock()
+        mocked_remote.name = "origin"
+        mocked_head = MagicMock(oid="head")
+        mocked_head.name = "refs/heads/master"
+        mocked_remote.list_heads.return_value = [mocked_head]
+
+        mocked_repo.remotes = [mocked_remote]
+        mocked_repo.references.get.return_value = MagicMock(target="head")
+        mocked_repo.branches.remote.get.return_value = MagicMock(target="head")
+        mocked_repo.branches.local.get.return_value = MagicMock(target="head")
+
+        repo = Repository(mocked_repo)
+        assert repo.fetch("origin", "master", "credentials") is False
+
+        mocked_remote.list_heads.assert_called_once_with(callbacks="credentials")
+        mocked_repo.references.get.assert_called_once_with("refs/remotes/origin/master")
+        assert not mocked_remote.fetch.called
+
+    def test_fetch_from_a_local_remote(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+
+        def commit(repo, ref, content, parents):
+            builder = repo.TreeBuilder()
+            builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                ref, author, author, content.decode(), builder.write(), parents
+            )
+
+        remote = init_repository(str(tmp_path / "remote.git"), bare=True)
+        first = commit(remote, "refs/heads/master", b"first", [])
+        other = commit(remote, "refs/heads/other", b"other", [])
+        git_repo = clone_repository(
+            str(tmp_path / "remote.git"), str(tmp_path / "local")
+        )
+        repo = Repository(git_repo)
+
+        assert repo.remote_branch_changed("origin", "master", None) is False
+        assert repo.fetch("origin", "master", None) is False
+
+        second = commit(remote, "refs/heads/master", b"second", [first])
+        commit(remote, "refs/heads/other", b"another", [other])
+        remote.create_reference("refs/tags/v1", second)
+
+        assert repo.remote_branch_changed("origin", "master", None) is True
+        assert repo.fetch("origin", "master", None) is True
+
+        references = git_repo.references
+        assert references["refs/remotes/origin/master"].target == second
+        assert references["refs/remotes/origin/other"].target == other
+        assert "refs/tags/v1" not in references
+        assert repo.remote_branch_changed("origin", "master", None) is False
+
+    def test_fetch_all_refs_from_a_local_remote(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+
+        def commit(repo, ref, content, parents):
+            builder = repo.TreeBuilder()
+            builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                ref, author, author, content.decode(), builder.write(), parents
+            )
+
+        remote = init_repository(str(tmp_path / "remote.git"), bare=True)
+        first = commit(remote, "refs/heads/master", b"first", [])
+        git_repo = clone_repository(
+            str(tmp_path / "remote.git"), str(tmp_path / "local")
+        )
+        repo = Repository(git_repo)
+        repo.all_refs = True
+
+        assert repo.remote_branch_changed("origin", "master", None) is False
+
+        # a new branch or tag is enough, the mounted branch stays put
+        other = commit(remote, "refs/heads/feature/x", b"other", [])
+        remote.create_tag("v1", first, GIT_OBJECT_COMMIT, author, "v1")
+
+        assert repo.remote_branch_changed("origin", "master", None) is True
+        # nothing to merge, though
+        assert repo.fetch("origin", "master", None) is False
+
+        references = git_repo.references
+        assert references["refs/remotes/origin/master"].target == first
+        assert references["refs/remotes/origin/feature/x"].target == other
+        assert references["refs/tags/v1"].peel(GIT_OBJECT_COMMIT).id == first
+        assert repo.remote_branch_changed("origin", "master", None) is False
+
+    def test_reopen_an_earlier_clone(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+
+        def commit(repo, content, parents):
+            builder = repo.TreeBuilder()
+            builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                "refs/heads/master", author, author, "update", builder.write(), parents
+            )
+
+        remote = init_repository(remote_url, bare=True)
+        first = commit(remote, b"first", [])
+        Repository.clone(remote_url, str(tmp_path / "local"), "master")
+        second = commit(remote, b"second", [first])
+
+        # left behind by a mount which was killed
+        (tmp_path / "local" / ".git" / "index.lock").write_bytes(b"")
+        (tmp_path / "local" / "new").write_bytes(b"new")
+
+        repo = Repository.reopen(remote_url, str(tmp_path / "local"), "master")
+
+        assert repo.behind is True
+        assert repo.references["refs/remotes/origin/master"].target == second
+        assert not (tmp_path / "local" / ".git" / "index.lock").exists()
+        assert repo.stage_all(ignore=[]) == (["new"], [])
+        assert repo.stage_all(ignore=[]) == (["new"], [])
+        assert "new" in repo.index
+
+    def test_index_object_writes_the_index_tree_once(self, tmp_path):
+        git_repo = init_repository(str(tmp_path / "repo"))
+        (tmp_path / "repo" / "file").write_bytes(b"first")
+        repo = Repository(git_repo)
+        repo.stage_all()
+
+        tree = repo.index_tree()
+        assert repo.index_object("/") is tree
+        assert repo.index_object("/file").data == b"first"
+        assert repo.index_object("/missing") is None
+        assert repo.index_tree() is tree
+
+        # staging changes the index, so its tree is written again
+        (tmp_path / "repo" / "file").write_bytes(b"second")
+        repo.stage_all()
+
+        assert repo.index_tree() is not tree
+        assert repo.index_object("/file").data == b"second"
+
+    def test_reopen_after_a_merge_left_halfway(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        local = tmp_path / "local"
+
+        remote = init_repository(remote_url, bare=True)
+        builder = remote.TreeBuilder()
+        builder.insert("file", remote.create_blob(b"first"), GIT_FILEMODE_BLOB)
+        remote.create_commit(
+            "refs/heads/master", author, author, "first", builder.write(), []
+        )
+        Repository.clone(remote_url, str(local), "master")
+
+        # AcceptMine was merging on its own branches when the mount was killed
+        git_repo = init_repository(str(local))
+        head = git_repo.head.target
+        builder = git_repo.TreeBuilder()
+        builder.insert("file", git_repo.create_blob(b"merging"), GIT_FILEMODE_BLOB)
+        merging = git_repo.create_commit(
+            None, author, author, "merging", builder.write(), [head]
+        )
+        git_repo.create_reference("refs/heads/merging_local", head)
+        git_repo.create_reference("refs/heads/merging_remote", merging)
+        git_repo.set_head("refs/heads/merging_remote")
+        git_repo.checkout_head(strategy=GIT_CHECKOUT_FORCE)
+        assert (local / "file").read_bytes() == b"merging"
+
+        repo = Repository.reopen(remote_url, str(local), "master")
+
+        assert repo.head.shorthand == "master"
+        assert repo.head.target == head
+        assert "refs/heads/merging_local" not in repo.references
+        assert "refs/heads/merging_remote" not in repo.references
+        assert (local / "file").read_bytes() == b"first"
+        assert repo.stage_all(ignore=[]) == ([], [])
+
+    def test_reopen_a_clone_in_use(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        remote = init_repository(remote_url, bare=True)
+        tree = remote.TreeBuilder().write()
+        remote.create_commit("refs/heads/master", author, author, "first", tree, [])
+        Repository.clone(remote_url, str(tmp_path / "local"), "master")
+
+        repo = Repository.reopen(remote_url, str(tmp_path / "local"), "master")
+        with pytest.raises(ValueError):
+            Repository.reopen(remote_url, str(tmp_path / "local"), "master")
+
+        # once the first mount is gone, the clone can be reused
+        repo.clone_lock.close()
+        assert Repository.reopen(remote_url, str(tmp_path / "local"), "master")
+
+    def test_reopen_something_else(self, tmp_path):
+        remote_url = str(tmp_path / "remote.git")
+        init_repository(remote_url, bare=True)
+        clone_repository(remote_url, str(tmp_path / "local"))
+
+        assert Repository.reopen(remote_url, str(tmp_path / "missing")) is None
+        with pytest.raises(ValueError):
+            Repository.reopen("other", str(tmp_path / "local"))
+
+    def test_lazy_clone(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        local = tmp_path / "local"
+
+        def commit(repo, files, parents):
+            builder = repo.TreeBuilder()
+            for name, content in files.items():
+                builder.insert(name, repo.create_blob(content), GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                "refs/heads/master", author, author, "update", builder.write(), parents
+            )
+
+        remote = init_repository(remote_url, bare=True)
+        first = commit(remote, {".gitignore": b"*.log", "file": b"first"}, [])
+        repo = Repository.clone(remote_url, str(local), "master", lazy=True)
+
+        assert repo.lazy is True
+        assert sorted(path.name for path in local.iterdir()) == [".git", ".gitignore"]
+        assert repo.dirty_paths() == set()
+        assert repo.lazy_paths("/") == ["file"]
+        assert repo.index_object("/file").data == b"first"
+
+        second = commit(remote, {".gitignore": b"*.tmp", "file": b"second"}, [first])
+        repo.fetch("origin", "master", None)
+        repo.checkout_tree(repo[second])
+        repo.create_reference("refs/heads/master", second, force=True)
+
+        assert (local / ".gitignore").read_bytes() == b"*.tmp"
+        assert not (local / "file").exists()
+        assert repo.index_object("file").data == b"second"
+
+        assert repo.hydrate("/file") == 1
+        assert (local / "file").read_bytes() == b"second"
+        assert repo.hydrate("/file") == 0
+        assert repo.dirty_paths() == set()
+
+        with pytest.raises(ValueError):
+            Repository.reopen(remote_url, str(local), "master")
+        assert Repository.reopen(remote_url, str(local), "master", lazy=True).lazy
+
+    def test_clone_from_an_object_store(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        store = ObjectStore.for_remote(str(tmp_path / "stores"), remote_url)
+
+        def commit(repo, branch, content, parents):
+            builder = repo.TreeBuilder()
+            builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                f"refs/heads/{branch}",
+                author,
+                author,
+                "update",
+                builder.write(),
+                parents,
+            )
+
+        def objects(repo):
+            directory = Path(repo.path) / "objects"
+            return [
+                path
+                for path in directory.rglob("*")
+                if path.is_file() and path.parent.name != "info"
+            ]
+
+        remote = init_repository(remote_url, bare=True)
+        first = commit(remote, "master", b"first", [])
+        commit(remote, "other", b"other", [first])
+
+        repo = Repository.clone(
+            remote_url, str(tmp_path / "one"), "master", object_store=store
+        )
+        other = Repository.clone(
+            remote_url, str(tmp_path / "two"), "other", lazy=True, object_store=store
+        )
+
+        # the clones have no objects of their own
+        assert (tmp_path / "one" / "file").read_bytes() == b"first"
+        assert other.index_object("file").data == b"other"
+        assert objects(repo) == objects(other) == []
+        assert repo.object_store is store
+
+        second = commit(remote, "master", b"second", [first])
+        assert repo.fetch("origin", "master", None) is True
+        assert repo.lookup_reference("refs/remotes/origin/master").target == second
+        assert objects(repo) == []
+
+        reopened = Repository.reopen(remote_url, str(tmp_path / "one"), "master")
+        assert reopened.object_store.path == store.path
+
+    def test_stage_all(self):
+        mocked_repo = MagicMock()
+        mocked_repo.status.return_value = {
+            "added": GIT_STATUS_WT_NEW,
+            "deleted": GIT_STATUS_WT_DELETED,
+            "staged": GIT_STATUS_INDEX_DELETED,
+            "ignored": GIT_STATUS_WT_NEW,
+        }
+
+        repo = Repository(mocked_repo)
+
+        assert repo.stage_all(ignore=["ignored"]) == (["added"], ["deleted", "staged"])
+        mocked_repo.index.add.assert_called_once_with("added")
+        mocked_repo.index.remove.assert_called_once_with("deleted")
+        assert mocked_repo.index.write.call_count == 1
+
+    def test_recover_from_a_merge(self, tmp_path):
+        mocked_repo = MagicMock(path=str(tmp_path))
+        mocked_repo.state.return_value = 1
+
+        Repository(mocked_repo).recover()
+
+        assert mocked_repo.state_cleanup.call_count == 1
+        assert mocked_repo.checkout_head.call_count == 1
 
     def test_comit_no_parents(self):
         mocked_repo = MagicMock()
@@ -123,10 +471,36 @@ class TestRepository(RepositoryBaseTest):
             Repository.clone(remote_url, path)
 
             mocked_clone.assert_called_once_with(
-                remote_url, path, checkout_branch=None, callbacks=None
+                remote_url, path, checkout_branch=None, callbacks=None, depth=0
             )
             assert mocked_repo.checkout_head.call_count == 1
 
+    def test_shallow_clone_and_deepen(self):
+        mocked_remote = MagicMock()
+        mocked_remote.name = "origin"
+        mocked_repo = MagicMock(remotes=[mocked_remote])
+
+        with patch("gitfs.repository.clone_repository") as mocked_clone:
+            mocked_clone.return_value = mocked_repo
+
+            repo = Repository.clone("url", "/path", "main", "credentials", depth=10)
+
+            mocked_clone.assert_called_once_with(
+                "url",
+                "/path",
+                checkout_branch="main",
+                callbacks="credentials",
+                depth=10,
+            )
+
+        repo.deepen("origin", "main", 20, "credentials")
+
+        mocked_remote.fetch.assert_called_once_with(
+            refspecs=["+refs/heads/main:refs/remotes/origin/main"],
+            callbacks="credentials",
+            depth=20,
+        )
+
     def test_remote_head(self):
         upstream = "origin"
         branch = "master"
@@ -276,6 +650,47 @@ class TestRepository(RepositoryBaseTest):
             assert result == "succed"
             mocked_split_path.assert_called_once_with("path")
 
+    def test_get_git_object_id(self):
+        mocked_tree = MagicMock()
+        mocked_tree.id = "tree_id"
+        mocked_tree.__getitem__.return_value.id = "blob_id"
+
+        repo = Repository(MagicMock())
+
+        assert repo.get_git_object_id(mocked_tree, "/") == "tree_id"
+        assert repo.get_git_object_id(mocked_tree, "/a/file") == "blob_id"
+        mocked_tree.__getitem__.assert_called_once_with("a/file")
+
+    def test_get_git_object_id_for_missing_path(self):
+        mocked_tree = MagicMock()
+        mocked_tree.__getitem__.side_effect = KeyError("missing")
+
+        repo = Repository(MagicMock())
+
+        assert repo.get_git_object_id(mocked_tree, "/missing") is None
+
+    def test_changed_paths(self):
+        mocked_repo = MagicMock()
+        renamed = MagicMock()
+        renamed.old_file.path = "old_name"
+        renamed.new_file.path = "new_name"
+        modified = MagicMock()
+        modified.old_file.path = modified.new_file.path = "dir/file"
+        mocked_repo.diff.return_value.deltas = [renamed, modified]
+
+        repo = Repository(mocked_repo)
+
+        assert repo.changed_paths("old", "new") == {"old_name", "new_name", "dir/file"}
+        mocked_repo.diff.assert_called_once_with("old", "new")
+
+    def test_changed_paths_for_same_commit(self):
+        mocked_repo = MagicMock()
+
+        repo = Repository(mocked_repo)
+
+        assert repo.changed_paths("commit", "commit") == set()
+        assert mocked_repo.diff.call_count == 0
+
     def test_get_blob_size(self):
         mocked_repo = MagicMock()
         mocked_git_object = MagicMock()
@@ -298,53 +713,79 @@ class TestRepository(RepositoryBaseTest):
         assert repo.get_blob_data("tree", "path") == "some data"
         mocked_git_object.assert_has_calls([call("tree", "path")])
 
-    def test_find_diverge_commits_first_from_second(self):
+    def test_find_diverge_commits(self):
         mocked_repo = MagicMock()
+        mocked_repo.merge_base.return_value = "base"
+        mocked_repo.__getitem__.return_value = "common_parent"
 
-        def walker(obj, sort, *branches):
-            first_branch = [Commit(1), Commit(2), Commit(3), Commit(4)]
-            second_branch = [Commit(5), Commit(6), Commit(2), Commit(3)]
-
-            for index, commit in enumerate(first_branch):
-                yield (commit, second_branch[index])
+        walkers = {"first": [Commit(4), Commit(3)], "second": [Commit(5)]}
 
-        repo = Repository(mocked_repo)
-        repo.walk_branches = walker
+        def walk(target, sort):
+            walker = MagicMock()
+            walker.__iter__.return_value = iter(walkers[target])
+            walker.target = target
+            created_walkers.append(walker)
+            return walker
 
-        result = repo.find_diverge_commits("first_branch", "second_branch")
-        assert result.common_parent == Commit(2)
-
-    def test_find_diverge_commits_second_from_first(self):
-        mocked_repo = MagicMock()
-
-        def walker(obj, sort, *branches):
-            first_branch = [Commit(5), Commit(6), Commit(2), Commit(3)]
-            second_branch = [Commit(1), Commit(2), Commit(3), Commit(4)]
-
-            for index, commit in enumerate(first_branch):
-                yield (commit, second_branch[index])
+        created_walkers = []
+        mocked_repo.walk.side_effect = walk
 
         repo = Repository(mocked_repo)
-        repo.walk_branches = walker
+        result = repo.find_diverge_commits(
+            MagicMock(target="first"), MagicMock(target="second")
+        )
 
-        result = repo.find_diverge_commits("first_branch", "second_branch")
-        assert result.common_parent == Commit(2)
+        assert result.common_parent == "common_parent"
+        assert list(result.first_commits) == [Commit(4), Commit(3)]
+        assert list(result.second_commits) == [Commit(5)]
 
-    def test_find_diverge_commits_common_commit(self):
-        mocked_repo = MagicMock()
+        mocked_repo.merge_base.assert_called_once_with("first", "second")
+        mocked_repo.walk.assert_has_calls(
+            [call("first", GIT_SORT_TOPOLOGICAL), call("second", GIT_SORT_TOPOLOGICAL)]
+        )
+        created_walkers[0].hide.assert_called_once_with("second")
+        created_walkers[1].hide.assert_called_once_with("first")
+
+    def test_find_diverge_commits_in_a_real_repository(self, tmp_path):
+        git_repo = init_repository(str(tmp_path))
+        signature = Signature("name", "email")
+        tree = git_repo.TreeBuilder().write()
+
+        def commit(*parents):
+            message = f"commit {len(history)}"
+            return git_repo.create_commit(
+                None, signature, signature, message, tree, list(parents)
+            )
 
-        def walker(obj, sort, *branches):
-            first_branch = [Commit(5), Commit(6), Commit(2), Commit(3)]
-            second_branch = [Commit(1), Commit(0), Commit(2), Commit(3)]
+        #      2--3--4
+        #     /
+        # 0--1
+        #     \
+        #      5
+        history = []
+        history.append(commit())
+        history.append(commit(history[0]))
+        history.append(commit(history[1]))
+        history.append(commit(history[2]))
+        history.append(commit(history[3]))
+        history.append(commit(history[1]))
+
+        repo = Repository(git_repo)
+        result = repo.find_diverge_commits(
+            MagicMock(target=history[4]), MagicMock(target=history[5])
+        )
 
-            for index, commit in enumerate(first_branch):
-                yield commit, second_branch[index]
+        assert result.common_parent.id == history[1]
+        assert [commit.id for commit in result.first_commits] == history[4:1:-1]
+        assert [commit.id for commit in result.second_commits] == [history[5]]
 
-        repo = Repository(mocked_repo)
-        repo.walk_branches = walker
+        result = repo.find_diverge_commits(
+            MagicMock(target=history[4]), MagicMock(target=history[2])
+        )
 
-        result = repo.find_diverge_commits("first_branch", "second_branch")
-        assert result.common_parent == Commit(2)
+        assert result.common_parent.id == history[2]
+        assert [commit.id for commit in result.first_commits] == history[4:2:-1]
+        assert len(result.second_commits) == 0
 
     def test_proxy_methods(self):
         mocked_repo = MagicMock()
@@ -367,22 +808,27 @@ class TestRepository(RepositoryBaseTest):
 
     def test_diverge(self):
         mocked_repo = MagicMock()
-        mocked_find = MagicMock()
-        mocked_commits = MagicMock()
         mocked_branch_remote = MagicMock(target=1)
         mocked_branch_local = MagicMock(target=2)
 
-        mocked_commits.second_commits = []
-        mocked_commits.first_commits = []
-        mocked_find.return_value = mocked_commits
+        mocked_repo.ahead_behind.return_value = (0, 3)
 
         repo = Repository(mocked_repo)
         repo.branches.local.get.return_value = mocked_branch_local
         repo.branches.remote.get.return_value = mocked_branch_remote
-        repo.find_diverge_commits = mocked_find
+
+        assert repo.diverge("origin", "master") == (False, True)
+        mocked_repo.ahead_behind.assert_called_once_with(2, 1)
+
+    def test_diverge_on_same_commit(self):
+        mocked_repo = MagicMock()
+
+        repo = Repository(mocked_repo)
+        repo.branches.local.get.return_value = MagicMock(target=1)
+        repo.branches.remote.get.return_value = MagicMock(target=1)
 
         assert repo.diverge("origin", "master") == (False, False)
-        mocked_find.assert_called_once_with(mocked_branch_local, mocked_branch_remote)
+        assert mocked_repo.ahead_behind.call_count == 0
 
     def test_checkout(self):
         mocked_checkout = MagicMock(return_value="done")
@@ -500,6 +946,38 @@ class TestRepository(RepositoryBaseTest):
         mocked_size.assert_called_once_with("ref", "/ups")
         mocked_git_obj.assert_called_once_with("ref", "/ups")
 
+    def test_get_tree_entry_stats(self):
+        mocked_repo = MagicMock()
+        mocked_repo.odb.read_header.return_value = ("blob", 10)
+
+        repo = Repository(mocked_repo)
+
+        blob = MagicMock(filemode=GIT_FILEMODE_BLOB, id="blob_id")
+        assert repo.get_tree_entry_stats(blob) == {
+            "st_mode": S_IFREG | 0o444,
+            "st_size": 10,
+        }
+        mocked_repo.odb.read_header.assert_called_once_with("blob_id")
+
+        tree = MagicMock(filemode=GIT_FILEMODE_TREE)
+        assert repo.get_tree_entry_stats(tree) == {
+            "st_mode": S_IFDIR | 0o555,
+            "st_nlink": 2,
+        }
+
+        submodule = MagicMock(filemode=GIT_FILEMODE_COMMIT)
+        assert repo.get_tree_entry_stats(submodule) is None
+
+    def test_get_object_size_without_read_header(self):
+        mocked_repo = MagicMock()
+        mocked_repo.odb = object()
+        mocked_repo.__getitem__.return_value.size = 42
+
+        repo = Repository(mocked_repo)
+
+        assert repo.get_object_size("blob_id") == 42
+        mocked_repo.__getitem__.assert_called_once_with("blob_id")
+
     def test_full_path(self):
         mocked_repo = MagicMock()
         mocked_repo.workdir = "workdir"
@@ -0,0 +1,275 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import errno
+from itertools import count
+from unittest.mock import MagicMock, patch
+
+from gitfs.fuse import FUSE, FUSE_FILL_DIR_PLUS, FUSE_READDIR_PLUS, KernelCache
+
+
+class TestFUSE:
+    def get_fuse(self, operations):
+        fuse = object.__new__(FUSE)
+        fuse.operations = operations
+        fuse.encoding = "utf-8"
+        fuse.raw_fi = False
+        fuse.use_ns = False
+        fuse.dir_handles = {}
+        fuse.dir_handle_ids = count(1)
+        return fuse
+
+    def test_open_keeps_cache_for_immutable_views(self):
+        mocked_operations = MagicMock()
+        mocked_operations.open.return_value = 3
+        mocked_operations.keep_cache.return_value = True
+        mocked_fip = MagicMock()
+
+        fuse = self.get_fuse(mocked_operations)
+        assert fuse.open(b"/history/2014-09-20/file", mocked_fip) == 0
+
+        mocked_operations.keep_cache.assert_called_once_with("/history/2014-09-20/file")
+        assert mocked_fip.contents.fh == 3
+        assert mocked_fip.contents.keep_cache == 1
+
+    def test_open_drops_cache_for_mutable_views(self):
+        mocked_operations = MagicMock()
+        mocked_operations.keep_cache.return_value = False
+        mocked_operations.direct_io.return_value = False
+        mocked_fip = MagicMock()
+
+        fuse = self.get_fuse(mocked_operations)
+        fuse.open(b"/current/file", mocked_fip)
+
+        assert mocked_fip.contents.direct_io == 0
+
+        assert mocked_fip.contents.keep_cache == 0
+
+    def test_open_bypasses_page_cache_for_generated_content(self):
+        mocked_operations = MagicMock()
+        mocked_operations.keep_cache.return_value = False
+        mocked_operations.direct_io.return_value = True
+        mocked_fip = MagicMock()
+
+        fuse = self.get_fuse(mocked_operations)
+        fuse.open(b"/.gitfs-status", mocked_fip)
+
+        mocked_operations.direct_io.assert_called_once_with("/.gitfs-status")
+        assert mocked_fip.contents.direct_io == 1
+
+    def open_dir(self, fuse, path, fh=3):
+        fuse.operations.opendir.return_value = fh
+        mocked_fip = MagicMock()
+        fuse.opendir(path, mocked_fip)
+        return mocked_fip
+
+    def list_dir(self, fuse, fip, offset, size, flags=0):
+        """Reads entries the way libfuse does, with room for `size` of them."""
+
+        entries = []
+
+        def filler(buf, name, st, next_offset, fill_flags):
+            if len(entries) == size:
+                return 1
+            entries.append((name.decode(), next_offset))
+            return 0
+
+        fuse.readdir_fuse_3(b"/dir", "buf", filler, offset, fip, flags)
+        return entries
+
+    def test_opendir_and_releasedir_map_handles(self):
+        mocked_operations = MagicMock()
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/history", fh=3)
+
+        mocked_operations.opendir.assert_called_once_with("/history")
+        assert fuse.dir_handles[mocked_fip.contents.fh].fh == 3
+
+        fuse.releasedir(b"/history", mocked_fip)
+        mocked_operations.releasedir.assert_called_once_with("/history", 3)
+        assert fuse.dir_handles == {}
+
+    def test_readdir_plus_hands_over_attributes(self):
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.return_value = [
+            ".",
+            ("file", {"st_mode": 0o100444, "st_size": 10, "st_ino": 7}, 0),
+        ]
+        mocked_filler = MagicMock(return_value=0)
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/history", fh=3)
+        fuse.readdir_fuse_3(
+            b"/history", "buf", mocked_filler, 0, mocked_fip, FUSE_READDIR_PLUS
+        )
+
+        mocked_operations.readdir.assert_called_once_with("/history", 3)
+        dot, entry = mocked_filler.call_args_list
+        assert dot.args == ("buf", b".", None, 1, 0)
+
+        _, name, st, offset, flags = entry.args
+        assert (name, offset, flags) == (b"file", 2, FUSE_FILL_DIR_PLUS)
+        assert (st.st_mode, st.st_size, st.st_ino) == (0o100444, 10, 7)
+
+    def test_readdir_without_plus_hands_over_mode(self):
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.return_value = [("file", {"st_mode": 0o100444}, 0)]
+        mocked_filler = MagicMock(return_value=0)
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/current")
+        fuse.readdir_fuse_3(b"/current", "buf", mocked_filler, 0, mocked_fip, 0)
+
+        _, name, st, offset, flags = mocked_filler.call_args.args
+        assert (name, st.st_mode, offset, flags) == (b"file", 0o100444, 1, 0)
+
+    def test_readdir_streams_entries(self):
+        listed = []
+
+        def readdir(path, fh):
+            for index in range(10):
+                listed.append(index)
+                yield str(index)
+
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.side_effect = readdir
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/dir")
+
+        assert self.list_dir(fuse, mocked_fip, 0, 4) == [
+            ("0", 1),
+            ("1", 2),
+            ("2", 3),
+            ("3", 4),
+        ]
+        # only one entry past the buffer got generated
+        assert listed == [0, 1, 2, 3, 4]
+
+        assert self.list_dir(fuse, mocked_fip, 4, 4) == [
+            ("4", 5),
+            ("5", 6),
+            ("6", 7),
+            ("7", 8),
+        ]
+        assert self.list_dir(fuse, mocked_fip, 8, 4) == [("8", 9), ("9", 10)]
+        assert self.list_dir(fuse, mocked_fip, 10, 4) == []
+        assert mocked_operations.readdir.call_count == 1
+
+    def test_readdir_resumes_from_an_earlier_offset(self):
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.side_effect = lambda path, fh: iter("abcdefgh")
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/dir")
+
+        self.list_dir(fuse, mocked_fip, 0, 3)
+        self.list_dir(fuse, mocked_fip, 3, 3)
+
+        # the reader only took "d" out of the last batch
+        assert self.list_dir(fuse, mocked_fip, 4, 3) == [
+            ("e", 5),
+            ("f", 6),
+            ("g", 7),
+        ]
+        assert mocked_operations.readdir.call_count == 1
+
+    def test_readdir_restarts_on_seek(self):
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.side_effect = lambda path, fh: iter("abcdefgh")
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/dir")
+
+        self.list_dir(fuse, mocked_fip, 0, 3)
+        self.list_dir(fuse, mocked_fip, 3, 3)
+
+        assert self.list_dir(fuse, mocked_fip, 1, 2) == [("b", 2), ("c", 3)]
+        assert self.list_dir(fuse, mocked_fip, 0, 1) == [("a", 1)]
+        assert self.list_dir(fuse, mocked_fip, 6, 1) == [("g", 7)]
+        assert mocked_operations.readdir.call_count == 3
+
+    def test_readdir_on_fuse2(self):
+        mocked_operations = MagicMock()
+        mocked_operations.readdir.return_value = ["."]
+        mocked_filler = MagicMock(return_value=0)
+
+        fuse = self.get_fuse(mocked_operations)
+        mocked_fip = self.open_dir(fuse, b"/dir")
+
+        with patch("gitfs.fuse.mfusepy.fuse_version_major", 2):
+            fuse.readdir_fuse_2(b"/dir", "buf", mocked_filler, 0, mocked_fip)
+
+        mocked_filler.assert_called_once_with("buf", b".", None, 1)
+
+
+class TestKernelCache:
+    def test_mount_paths(self):
+        kernel_cache = KernelCache("current", "history")
+
+        assert kernel_cache.mount_paths(["a/b/file", "a/other", "top"]) == {
+            "/history",
+            "/current",
+            "/current/a",
+            "/current/a/b",
+            "/current/a/b/file",
+            "/current/a/other",
+            "/current/top",
+        }
+
+    def test_mount_paths_of_a_repository_in_a_multi_repository_mount(self):
+        kernel_cache = KernelCache("current", "history", "/one")
+
+        assert kernel_cache.mount_paths(["a/file"]) == {
+            "/one/history",
+            "/one/current",
+            "/one/current/a",
+            "/one/current/a/file",
+            "/one",
+        }
+
+    def test_invalidate_before_attach(self):
+        mocked_invalidate = MagicMock()
+
+        with patch("gitfs.fuse._invalidate_path", mocked_invalidate):
+            KernelCache().invalidate({"file"})
+
+        assert mocked_invalidate.call_count == 0
+
+    def test_invalidate(self):
+        mocked_invalidate = MagicMock(return_value=-errno.ENOENT)
+
+        kernel_cache = KernelCache()
+        kernel_cache.fuse = "fuse"
+
+        with patch("gitfs.fuse._invalidate_path", mocked_invalidate):
+            kernel_cache.invalidate({"dir/file"})
+
+        invalidated = [args[1] for args, _ in mocked_invalidate.call_args_list]
+        assert invalidated == [
+            b"/history",
+            b"/current/dir/file",
+            b"/current/dir",
+            b"/current",
+        ]
+
+    def test_attach_without_invalidation_support(self):
+        kernel_cache = KernelCache()
+
+        with patch("gitfs.fuse._invalidate_path", None):
+            kernel_cache.attach()
+
+        assert kernel_cache.fuse is None
@@ -0,0 +1,37 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from gitfs.metrics import Metrics
+
+
+class TestMetrics:
+    def test_increment(self):
+        metrics = Metrics()
+
+        metrics.increment("pushes")
+        metrics.increment("pushes")
+        metrics.increment("pushed_bytes", 250)
+
+        assert metrics.get("pushes") == 2
+        assert metrics.get("failed_pushes") == 0
+        assert metrics.snapshot() == {"pushes": 2, "pushed_bytes": 250}
+
+    def test_set(self):
+        metrics = Metrics()
+
+        metrics.set("unpushed_commits", 3)
+        metrics.set("unpushed_commits", 1)
+
+        assert metrics.get("unpushed_commits") == 1
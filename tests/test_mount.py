@@ -14,7 +14,17 @@
 
 from unittest.mock import MagicMock, call, patch
 
-from gitfs.mounter import get_credentials, parse_args, prepare_components, start_fuse
+import pytest
+
+from gitfs.mounter import (
+    get_blob_arena,
+    get_credentials,
+    parse_args,
+    prepare_components,
+    prepare_repositories,
+    read_repositories,
+    start_fuse,
+)
 
 
 class EmptyObject:
@@ -67,6 +77,27 @@ class TestMount:
                 "hard_ignore": None,
                 "min_idle_times": 1,
                 "idle_fetch_timeout": 10,
+                "attr_timeout": 1,
+                "entry_timeout": 1,
+                "merge_strategy": "accept_mine",
+                "maintenance_interval": 600,
+                "maintenance_loose_objects": 512,
+                "push_interval": 30,
+                "push_delay": 120,
+                "local_first": True,
+                "max_unpushed_commits": 100,
+                "async_runtime": False,
+                "max_heavy_operations": 4,
+                "persistent_clone": False,
+                "clone_depth": 50,
+                "lazy_workdir": False,
+                "bare": False,
+                "blob_cache_size": 64,
+                "object_store": "",
+                "blob_arena": "",
+                "blob_arena_size": 256,
+                "refs_path": "",
+                "at_path": "",
             }
         )
 
@@ -76,6 +107,10 @@ class TestMount:
         mocked_fetcher.return_value = mocked_fetch_worker
         mocked_router.repo = "repo"
         mocked_router.repo_path = "repo_path"
+        mocked_strategy = MagicMock(return_value="strategy")
+        mocked_maintenance = MagicMock()
+        mocked_local_first = MagicMock()
+        mocked_runtime = MagicMock()
 
         with patch.multiple(
             "gitfs.mounter",
@@ -84,8 +119,13 @@ class TestMount:
             prepare_routes=mocked_routes,
             SyncWorker=mocked_merger,
             FetchWorker=mocked_fetcher,
+            MaintenanceWorker=mocked_maintenance,
+            Runtime=mocked_runtime,
             FUSE=mocked_fuse,
+            KernelCache=MagicMock(return_value="kernel_cache"),
+            STRATEGIES={"accept_mine": mocked_strategy},
             get_credentials=MagicMock(return_value="cred"),
+            local_first=mocked_local_first,
         ):
 
             assert_result = (mocked_merge_worker, mocked_fetch_worker, mocked_router)
@@ -98,9 +138,28 @@ class TestMount:
                 timeout=10,
                 idle_timeout=10,
                 credentials="cred",
+                depth=50,
+                fast_forward=False,
+                kernel_cache="kernel_cache",
+            )
+            mocked_local_first.set.assert_called_once_with()
+            mocked_maintenance.assert_called_once_with(
+                repository="repo", interval=600, min_loose_objects=512
+            )
+            assert mocked_router.workers == [
+                mocked_merge_worker,
+                mocked_fetch_worker,
+                mocked_maintenance.return_value,
+            ]
+            assert not mocked_runtime.called
+
+            author = ("commit", "committer@commiting.org")
+            mocked_strategy.assert_called_once_with(
+                "repo", author=author, committer=author, repo_path="repo_path"
             )
 
             asserted_call = {
+                "strategy": "strategy",
                 "repository": "repo",
                 "upstream": "origin",
                 "branch": "branch",
@@ -109,6 +168,11 @@ class TestMount:
                 "commit_queue": mocked_queue,
                 "credentials": "cred",
                 "min_idle_times": 1,
+                "kernel_cache": "kernel_cache",
+                "push_interval": 30,
+                "push_delay": 120,
+                "local_first": True,
+                "max_unpushed_commits": 100,
             }
             mocked_merger.assert_called_once_with(
                 "commit",
@@ -145,7 +209,7 @@ class TestMount:
         mocked_argp = MagicMock()
         mocked_fuse = MagicMock()
         MagicMock()
-        mocked_args = MagicMock()
+        mocked_args = MagicMock(repos="")
 
         mocked_merge = MagicMock()
         mocked_fetch = MagicMock()
@@ -206,3 +270,166 @@ class TestMount:
 
             asserted_call = ("user", "key.pub", "key", "")
             mocked_keypair.assert_called_once_with(*asserted_call)
+
+    def test_prepare_components_with_async_runtime(self):
+        args = MagicMock(
+            merge_strategy="accept_mine", async_runtime=True, bare=False, blob_arena=""
+        )
+        mocked_router = MagicMock()
+        mocked_runtime = MagicMock()
+        mocked_merge_worker = MagicMock()
+        mocked_fetch_worker = MagicMock()
+        mocked_maintenance_worker = MagicMock()
+
+        with patch.multiple(
+            "gitfs.mounter",
+            CommitQueue=MagicMock(),
+            Router=MagicMock(return_value=mocked_router),
+            prepare_routes=MagicMock(),
+            KernelCache=MagicMock(),
+            get_credentials=MagicMock(),
+            STRATEGIES={"accept_mine": MagicMock()},
+            SyncWorker=MagicMock(return_value=mocked_merge_worker),
+            FetchWorker=MagicMock(return_value=mocked_fetch_worker),
+            MaintenanceWorker=MagicMock(return_value=mocked_maintenance_worker),
+            Runtime=mocked_runtime,
+        ):
+            prepare_components(args)
+
+            mocked_runtime.assert_called_once_with(
+                sync_worker=mocked_merge_worker,
+                fetch_worker=mocked_fetch_worker,
+                maintenance_worker=mocked_maintenance_worker,
+            )
+            assert mocked_router.workers == [mocked_runtime.return_value]
+            assert mocked_runtime.return_value.daemon is True
+
+    def test_prepare_components_for_a_bare_mount(self):
+        args = MagicMock(
+            merge_strategy="accept_mine", async_runtime=False, bare=True, blob_arena=""
+        )
+        mocked_router = MagicMock()
+        mocked_fetch_worker = MagicMock()
+        mocked_read_only = MagicMock()
+
+        with patch.multiple(
+            "gitfs.mounter",
+            CommitQueue=MagicMock(),
+            Router=MagicMock(return_value=mocked_router),
+            prepare_routes=MagicMock(),
+            KernelCache=MagicMock(),
+            get_credentials=MagicMock(),
+            STRATEGIES={"accept_mine": MagicMock()},
+            SyncWorker=MagicMock(),
+            FetchWorker=MagicMock(return_value=mocked_fetch_worker),
+            MaintenanceWorker=MagicMock(),
+            local_first=MagicMock(),
+            read_only=mocked_read_only,
+        ):
+            prepare_components(args)
+
+            assert mocked_router.workers == [mocked_fetch_worker]
+            mocked_read_only.set.assert_called_once_with()
+
+    def test_prepare_components_with_unknown_merge_strategy(self):
+        args = MagicMock(merge_strategy="theirs", blob_arena="")
+
+        with (
+            patch.multiple(
+                "gitfs.mounter",
+                CommitQueue=MagicMock(),
+                Router=MagicMock(),
+                prepare_routes=MagicMock(),
+                KernelCache=MagicMock(),
+                get_credentials=MagicMock(),
+            ),
+            patch("gitfs.mounter.sys") as mocked_sys,
+        ):
+            with pytest.raises(KeyError):
+                prepare_components(args)
+
+            assert mocked_sys.stderr.write.call_count == 1
+
+    def test_read_repositories(self, tmp_path):
+        repos = tmp_path / "repos"
+        repos.write_text(
+            "# name remote_url [branch]\n"
+            "one git@host:one.git\n"
+            "\n"
+            "two https://host/two.git stable\n"
+        )
+
+        assert read_repositories(str(repos), "main") == [
+            ("one", "git@host:one.git", "main"),
+            ("two", "https://host/two.git", "stable"),
+        ]
+
+        repos.write_text("a/b git@host:one.git\n")
+        with pytest.raises(ValueError):
+            read_repositories(str(repos), "main")
+
+    def test_prepare_repositories(self):
+        args = MagicMock(
+            repos="repos",
+            branch="main",
+            mount_point="/mnt",
+            repo_path="/var/lib/gitfs",
+            blob_cache_size=1,
+            max_fetches=8,
+            blob_arena="",
+        )
+        mocked_router = MagicMock()
+        mocked_multi_router = MagicMock()
+        mocked_blob_cache = MagicMock()
+        mocked_runtime = MagicMock()
+        mocked_fetch_worker = MagicMock()
+        mocked_read_only = MagicMock()
+
+        with patch.multiple(
+            "gitfs.mounter",
+            read_repositories=MagicMock(
+                return_value=[("one", "url1", "main"), ("two", "url2", "stable")]
+            ),
+            Router=mocked_router,
+            MultiRouter=mocked_multi_router,
+            BlobCache=MagicMock(return_value=mocked_blob_cache),
+            prepare_routes=MagicMock(return_value="routes"),
+            KernelCache=MagicMock(),
+            get_credentials=MagicMock(return_value="credentials"),
+            FetchWorker=MagicMock(return_value=mocked_fetch_worker),
+            Runtime=mocked_runtime,
+            read_only=mocked_read_only,
+        ):
+            router = prepare_repositories(args)
+
+        assert router == mocked_multi_router.return_value
+        first, second = mocked_router.call_args_list
+        assert first.kwargs["remote_url"] == "url1"
+        assert first.kwargs["repo_path"] == "/var/lib/gitfs/one"
+        assert first.kwargs["prefix"] == "/one"
+        assert first.kwargs["bare"] is True
+        assert second.kwargs["branch"] == "stable"
+        assert second.kwargs["mount_path"] == "/mnt/two"
+        assert first.kwargs["blob_cache"] is second.kwargs["blob_cache"]
+        mocked_router.return_value.register.assert_called_with("routes")
+
+        routers = mocked_multi_router.call_args.args[0]
+        assert list(routers) == ["one", "two"]
+
+        # one runtime fetches all the repositories
+        mocked_runtime.assert_called_once_with(
+            fetch_workers=[mocked_fetch_worker, mocked_fetch_worker], max_workers=8
+        )
+        assert router.workers == [mocked_runtime.return_value]
+        mocked_read_only.set.assert_called_once_with()
+
+    def test_get_blob_arena(self):
+        mocked_arena = MagicMock()
+
+        with patch("gitfs.mounter.BlobArena", mocked_arena):
+            assert get_blob_arena(MagicMock(blob_arena="")) is None
+
+            args = MagicMock(blob_arena="/dev/shm/gitfs-blobs", blob_arena_size=2)
+            assert get_blob_arena(args) == mocked_arena.return_value
+
+        mocked_arena.assert_called_once_with("/dev/shm/gitfs-blobs", 2 * 1024 * 1024)
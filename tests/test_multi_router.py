@@ -0,0 +1,124 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from errno import ENOENT, EROFS, EXDEV
+from unittest.mock import MagicMock, patch
+
+import pytest
+from mfusepy import FuseOSError
+
+from gitfs.multi_router import MultiRouter
+
+
+class TestMultiRouter:
+    def get_multi_router(self):
+        routers = {"one": MagicMock(), "two": MagicMock()}
+
+        with patch.multiple(
+            "gitfs.multi_router",
+            getpwnam=MagicMock(return_value=MagicMock(pw_uid=1)),
+            getgrnam=MagicMock(return_value=MagicMock(gr_gid=1)),
+        ):
+            return MultiRouter(routers, "/mnt"), routers
+
+    def test_route(self):
+        router, routers = self.get_multi_router()
+
+        assert router.route("/") == (None, "/")
+        assert router.route("/one") == (routers["one"], "/")
+        assert router.route("/two/current/a/b") == (routers["two"], "/current/a/b")
+
+        with pytest.raises(FuseOSError) as error:
+            router.route("/three/current")
+        assert error.value.errno == ENOENT
+
+    def test_call_routes_to_the_repository(self):
+        router, routers = self.get_multi_router()
+
+        result = router("read", "/one/current/file", 10, 0, 3)
+
+        assert result == routers["one"].return_value
+        routers["one"].assert_called_once_with("read", "/current/file", 10, 0, 3)
+        assert not routers["two"].called
+
+    def test_call_with_two_paths(self):
+        router, routers = self.get_multi_router()
+
+        router("rename", "/one/current/a", "/one/current/b")
+        routers["one"].assert_called_once_with("rename", "/current/a", "/current/b")
+
+        with pytest.raises(FuseOSError) as error:
+            router("rename", "/one/current/a", "/two/current/a")
+        assert error.value.errno == EXDEV
+
+    def test_root(self):
+        router, routers = self.get_multi_router()
+
+        assert router("readdir", "/", 0) == [".", "..", "one", "two"]
+        assert router("getattr", "/", None)["st_uid"] == 1
+
+        with pytest.raises(FuseOSError) as error:
+            router("mkdir", "/", 0o755)
+        assert error.value.errno == EROFS
+
+        assert router.keep_cache("/") is False
+        assert router.direct_io("/one/current/file") == routers["one"].direct_io(
+            "/current/file"
+        )
+
+    def test_init_and_destroy(self):
+        router, routers = self.get_multi_router()
+        worker = MagicMock()
+        router.workers = [worker]
+
+        mocked_shutting_down = MagicMock()
+        with patch.multiple(
+            "gitfs.multi_router", shutting_down=mocked_shutting_down, fetch=MagicMock()
+        ):
+            router("init", "/")
+            router.history_indexer.join(1)
+            router("destroy", "/")
+
+        # the history is indexed by one thread, one repository after another
+        routers["one"].history_indexer.run.assert_called_once_with()
+        routers["two"].history_indexer.run.assert_called_once_with()
+        assert not routers["one"].history_indexer.start.called
+
+        worker.start.assert_called_once_with()
+        worker.join.assert_called_once_with()
+        mocked_shutting_down.set.assert_called_once_with()
+        routers["one"].destroy.assert_called_once_with("/")
+        routers["two"].destroy.assert_called_once_with("/")
+
+    def test_init_with_config(self):
+        router, routers = self.get_multi_router()
+        router.init = MagicMock()
+        config = MagicMock()
+
+        router.init_with_config(None, config)
+
+        assert config.use_ino == 1
+        routers["one"].kernel_cache.attach.assert_called_once_with()
+        routers["two"].kernel_cache.attach.assert_called_once_with()
+        router.init.assert_called_once_with(None)
+
+    def test_fuse_operations(self):
+        router, routers = self.get_multi_router()
+
+        assert router.bmap is None
+        assert router.unknown is None
+
+        router.getattr("/one/current", None)
+        routers["one"].assert_called_once_with("getattr", "/current", None)
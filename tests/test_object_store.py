@@ -0,0 +1,81 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest.mock import MagicMock, patch
+
+from pygit2 import GIT_FILEMODE_BLOB, Signature, init_repository
+
+from gitfs.object_store import ObjectStore
+
+
+class TestObjectStore:
+    def test_for_remote(self):
+        store = ObjectStore.for_remote("/stores", "git@host:repo.git")
+        other = ObjectStore.for_remote("/stores", "git@host:other.git")
+
+        assert store.path.startswith("/stores/")
+        assert store.path.endswith(".git")
+        assert store.path != other.path
+        assert store.objects_path == f"{store.path}/objects"
+        assert ObjectStore.for_remote("/stores", "git@host:repo.git").path == store.path
+
+    def test_fetch(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        remote = init_repository(remote_url, bare=True)
+        builder = remote.TreeBuilder()
+        builder.insert("file", remote.create_blob(b"content"), GIT_FILEMODE_BLOB)
+        head = remote.create_commit(
+            "refs/heads/master", author, author, "first", builder.write(), []
+        )
+
+        store = ObjectStore.for_remote(str(tmp_path / "stores"), remote_url)
+        mocked_metrics = MagicMock()
+
+        with patch("gitfs.object_store.metrics", mocked_metrics):
+            assert store.fetch("master", None) == head
+            # the second time, the store is reused
+            assert store.fetch("master", None) == head
+
+        repo = store.open()
+        assert repo.is_bare
+        assert repo.remotes["origin"].url == remote_url
+        assert repo.references["refs/heads/master"].target == head
+        assert mocked_metrics.increment.call_count == 2
+
+    def test_fetch_all_refs(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        remote = init_repository(remote_url, bare=True)
+        builder = remote.TreeBuilder()
+        builder.insert("file", remote.create_blob(b"content"), GIT_FILEMODE_BLOB)
+        tree = builder.write()
+        head = remote.create_commit(
+            "refs/heads/master", author, author, "first", tree, []
+        )
+        other = remote.create_commit(
+            "refs/heads/feature/x", author, author, "other", tree, [head]
+        )
+        remote.create_reference("refs/tags/v1", head)
+
+        store = ObjectStore.for_remote(str(tmp_path / "stores"), remote_url)
+        with patch("gitfs.object_store.metrics"):
+            assert store.fetch("master", None, all_refs=True) == head
+
+        assert sorted(store.references()) == [
+            ("refs/heads/feature/x", other),
+            ("refs/heads/master", head),
+            ("refs/tags/v1", head),
+        ]
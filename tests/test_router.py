@@ -12,17 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from threading import Thread
 from unittest.mock import MagicMock, patch
 
 import pytest
 from mfusepy import FuseOSError
 
+from gitfs.cache.lru import LRUCache
 from gitfs.router import Router
 from gitfs.views import CurrentView
 
 
 class TestRouter:
-    def get_new_router(self):
+    def get_new_router(self, earlier_clone=True, **kwargs):
         mocked_credentials = MagicMock()
         mocked_branch = MagicMock()
         mocked_repo = MagicMock()
@@ -41,6 +43,8 @@ class TestRouter:
 
         mocked_time.time.return_value = 0
         mocked_repository.clone.return_value = mocked_repo
+        mocked_repository.reopen.return_value = mocked_repo if earlier_clone else None
+        mocked_repo.stage_all.return_value = ([], [])
         mocked_ignore.return_value = mocked_cache_ignore
         mocked_pwnam.return_value.pw_uid = 1
         mocked_grnam.return_value.gr_gid = 1
@@ -75,6 +79,7 @@ class TestRouter:
             "ignore_file": "",
             "module_file": "",
             "hard_ignore": None,
+            **kwargs,
         }
 
         with patch.multiple(
@@ -104,7 +109,9 @@ class TestRouter:
             mocks["branch"],
             mocks["credentials"],
         )
-        mocks["repository"].clone.assert_called_once_with(*asserted_call)
+        mocks["repository"].clone.assert_called_once_with(
+            *asserted_call, depth=0, lazy=False, bare=False, object_store=None
+        )
         mocks["ignore"].assert_called_once_with(
             **{
                 "ignore": "repository_path/.gitignore",
@@ -116,7 +123,9 @@ class TestRouter:
         mocks["getpwnam"].assert_called_once_with(mocks["user"])
         mocks["getgrnam"].assert_called_once_with(mocks["group"])
 
-        assert mocks["repo"].commits.update.call_count == 1
+        assert not mocks["repo"].commits.update.called
+        assert router.history_indexer.repository == mocks["repo"]
+        assert router.history_indexer.daemon is True
         assert mocks["time"].time.call_count == 1
         assert router.commit_queue == mocks["queue"]
         assert router.max_size == 10
@@ -128,9 +137,11 @@ class TestRouter:
 
         router, mocks = self.get_new_router()
         router.workers = [mocked_fetch, mocked_sync]
+        router.history_indexer = MagicMock()
 
         router.init("path")
 
+        assert router.history_indexer.start.call_count == 1
         assert mocked_fetch.start.call_count == 1
         assert mocked_sync.start.call_count == 1
 
@@ -155,6 +166,54 @@ class TestRouter:
         assert mocks["shutting"].set.call_count == 1
         mocks["shutil"].rmtree.assert_called_once_with(mocks["repo_path"])
 
+    def test_persistent_clone(self):
+        router, mocks = self.get_new_router(persistent_clone=True)
+
+        asserted_call = (
+            mocks["remote_url"],
+            mocks["repo_path"],
+            mocks["branch"],
+            mocks["credentials"],
+        )
+        mocks["repository"].reopen.assert_called_once_with(
+            *asserted_call, lazy=False, bare=False
+        )
+        assert not mocks["repository"].clone.called
+        assert router.repo == mocks["repo"]
+        mocks["repo"].stage_all.assert_called_once_with(ignore=mocks["repo"].ignore)
+
+        router.workers = []
+        with patch.multiple(
+            "gitfs.router",
+            shutil=mocks["shutil"],
+            fetch=mocks["fetch"],
+            shutting_down=mocks["shutting"],
+        ):
+            router.destroy("path")
+
+        assert not mocks["shutil"].rmtree.called
+
+    def test_persistent_clone_without_an_earlier_one(self):
+        router, mocks = self.get_new_router(earlier_clone=False, persistent_clone=True)
+
+        assert mocks["repository"].reopen.call_count == 1
+        assert router.repo == mocks["repo"]
+        assert mocks["repository"].clone.call_count == 1
+
+    def test_recover_changes(self):
+        router, mocks = self.get_new_router()
+        router.repo = MagicMock()
+        router.repo.stage_all.return_value = (["added"], ["removed"])
+
+        router.recover_changes()
+
+        router.repo.stage_all.assert_called_once_with(ignore=router.repo.ignore)
+        mocks["queue"].commit.assert_called_once_with(
+            add=["added"],
+            remove=["removed"],
+            message="Recover changes from the last mount",
+        )
+
     def test_call_with_invalid_operation(self):
         router, mocks = self.get_new_router()
 
@@ -181,6 +240,105 @@ class TestRouter:
             assert result == mocked_view.random_operation("/")
             assert mocked_idle_event.clear.call_count == 1
 
+    def get_routed_view(self, router, **kwargs):
+        mocked_view = MagicMock(**kwargs)
+        router.register([("/", MagicMock(return_value=mocked_view))])
+        router.locks = MagicMock()
+        router.admission = MagicMock()
+        return mocked_view
+
+    def test_call_reports_the_first_read(self):
+        router, mocks = self.get_new_router()
+        self.get_routed_view(router)
+        router.started = 10
+
+        mocked_cache = MagicMock(**{"get_if_exists.return_value": None})
+        mocked_metrics = MagicMock()
+        mocked_time = MagicMock(**{"monotonic.return_value": 12.5})
+
+        with patch.multiple(
+            "gitfs.router",
+            idle=MagicMock(),
+            lru_cache=mocked_cache,
+            metrics=mocked_metrics,
+            time=mocked_time,
+        ):
+            router("getattr", "/file")
+            router("read", "/file", 10, 0, 1)
+            router("read", "/file", 10, 0, 1)
+
+        assert router.first_read == 2.5
+        assert mocked_time.monotonic.call_count == 1
+        mocked_metrics.set.assert_called_once_with("time_to_first_read", 2.5)
+
+    def test_call_locks_paths(self):
+        router, mocks = self.get_new_router()
+        mocked_view = self.get_routed_view(router)
+
+        mocked_cache = MagicMock(**{"get_if_exists.return_value": None})
+
+        with patch.multiple("gitfs.router", idle=MagicMock(), lru_cache=mocked_cache):
+            router("getattr", "/file")
+            router.locks.hold.assert_called_once_with(["/file"], exclusive=False)
+
+            router.locks.reset_mock()
+            router("rename", "/file", "/other")
+            router.locks.hold.assert_called_once_with(
+                ["/file", "/other"], exclusive=True
+            )
+
+        mocked_view.rename.assert_called_once_with("file", "/other")
+        assert not router.admission.__enter__.called
+
+    def test_blob_reads_take_a_slot(self):
+        router, mocks = self.get_new_router(max_heavy_operations=2)
+
+        assert mocks["repo"].blobs.admission is router.admission
+        assert router.admission._value == 2
+
+    def test_get_view_from_many_threads(self):
+        router, mocks = self.get_new_router()
+        mocked_view = MagicMock(side_effect=lambda *args, **kwargs: object())
+        router.register([("/current", mocked_view)])
+        views = []
+
+        def get_view():
+            views.append(router.get_view("/current/file")[0])
+
+        with patch("gitfs.router.lru_cache", LRUCache(10)):
+            threads = [Thread(target=get_view) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert mocked_view.call_count == 1
+        assert len(set(map(id, views))) == 1
+
+    def test_get_view_of_a_repository_in_a_multi_repository_mount(self):
+        router, mocks = self.get_new_router(prefix="/one")
+        mocked_view = MagicMock()
+        router.register([("/current", mocked_view)])
+
+        with patch("gitfs.router.lru_cache") as mocked_cache:
+            mocked_cache.get_if_exists.return_value = None
+            router.get_view("/current/file")
+
+        # the views of each repository are cached apart
+        mocked_cache.get_if_exists.assert_called_once_with("/one/current")
+        mocked_cache.__setitem__.assert_called_once_with(
+            "/one/current", mocked_view.return_value
+        )
+
+    def test_shared_blob_cache(self):
+        mocked_blob_cache = MagicMock()
+        router, mocks = self.get_new_router(blob_cache=mocked_blob_cache)
+
+        mocked_blob_cache.for_repository.assert_called_once_with(
+            mocks["repo"], admission=router.admission
+        )
+        assert mocks["repo"].blobs == mocked_blob_cache.for_repository.return_value
+
     def test_call_with_init(self):
         mocked_init = MagicMock()
 
@@ -230,6 +388,10 @@ class TestRouter:
                 "queue": mocks["queue"],
                 "max_size": mocks["max_size"],
                 "max_offset": mocks["max_offset"],
+                "prefix": "",
+                "deepen_request": None,
+                "refs_path": None,
+                "at_path": None,
             }
             mocked_view.assert_called_once_with(**asserted_call)
             mocked_cache.get_if_exists.assert_called_once_with("/current")
@@ -247,6 +409,57 @@ class TestRouter:
             assert view == mocked_index
             assert path == "/"
 
+    def test_init_with_config(self):
+        mocked_init = MagicMock()
+        mocked_config = MagicMock()
+
+        router, mocks = self.get_new_router()
+        router.init = mocked_init
+        router.attr_timeout = 30
+        router.entry_timeout = 60
+
+        router.init_with_config(MagicMock(), mocked_config)
+
+        assert mocked_config.use_ino == 1
+        assert mocked_config.attr_timeout == 30
+        assert mocked_config.entry_timeout == 60
+        mocked_init.assert_called_once_with(None)
+
+    def test_init_with_config_on_fuse2(self):
+        mocked_init = MagicMock()
+
+        router, mocks = self.get_new_router()
+        router.init = mocked_init
+
+        router.init_with_config(MagicMock(), None)
+        mocked_init.assert_called_once_with(None)
+
+    def test_init_with_config_attaches_kernel_cache(self):
+        router, mocks = self.get_new_router()
+        router.init = MagicMock()
+        router.kernel_cache = MagicMock()
+
+        router.init_with_config(MagicMock(), MagicMock())
+        assert router.kernel_cache.attach.call_count == 1
+
+    def test_keep_cache(self):
+        mocked_view = MagicMock(keep_cache=True)
+
+        router, mocks = self.get_new_router()
+        router.get_view = MagicMock(return_value=(mocked_view, "/file"))
+
+        assert router.keep_cache("/history/2014-09-20/file") is True
+        router.get_view.assert_called_once_with("/history/2014-09-20/file")
+
+    def test_direct_io(self):
+        mocked_view = MagicMock(direct_io=True)
+
+        router, mocks = self.get_new_router()
+        router.get_view = MagicMock(return_value=(mocked_view, "/"))
+
+        assert router.direct_io("/.gitfs-status") is True
+        router.get_view.assert_called_once_with("/.gitfs-status")
+
     def test_getattr_special_method(self):
         router, mocks = self.get_new_router()
         assert router.bmap is None
@@ -0,0 +1,67 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+from unittest.mock import MagicMock
+
+from gitfs.routes import prepare_routes
+from gitfs.views import AtView, CurrentView, RefsView
+
+
+class TestRoutes:
+    def get_view(self, routes, path):
+        for regex, view in routes:
+            if re.search(regex, path):
+                return view
+
+    def test_refs_path_is_a_whole_name(self):
+        args = MagicMock(
+            history_path="history",
+            current_path="/",
+            refs_path="refs",
+            at_path="",
+            bare=False,
+        )
+        routes = prepare_routes(args)
+
+        assert self.get_view(routes, "/refs") is RefsView
+        assert self.get_view(routes, "/refs/tags/v1") is RefsView
+        assert self.get_view(routes, "/refsheet.txt") is CurrentView
+
+    def test_at_path_is_a_whole_name(self):
+        args = MagicMock(
+            history_path="history",
+            current_path="/",
+            refs_path="",
+            at_path="at",
+            bare=False,
+        )
+        routes = prepare_routes(args)
+
+        assert self.get_view(routes, "/at") is AtView
+        assert self.get_view(routes, "/at/2014-08-21T14:05/file") is AtView
+        assert self.get_view(routes, "/attachments/file.txt") is CurrentView
+        assert self.get_view(routes, "/atlas") is CurrentView
+
+    def test_at_path_is_opt_in(self):
+        args = MagicMock(
+            history_path="history",
+            current_path="/",
+            refs_path="",
+            at_path="",
+            bare=False,
+        )
+
+        assert self.get_view(prepare_routes(args), "/at/0") is CurrentView
@@ -46,6 +46,7 @@ class TestArgs:
         mocked_urlparse.side_effect = [mocked_parse_res1, mocked_parse_res2]
         mocked_args.o = "magic=True,not_magic=False"
         mocked_args.group = None
+        mocked_args.persistent_clone = None
         mocked_args.repo_path = None
         mocked_args.user = None
         mocked_args.branch = None
@@ -81,3 +82,39 @@ class TestArgs:
             mocked_log.setLevel.assert_called_once_with("DEBUG")
             mocked_urlparse.assert_has_calls([call(url), call("ssh://" + url)])
             mocked_grp.getgrgid.assert_has_calls([call(1)])
+
+    def test_lazy_workdir_merges_in_memory(self):
+        args = Args.__new__(Args)
+        config = MagicMock(
+            lazy_workdir=True,
+            merge_strategy="accept_mine",
+            log="syslog",
+            log_level="warning",
+            sentry_dsn="",
+        )
+
+        with patch.multiple(
+            "gitfs.utils.args",
+            SysLogHandler=MagicMock(),
+            log=MagicMock(),
+            lru_cache=MagicMock(),
+            os=MagicMock(),
+        ):
+            args.check_args(config)
+
+        assert config.merge_strategy == "accept_mine_in_memory"
+
+    def test_repo_path_for_persistent_clone(self):
+        args = Args.__new__(Args)
+        args.DEFAULTS = {"branch": ("main", "string")}
+        config = MagicMock(persistent_clone=True, remote_url="url", branch=None)
+
+        with patch("gitfs.utils.args.tempfile") as mocked_tempfile:
+            repo_path = args.get_repo_path(config)
+            assert not mocked_tempfile.mkdtemp.called
+
+        assert repo_path.startswith("/var/lib/gitfs/")
+        assert args.get_repo_path(config) == repo_path
+
+        config.branch = "other"
+        assert args.get_repo_path(config) != repo_path
@@ -0,0 +1,51 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest.mock import patch
+
+from gitfs.utils.backoff import Backoff
+
+
+class TestBackoff:
+    def test_increase_up_to_maximum(self):
+        backoff = Backoff(5, 30)
+
+        delays = []
+        for _ in range(4):
+            backoff.increase()
+            delays.append(backoff.current)
+
+        assert delays == [10, 20, 30, 30]
+
+    def test_reset(self):
+        backoff = Backoff(5, 30)
+        backoff.increase()
+        backoff.reset()
+
+        assert backoff.current == 5
+
+    def test_maximum_is_never_below_minimum(self):
+        backoff = Backoff(60, 30)
+        backoff.increase()
+
+        assert backoff.current == 60
+
+    def test_delay_is_jittered_downwards(self):
+        backoff = Backoff(10, 30, jitter=0.5)
+
+        with patch("gitfs.utils.backoff.random") as mocked_random:
+            mocked_random.uniform.return_value = 0.75
+            assert backoff.delay() == 7.5
+            mocked_random.uniform.assert_called_once_with(0.5, 1)
@@ -15,6 +15,8 @@
 
 from unittest.mock import MagicMock
 
+import pytest
+
 from gitfs.utils.commits import CommitsList
 
 
@@ -34,6 +36,24 @@ class TestCommitList:
         commit_list.append(mocked_commit)
         assert commit_list.index(mocked_commit) == 0
 
+    def test_index_of_missing_commit(self):
+        mocked_commit = MagicMock()
+        mocked_commit.id = "hexish"
+
+        with pytest.raises(ValueError):
+            CommitsList().index(mocked_commit)
+
+    def test_index_of_duplicated_commit(self):
+        first = MagicMock(id="first")
+        second = MagicMock(id="second")
+
+        commit_list = CommitsList()
+        for commit in [first, second, first]:
+            commit_list.append(commit)
+
+        assert commit_list.index(first) == 0
+        assert commit_list[1:].index(first) == 1
+
     def test_getitem(self):
         mocked_commit = MagicMock()
         mocked_commit.id = "hexish"
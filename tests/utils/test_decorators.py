@@ -13,13 +13,16 @@
 # limitations under the License.
 
 
-from threading import Event
+from errno import EROFS
+from threading import Event, Thread
 from unittest.mock import MagicMock, call, patch
 
 import pytest
+from mfusepy import FuseOSError
 
+from gitfs.events.state import SyncState
 from gitfs.utils.decorators.retry import retry
-from gitfs.utils.decorators.while_not import while_not
+from gitfs.utils.decorators.write_operation import write_operation
 
 
 class MockedWraps:
@@ -33,12 +36,6 @@ class MockedWraps:
         return decorated
 
 
-class EmptyMock:
-    def __init__(self, **kwargs):
-        for name, value in kwargs.items():
-            setattr(self, name, value)
-
-
 class TestRetryDecorator:
     def test_retry(self):
         mocked_time = MagicMock()
@@ -56,30 +53,84 @@ class TestRetryDecorator:
             mocked_method.assert_has_calls([call("arg", kwarg="kwarg")])
 
 
-class TestWhileNotDecorator:
-    def test_while_not_with_invalid_event_type(self):
-        mocked_method = MagicMock()
-        mocked_self = EmptyMock(obj="obj")
+class TestWriteOperationDecorator:
+    def get_events(self, remote_ok=True, local_first=False, read_only=False):
+        events = {}
+        for name, is_set in [
+            ("fetch_successful", remote_ok),
+            ("push_successful", remote_ok),
+            ("local_first", local_first),
+            ("read_only", read_only),
+        ]:
+            events[name] = Event()
+            if is_set:
+                events[name].set()
+        events["sync_state"] = SyncState()
+        return events
+
+    def test_write_operation(self):
+        with patch.multiple(
+            "gitfs.utils.decorators.write_operation", **self.get_events()
+        ):
+            assert write_operation(lambda: "written")() == "written"
 
-        with patch.multiple("gitfs.utils.decorators.while_not", wraps=MockedWraps):
-            with pytest.raises(TypeError):
-                not_now = while_not("obj")
-                not_now(mocked_method)(mocked_self, "arg", kwarg="kwarg")
+    def test_write_operation_counts_writers(self):
+        events = self.get_events()
+        state = events["sync_state"]
 
-    def test_while_not(self):
-        an_event = Event()
-        an_event.set()
+        def write():
+            assert state.writers == 1
+            raise OSError()
 
-        mocked_method = MagicMock()
-        mocked_time = MagicMock()
+        with patch.multiple("gitfs.utils.decorators.write_operation", **events):
+            with pytest.raises(OSError):
+                write_operation(write)()
+
+        assert state.writers == 0
+
+    def test_write_operation_waits_for_writers_to_be_let_through(self):
+        events = self.get_events()
+        state = events["sync_state"]
+        state.hold_writers()
+        written = Event()
+
+        def write():
+            written.set()
+
+        with patch.multiple("gitfs.utils.decorators.write_operation", **events):
+            writer = Thread(target=write_operation(write))
+            writer.start()
 
-        mocked_time.sleep.side_effect = lambda x: an_event.clear()
-        mocked_method.__name__ = "name"
+            assert not written.wait(0.05)
+            state.release_writers()
+            writer.join(1)
+
+        assert written.is_set()
+        assert state.writers == 0
+
+    def test_write_operation_with_remote_down(self):
+        with patch.multiple(
+            "gitfs.utils.decorators.write_operation",
+            **self.get_events(remote_ok=False),
+        ):
+            with pytest.raises(FuseOSError) as error:
+                write_operation(lambda: "written")()
+
+            assert error.value.errno == EROFS
+
+    def test_write_operation_with_remote_down_in_local_first_mode(self):
+        with patch.multiple(
+            "gitfs.utils.decorators.write_operation",
+            **self.get_events(remote_ok=False, local_first=True),
+        ):
+            assert write_operation(lambda: "written")() == "written"
 
+    def test_write_operation_while_read_only(self):
         with patch.multiple(
-            "gitfs.utils.decorators.while_not", wraps=MockedWraps, time=mocked_time
+            "gitfs.utils.decorators.write_operation",
+            **self.get_events(local_first=True, read_only=True),
         ):
-            not_now = while_not(an_event)
-            not_now(mocked_method)("arg", kwarg="kwarg")
+            with pytest.raises(FuseOSError) as error:
+                write_operation(lambda: "written")()
 
-            mocked_time.sleep.assert_called_once_with(0.2)
+            assert error.value.errno == EROFS
@@ -0,0 +1,55 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from pygit2 import Oid
+
+from gitfs.utils.inode import (
+    ROOT_INODE,
+    VIRTUAL_INODE_BASE,
+    oid_to_inode,
+    path_to_inode,
+    root_inode,
+)
+
+
+class TestInode:
+    def test_oid_to_inode_is_stable(self):
+        oid = Oid(hex="c1b0730e0133447badcfd47fd144e254807b06e1")
+
+        assert oid_to_inode(oid) == oid_to_inode(Oid(hex=str(oid)))
+        assert oid_to_inode(oid) >= VIRTUAL_INODE_BASE
+        assert oid_to_inode(oid) < 2 * VIRTUAL_INODE_BASE
+
+    def test_oid_to_inode_differs_between_objects(self):
+        first = Oid(hex="c1b0730e0133447badcfd47fd144e254807b06e1")
+        second = Oid(hex="e05df30eb18a7d1cdd2db69cf361def33a5efbce")
+
+        assert oid_to_inode(first) != oid_to_inode(second)
+
+    def test_path_to_inode(self):
+        assert path_to_inode("history::/") == path_to_inode("history::/")
+        assert path_to_inode("history::/") != path_to_inode("history:2014-09-20:/")
+        assert path_to_inode("history::/") >= VIRTUAL_INODE_BASE
+
+    def test_path_to_inode_with_prefix(self):
+        assert path_to_inode("history::/", "/first") != path_to_inode("history::/")
+        assert path_to_inode("history::/", "/first") != path_to_inode(
+            "history::/", "/second"
+        )
+
+    def test_root_inode(self):
+        assert root_inode() == ROOT_INODE
+        assert root_inode("/first") != root_inode("/second")
+        assert root_inode("/first") >= VIRTUAL_INODE_BASE
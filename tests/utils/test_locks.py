@@ -0,0 +1,116 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from threading import Event, Thread
+
+from gitfs.utils.locks import PathLocks, RWLock
+
+
+class TestRWLock:
+    def test_readers_share_the_lock(self):
+        lock = RWLock()
+        lock.acquire_read()
+
+        reader = Thread(target=lock.acquire_read)
+        reader.start()
+        reader.join(1)
+
+        assert not reader.is_alive()
+        assert lock.readers == 2
+
+    def test_writer_waits_for_readers(self):
+        lock = RWLock()
+        lock.acquire_read()
+        written = Event()
+
+        def write():
+            lock.acquire_write()
+            written.set()
+            lock.release_write()
+
+        writer = Thread(target=write)
+        writer.start()
+
+        assert not written.wait(0.05)
+        assert lock.waiting_writers == 1
+
+        lock.release_read()
+        writer.join(1)
+        assert written.is_set()
+
+    def test_waiting_writer_keeps_new_readers_out(self):
+        lock = RWLock()
+        lock.acquire_read()
+
+        writer = Thread(target=lock.acquire_write)
+        writer.start()
+        while not lock.waiting_writers:
+            writer.join(0.01)
+
+        reader = Thread(target=lock.acquire_read)
+        reader.start()
+        reader.join(0.05)
+        assert reader.is_alive()
+
+        lock.release_read()
+        writer.join(1)
+        assert lock.writer
+
+        lock.release_write()
+        reader.join(1)
+        assert not reader.is_alive()
+        assert lock.readers == 1
+
+
+class TestPathLocks:
+    def test_locks_are_dropped_once_released(self):
+        locks = PathLocks()
+
+        with locks.hold(["/b", "/a", "/a"], exclusive=True):
+            assert len(locks) == 2
+
+        assert len(locks) == 0
+
+    def test_different_paths_run_in_parallel(self):
+        locks = PathLocks()
+        entered = Event()
+
+        def write():
+            with locks.hold(["/other"], exclusive=True):
+                entered.set()
+
+        with locks.hold(["/file"], exclusive=True):
+            writer = Thread(target=write)
+            writer.start()
+            assert entered.wait(1)
+
+        writer.join(1)
+
+    def test_same_path_is_serialized(self):
+        locks = PathLocks()
+        entered = Event()
+
+        def write():
+            with locks.hold(["/file"], exclusive=True):
+                entered.set()
+
+        with locks.hold(["/file"]):
+            writer = Thread(target=write)
+            writer.start()
+            assert not entered.wait(0.05)
+
+        writer.join(1)
+        assert entered.is_set()
+        assert len(locks) == 0
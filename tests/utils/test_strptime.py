@@ -19,7 +19,7 @@ from unittest.mock import MagicMock
 import pytest
 
 from gitfs.utils import strptime
-from gitfs.utils.strptime import TimeParser
+from gitfs.utils.strptime import TimeParser, parse_timestamp, time_parser
 
 
 class TestDateTimeUtils:
@@ -62,3 +62,31 @@ class TestDateTimeUtils:
             parser.match("daytime")
 
         mocked_pattern.match.assert_called_once_with("daytime")
+
+    def test_time_parser_is_cached(self):
+        assert time_parser("%Y-%m-%d") is time_parser("%Y-%m-%d")
+        assert time_parser("%Y-%m-%d") is not time_parser("%d %b %y")
+
+    def test_time_parser_match_whole(self):
+        parser = TimeParser("%Y-%m-%d")
+
+        assert parser.match("2014-08-21T01:02") == (2014, 8, 21, 0, 0, 0, 0, 0, 0)
+        with pytest.raises(ValueError):
+            parser.match("2014-08-21T01:02", whole=True)
+
+    def test_parse_timestamp(self):
+        local = dt.datetime(2014, 8, 21, 14, 5, 30)
+
+        assert parse_timestamp("1408629930") == 1408629930
+        assert parse_timestamp("2014-08-21T14:05:30") == local.timestamp()
+        assert parse_timestamp("2014-08-21T14:05") == local.timestamp() - 30
+        assert parse_timestamp("2014-08-21") == dt.datetime(2014, 8, 21).timestamp()
+
+        # zone designators
+        assert parse_timestamp("2014-08-21T14:05:30Z") == 1408629930
+        assert parse_timestamp("2014-08-21T16:05:30+02:00") == 1408629930
+        assert parse_timestamp("2014-08-21T11:35-0230") == 1408629900
+
+        for timestamp in ["yesterday", "2014-08-21T14", "2014-13-01", "-1", "Z"]:
+            with pytest.raises(ValueError):
+                parse_timestamp(timestamp)
@@ -0,0 +1,122 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from datetime import datetime
+from errno import ENOENT
+from stat import S_IFDIR, S_IFREG
+from threading import Event
+from unittest.mock import patch
+
+import pytest
+from mfusepy import FuseOSError
+from pygit2 import GIT_FILEMODE_BLOB, GIT_FILEMODE_TREE, Signature, init_repository
+
+from gitfs.cache import BlobCache, TreeResolver
+from gitfs.repository import Repository
+from gitfs.views.at import AtView
+
+
+# the commit times, in local time
+FIRST = int(datetime(2014, 8, 21, 14, 0).timestamp())
+SECOND = int(datetime(2014, 8, 21, 15, 0).timestamp())
+
+
+class TestAtView:
+    def commit(self, repo, content, parents, commit_time):
+        author = Signature("author", "author@gitfs.com", commit_time)
+        builder = repo.TreeBuilder()
+        builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+        subtree = builder.write()
+        builder.insert("dir", subtree, GIT_FILEMODE_TREE)
+        return repo.create_commit(
+            "refs/heads/master", author, author, "update", builder.write(), parents
+        )
+
+    def get_repo(self, tmp_path):
+        remote = init_repository(str(tmp_path / "remote.git"), bare=True)
+        first = self.commit(remote, b"first", [], FIRST)
+        self.commit(remote, b"second", [first], SECOND)
+
+        repo = Repository.clone(
+            str(tmp_path / "remote.git"), str(tmp_path / "local"), "master", bare=True
+        )
+        repo.trees = TreeResolver(repo)
+        repo.blobs = BlobCache(repo, 1024)
+        repo.commits.update()
+        return repo
+
+    def get_view(self, repo, timestamp=None):
+        return AtView(repo=repo, uid=1, gid=1, mount_time=0, timestamp=timestamp)
+
+    def test_serves_the_tree_as_of_an_instant(self, tmp_path):
+        repo = self.get_repo(tmp_path)
+
+        view = self.get_view(repo, "2014-08-21T14:30")
+        assert view.getattr("/")["st_mode"] == S_IFDIR | 0o555
+        assert view.getattr("/")["st_mtime"] == FIRST
+        attrs = view.getattr("/dir/file")
+        assert attrs["st_mode"] == S_IFREG | 0o444
+        assert attrs["st_size"] == 5
+
+        entries = [
+            entry if isinstance(entry, str) else entry[0]
+            for entry in view.readdir("/", None)
+        ]
+        assert entries == [".", "..", "dir", "file"]
+
+        fh = view.open("/file", os.O_RDONLY)
+        assert view.read("/file", 10, 0, fh) == b"first"
+        view.release("/file", fh)
+
+        assert self.get_view(repo, str(SECOND)).read("/file", 10, 0, None) == (
+            b"second"
+        )
+        assert self.get_view(repo, "2014-08-22").read("/file", 10, 0, None) == (
+            b"second"
+        )
+
+    def test_instants_without_a_tree(self, tmp_path):
+        repo = self.get_repo(tmp_path)
+
+        for timestamp in ["2014-08-21T13:59", "yesterday", "2014-02-30"]:
+            view = self.get_view(repo, timestamp)
+            with pytest.raises(FuseOSError) as error:
+                view.getattr("/")
+            assert error.value.errno == ENOENT
+            with pytest.raises(FuseOSError):
+                list(view.readdir("/", None))
+
+    def test_shallow_clones_ask_for_older_history(self, tmp_path):
+        repo = self.get_repo(tmp_path)
+        repo.commits.shallow = True
+
+        view = self.get_view(repo, "2014-08-20")
+        view.deepen_request = Event()
+        with patch("gitfs.views.at.fetch") as mocked_fetch:
+            with pytest.raises(FuseOSError):
+                view.getattr("/")
+
+        assert view.deepen_request.is_set()
+        mocked_fetch.set.assert_called_once_with()
+
+    def test_at_itself(self, tmp_path):
+        view = self.get_view(self.get_repo(tmp_path))
+
+        assert view.getattr("/")["st_mode"] == S_IFDIR | 0o555
+        assert view.readdir("/", None) == [".", ".."]
+        assert view.access("/", os.R_OK) == 0
+        with pytest.raises(FuseOSError):
+            view.getattr("/file")
@@ -18,12 +18,19 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 from mfusepy import FuseOSError
-from pygit2 import GIT_FILEMODE_TREE
+from pygit2 import GIT_FILEMODE_TREE, Oid
 
+from gitfs.utils.inode import oid_to_inode
 from gitfs.views.commit import CommitView
 
 
+OID = Oid(hex="c1b0730e0133447badcfd47fd144e254807b06e1")
+
+
 class TestCommitView:
+    def test_keeps_kernel_cache(self):
+        assert CommitView.keep_cache is True
+
     def test_readdir_without_tree_name(self):
         mocked_repo = MagicMock()
         mocked_commit = MagicMock()
@@ -32,8 +39,11 @@ class TestCommitView:
         mocked_entry.name = "entry"
         mocked_commit.tree = [mocked_entry]
         mocked_repo.revparse_single.return_value = mocked_commit
+        mocked_repo.get_tree_entry_stats.return_value = None
 
-        view = CommitView(repo=mocked_repo, commit_sha1="sha1")
+        view = CommitView(
+            repo=mocked_repo, commit_sha1="sha1", uid=1, gid=1, mount_time=0
+        )
         with patch("gitfs.views.commit.os") as mocked_os:
             mocked_os.path.split.return_value = [None, None]
 
@@ -48,16 +58,41 @@ class TestCommitView:
         mocked_entry = MagicMock()
 
         mocked_entry.name = "entry"
+        mocked_entry.id = OID
         mocked_commit.tree = "tree"
+        mocked_commit.commit_time = 42
         mocked_repo.revparse_single.return_value = mocked_commit
         mocked_repo.get_git_object.return_value = [mocked_entry]
+        mocked_repo.get_tree_entry_stats.return_value = {
+            "st_mode": S_IFREG | 0o444,
+            "st_size": 10,
+        }
 
-        view = CommitView(repo=mocked_repo, commit_sha1="sha1")
+        view = CommitView(
+            repo=mocked_repo, commit_sha1="sha1", uid=1, gid=1, mount_time=0
+        )
         with patch("gitfs.views.commit.os") as mocked_os:
             mocked_os.path.split.return_value = [None, True]
 
             dirs = list(view.readdir("/path", 0))
-            assert dirs == [".", "..", "entry"]
+            assert dirs == [
+                ".",
+                "..",
+                (
+                    "entry",
+                    {
+                        "st_uid": 1,
+                        "st_gid": 1,
+                        "st_ctime": 42,
+                        "st_mtime": 42,
+                        "st_mode": S_IFREG | 0o444,
+                        "st_size": 10,
+                        "st_ino": oid_to_inode(OID),
+                    },
+                    0,
+                ),
+            ]
+            mocked_repo.get_tree_entry_stats.assert_called_once_with(mocked_entry)
 
             mocked_os.path.split.assert_called_once_with("/path")
             mocked_repo.get_git_object.assert_called_once_with("tree", "/path")
@@ -124,6 +159,7 @@ class TestCommitView:
         mocked_commit.commit_time = "now+1"
         mocked_repo.revparse_single.return_value = mocked_commit
         mocked_repo.get_git_object_default_stats.return_value = stats
+        mocked_repo.get_git_object_id.return_value = OID
 
         view = CommitView(
             repo=mocked_repo, commit_sha1="sha1", mount_time="now", uid=1, gid=1
@@ -136,6 +172,7 @@ class TestCommitView:
             "st_ctime": "now+1",
             "st_mode": S_IFDIR | 0o555,
             "st_nlink": 2,
+            "st_ino": oid_to_inode(OID),
         }
         assert result == asserted_result
 
@@ -169,6 +206,7 @@ class TestCommitView:
             "st_mode": S_IFREG | 0o444,
             "st_size": 10,
         }
+        mocked_repo.get_git_object_id.return_value = OID
 
         view = CommitView(
             repo=mocked_repo, commit_sha1="sha1", mount_time="now", uid=1, gid=1
@@ -183,8 +221,10 @@ class TestCommitView:
             "st_ctime": "now+1",
             "st_mode": S_IFREG | 0o444,
             "st_size": 10,
+            "st_ino": oid_to_inode(OID),
         }
         assert result == asserted_result
+        mocked_repo.get_git_object_id.assert_called_once_with("tree", "/path")
         args = ("tree", "/path")
         mocked_repo.get_git_object_default_stats.assert_called_once_with(*args)
 
@@ -212,13 +252,24 @@ class TestCommitView:
 
         mocked_commit.tree = "tree"
         mocked_repo.revparse_single.return_value = mocked_commit
-        mocked_repo.get_blob_data.return_value = [1, 1, 1]
+        mocked_repo.get_git_object_id.return_value = "oid"
+        mocked_repo.blobs = {"oid": [1, 1, 1]}
 
         view = CommitView(
             repo=mocked_repo, commit_sha1="sha1", mount_time="now", uid=1, gid=1
         )
         assert view.read("/path", 1, 1, 0) == [1]
-        mocked_repo.get_blob_data.assert_called_once_with("tree", "/path")
+        mocked_repo.get_git_object_id.assert_called_once_with("tree", "/path")
+
+    def test_read_missing_file(self):
+        mocked_repo = MagicMock()
+        mocked_repo.get_git_object_id.return_value = None
+
+        view = CommitView(
+            repo=mocked_repo, commit_sha1="sha1", mount_time="now", uid=1, gid=1
+        )
+        with pytest.raises(FuseOSError):
+            view.read("/path", 1, 1, 0)
 
     def test_validate_commit_path_with_no_entries(self):
         mocked_repo = MagicMock()
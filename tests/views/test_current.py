@@ -19,8 +19,10 @@ from unittest.mock import MagicMock, call, patch
 
 import pytest
 from mfusepy import FuseOSError
+from pygit2 import GIT_FILEMODE_BLOB, Signature, init_repository
 
 from gitfs.cache.gitignore import CachedIgnore
+from gitfs.repository import Repository
 from gitfs.views.current import CurrentView
 
 
@@ -109,7 +111,10 @@ class TestCurrentView:
         mocked_full.return_value = "full_path"
         mocked_repo._full_path = mocked_full
 
-        with patch.multiple("gitfs.views.current", os=mocked_os, STATS=["simple"]):
+        with (
+            patch.multiple("gitfs.views.current", os=mocked_os),
+            patch("gitfs.views.passthrough.STATS", ["simple"]),
+        ):
             current = CurrentView(
                 repo=mocked_repo,
                 uid=1,
@@ -350,9 +355,12 @@ class TestCurrentView:
         )
         current._stage = mocked_index
 
-        assert current.fsync("/path", "data", 1) == "done"
+        with patch("gitfs.views.current.flush") as mocked_flush:
+            assert current.fsync("/path", "data", 1) == "done"
+
         message = "Fsync /path"
         mocked_index.assert_called_once_with(add="/path", message=message)
+        mocked_flush.set.assert_called_once_with()
 
         current_view.PassthroughView.fsync = old_fsync
 
@@ -404,6 +412,7 @@ class TestCurrentView:
         )
         mocked_repo.index.add.assert_called_once_with(["to-stage"])
         mocked_repo.index.remove.assert_called_once_with(["to-stage"])
+        assert mocked_repo.forget_index_tree.call_count == 1
 
         mocked_files.assert_has_calls([call(["to-stage"]), call(["to-stage"])])
         mocked_sanitize.assert_has_calls([call(["remove"]), call(["add"]), call(["to-stage"])])
@@ -467,3 +476,57 @@ class TestCurrentView:
 
             mocked_os.close.assert_called_once_with(4)
             assert mocked_stage.call_count == 0
+
+    def test_lazy_workdir(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote_url = str(tmp_path / "remote.git")
+        local = tmp_path / "local"
+
+        remote = init_repository(remote_url, bare=True)
+        builder = remote.TreeBuilder()
+        builder.insert("file", remote.create_blob(b"content"), GIT_FILEMODE_BLOB)
+        remote.create_commit(
+            "refs/heads/master", author, author, "init", builder.write(), []
+        )
+
+        repo = Repository.clone(remote_url, str(local), "master", lazy=True)
+        mocked_queue = MagicMock()
+        current = CurrentView(
+            repo=repo,
+            repo_path=str(local),
+            uid=1,
+            gid=1,
+            queue=mocked_queue,
+            max_size=100,
+            ignore=CachedIgnore(),
+        )
+
+        entries = {
+            entry[0]: entry[1]
+            for entry in current.readdir("/", None)
+            if not isinstance(entry, str)
+        }
+        assert entries["file"]["st_size"] == 7
+        assert current.getattr("/file")["st_mode"] == 0o100644
+        assert not (local / "file").exists()
+
+        fh = current.open("/file", os.O_RDONLY)
+        assert current.read("/file", 3, 2, fh) == b"nte"
+        current.release("/file", fh)
+        assert current.blobs == {}
+        assert not (local / "file").exists()
+
+        with patch("gitfs.utils.decorators.write_operation.fetch_successful"):
+            with patch("gitfs.utils.decorators.write_operation.push_successful"):
+                fh = current.open("/file", os.O_WRONLY)
+                assert (local / "file").read_bytes() == b"content"
+                current.release("/file", fh)
+
+                current.unlink("/file")
+
+        assert not (local / "file").exists()
+        mocked_queue.commit.assert_called_once_with(
+            add=None, remove="file", message="Deleted /file"
+        )
+        with pytest.raises(FileNotFoundError):
+            current.getattr("/file")
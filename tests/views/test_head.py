@@ -0,0 +1,90 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from stat import S_IFDIR, S_IFREG
+
+import pytest
+from mfusepy import FuseOSError
+from pygit2 import GIT_FILEMODE_BLOB, GIT_FILEMODE_TREE, Signature, init_repository
+
+from gitfs.cache import BlobCache, TreeResolver
+from gitfs.repository import Repository
+from gitfs.views.head import HeadView
+
+
+class TestHeadView:
+    def commit(self, repo, content, parents):
+        author = Signature("author", "author@gitfs.com")
+        builder = repo.TreeBuilder()
+        builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+        subtree = builder.write()
+        builder.insert("dir", subtree, GIT_FILEMODE_TREE)
+        return repo.create_commit(
+            "refs/heads/master", author, author, "update", builder.write(), parents
+        )
+
+    def get_view(self, tmp_path):
+        remote = init_repository(str(tmp_path / "remote.git"), bare=True)
+        first = self.commit(remote, b"first", [])
+
+        repo = Repository.clone(
+            str(tmp_path / "remote.git"), str(tmp_path / "local"), "master", bare=True
+        )
+        repo.trees = TreeResolver(repo)
+        repo.blobs = BlobCache(repo, 1024)
+
+        view = HeadView(repo=repo, uid=1, gid=1, mount_time=0)
+        return view, remote, first
+
+    def test_serves_the_head(self, tmp_path):
+        view, _, _ = self.get_view(tmp_path)
+
+        assert view.getattr("/")["st_mode"] == S_IFDIR | 0o555
+        attrs = view.getattr("/dir/file")
+        assert attrs["st_mode"] == S_IFREG | 0o444
+        assert attrs["st_size"] == 5
+
+        entries = [
+            entry if isinstance(entry, str) else entry[0]
+            for entry in view.readdir("/", None)
+        ]
+        assert entries == [".", "..", "dir", "file"]
+
+        fh = view.open("/dir/file", os.O_RDONLY)
+        assert view.read("/dir/file", 3, 1, fh) == b"irs"
+        view.release("/dir/file", fh)
+        assert view.handles == {}
+
+        with pytest.raises(FuseOSError):
+            view.getattr("/missing")
+        with pytest.raises(FuseOSError):
+            view.open("/file", os.O_WRONLY)
+
+    def test_switch_to_a_new_head(self, tmp_path):
+        view, remote, first = self.get_view(tmp_path)
+        repo = view.repo
+
+        fh = view.open("/file", os.O_RDONLY)
+        self.commit(remote, b"second", [first])
+        repo.fetch("origin", "master", None)
+
+        assert repo.fast_forward("origin", "master") == {"dir/file", "file"}
+        assert repo.fast_forward("origin", "master") == set()
+
+        # open files keep reading what they were opened on
+        assert view.read("/file", 10, 0, fh) == b"first"
+        assert view.read("/file", 10, 0, None) == b"second"
+        assert view.getattr("/file")["st_size"] == 6
@@ -13,12 +13,14 @@
 # limitations under the License.
 
 
+from datetime import date
 from stat import S_IFDIR
 from unittest.mock import MagicMock, patch
 
 import pytest
 from mfusepy import FuseOSError
 
+from gitfs.utils.inode import path_to_inode
 from gitfs.views.history import HistoryView
 
 
@@ -43,9 +45,31 @@ class TestHistory:
             "st_mtime": "tomorrow",
             "st_nlink": 2,
             "st_mode": S_IFDIR | 0o555,
+            "st_ino": path_to_inode("history::/"),
         }
         assert asserted_result == result
 
+    def test_getattr_of_the_same_date_in_two_repositories(self):
+        mocked_repo = MagicMock()
+        mocked_repo.get_commit_dates.return_value = ["2014-09-20"]
+        mocked_repo.commits.shallow = False
+        commits = {"2014-09-20": [MagicMock(timestamp=1), MagicMock(timestamp=2)]}
+        mocked_repo.commits.__getitem__.side_effect = commits.__getitem__
+
+        inodes = set()
+        for prefix in ["/first", "/second"]:
+            history = HistoryView(
+                repo=mocked_repo, uid=1, gid=1, mount_time=0, prefix=prefix
+            )
+            history._get_first_commit_time = MagicMock(return_value=1)
+            history._get_last_commit_time = MagicMock(return_value=2)
+
+            inodes.add(history.getattr("/", 1)["st_ino"])
+            inodes.add(history._get_date_attrs("2014-09-20")["st_ino"])
+
+        # history/ and history/2014-09-20 of both repositories
+        assert len(inodes) == 4
+
     def test_getattr_with_incorrect_path(self):
         mocked_repo = MagicMock()
 
@@ -91,10 +115,28 @@ class TestHistory:
     def test_readdir_without_date(self):
         mocked_repo = MagicMock()
         mocked_repo.get_commit_dates.return_value = ["tomorrow"]
-
-        history = HistoryView(repo=mocked_repo)
-
-        asserted_dirs = [".", "..", "tomorrow"]
+        commits = {"tomorrow": [MagicMock(timestamp=1), MagicMock(timestamp=2)]}
+        mocked_repo.commits.__getitem__.side_effect = commits.__getitem__
+
+        history = HistoryView(repo=mocked_repo, uid=1, gid=1, mount_time=0)
+
+        asserted_dirs = [
+            ".",
+            "..",
+            (
+                "tomorrow",
+                {
+                    "st_uid": 1,
+                    "st_gid": 1,
+                    "st_mode": S_IFDIR | 0o555,
+                    "st_nlink": 2,
+                    "st_ctime": 1,
+                    "st_mtime": 2,
+                    "st_ino": path_to_inode("history:tomorrow:/"),
+                },
+                0,
+            ),
+        ]
         dirs = list(history.readdir("path", 0))
         assert dirs == asserted_dirs
         assert mocked_repo.get_commit_dates.call_count == 1
@@ -111,6 +153,69 @@ class TestHistory:
         assert dirs == asserted_dirs
         mocked_repo.get_commits_by_date.assert_called_once_with("now")
 
+    def test_browsing_past_a_shallow_history(self):
+        mocked_repo = MagicMock()
+        mocked_repo.commits.shallow = True
+        mocked_repo.commits.oldest = date(2014, 9, 19)
+        mocked_deepen = MagicMock()
+        mocked_deepen.is_set.return_value = False
+        mocked_fetch = MagicMock()
+
+        with patch.multiple(
+            "gitfs.views.history", deepen=mocked_deepen, fetch=mocked_fetch
+        ):
+            history = HistoryView(repo=mocked_repo, uid=1, gid=1, mount_time="now")
+
+            history._deepen_history("2014-09-20")
+            assert not mocked_deepen.set.called
+
+            history._deepen_history("2014-9-19")
+            mocked_deepen.set.assert_called_once_with()
+            mocked_fetch.set.assert_called_once_with()
+
+            mocked_repo.commits.shallow = False
+            history._deepen_history("2014-01-01")
+            assert mocked_deepen.set.call_count == 1
+
+    def test_browsing_past_the_shallow_history_of_one_repository(self):
+        mocked_repo = MagicMock()
+        mocked_repo.commits.shallow = True
+        mocked_repo.commits.oldest = date(2014, 9, 19)
+        mocked_deepen = MagicMock()
+        deepen_request = MagicMock()
+        deepen_request.is_set.return_value = False
+
+        with patch.multiple(
+            "gitfs.views.history", deepen=mocked_deepen, fetch=MagicMock()
+        ):
+            history = HistoryView(
+                repo=mocked_repo,
+                uid=1,
+                gid=1,
+                mount_time="now",
+                deepen_request=deepen_request,
+            )
+            history._deepen_history("2014-09-01")
+
+        deepen_request.set.assert_called_once_with()
+        assert not mocked_deepen.set.called
+
+    def test_wait_for_the_history_index(self):
+        mocked_repo = MagicMock()
+        mocked_repo.commits.ready.is_set.return_value = False
+        mocked_repo.get_commit_dates.side_effect = [[], ["2014-09-20"]]
+
+        history = HistoryView(repo=mocked_repo, uid=1, gid=1, mount_time="now")
+        history.history_wait = 0.5
+
+        assert history._get_commit_dates() == ["2014-09-20"]
+        mocked_repo.commits.ready.wait.assert_called_once_with(0.5)
+
+        mocked_repo.commits.ready.is_set.return_value = True
+        mocked_repo.get_commit_dates.side_effect = None
+        history._wait_for_history()
+        assert mocked_repo.commits.ready.wait.call_count == 1
+
     def test_get_commit_time_without_date(self):
         mocked_repo = MagicMock()
 
@@ -35,6 +35,7 @@ class TestIndexView:
         asserted_result = {
             "st_mode": S_IFDIR | 0o555,
             "st_nlink": 2,
+            "st_ino": 1,
             "st_uid": 1,
             "st_gid": 1,
             "st_ctime": "now",
@@ -42,6 +43,29 @@ class TestIndexView:
         }
         assert result == asserted_result
 
+    def test_getattr_of_the_roots_of_two_repositories(self):
+        attrs = {"uid": 1, "gid": 1, "mount_time": "now"}
+        first = IndexView(prefix="/first", **attrs).getattr("/", 1)
+        second = IndexView(prefix="/second", **attrs).getattr("/", 1)
+
+        # the repositories are served under the mount's root, which is inode 1
+        assert first["st_ino"] != second["st_ino"]
+        assert 1 not in (first["st_ino"], second["st_ino"])
+
     def test_readdir(self):
         view = IndexView()
-        assert view.readdir("path", 1) == [".", "..", "current", "history"]
+        assert view.readdir("path", 1) == [
+            ".",
+            "..",
+            "current",
+            "history",
+            ".gitfs-status",
+        ]
+
+    def test_readdir_with_refs(self):
+        view = IndexView(refs_path="refs")
+        assert view.readdir("path", 1)[-1] == "refs"
+
+    def test_readdir_with_at(self):
+        view = IndexView(refs_path="refs", at_path="at")
+        assert view.readdir("path", 1)[-2:] == ["refs", "at"]
@@ -89,6 +89,7 @@ class TestPassthrough:
             "st_atime",
             "st_ctime",
             "st_gid",
+            "st_ino",
             "st_mode",
             "st_mtime",
             "st_nlink",
@@ -138,20 +139,49 @@ class TestPassthrough:
             assert result == {key: getattr(mock_result, key) for key in stats}
 
     def test_readdir(self):
+        entries = []
+        for name in ["one_dir", "one_file", ".git"]:
+            entry = MagicMock()
+            entry.name = name
+            entry.stat.return_value = MagicMock(st_size=len(name))
+            entries.append(entry)
+
+        vanished = MagicMock()
+        vanished.name = "vanished"
+        vanished.stat.side_effect = FileNotFoundError
+        entries.append(vanished)
+
         mocked_os = MagicMock()
         mocked_os.path.join = os.path.join
         mocked_os.path.is_dir.return_value = True
-        mocked_os.listdir.return_value = ["one_dir", "one_file", ".git"]
+        mocked_os.scandir.return_value.__enter__.return_value = entries
 
-        with patch.multiple("gitfs.views.passthrough", os=mocked_os):
+        with patch.multiple("gitfs.views.passthrough", os=mocked_os, STATS=["st_size"]):
             view = PassthroughView(repo=self.repo, repo_path=self.repo_path)
             result = view.readdir("/magic/path", 0)
             dirents = list(result)
 
-            assert dirents == [".", "..", "one_dir", "one_file"]
+            assert dirents == [
+                ".",
+                "..",
+                ("one_dir", {"st_size": 7}, 0),
+                ("one_file", {"st_size": 8}, 0),
+            ]
             path = "/the/root/path/magic/path"
             mocked_os.path.isdir.assert_called_once_with(path)
-            mocked_os.listdir.assert_called_once_with(path)
+            mocked_os.scandir.assert_called_once_with(path)
+            entries[0].stat.assert_called_once_with(follow_symlinks=False)
+
+    def test_readdir_in_current_path_root(self):
+        mocked_os = MagicMock()
+        mocked_os.path.isdir.return_value = False
+
+        with patch.multiple("gitfs.views.passthrough", os=mocked_os):
+            view = PassthroughView(
+                repo=self.repo, repo_path=self.repo_path, current_path="/"
+            )
+
+            assert list(view.readdir("/", 0)) == [".", "..", "history"]
 
     def test_readlink_with_slash(self):
         mocked_os = MagicMock()
@@ -0,0 +1,125 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from errno import ENOENT
+from stat import S_IFDIR, S_IFREG
+
+import pytest
+from mfusepy import FuseOSError
+from pygit2 import (
+    GIT_FILEMODE_BLOB,
+    GIT_FILEMODE_TREE,
+    GIT_OBJECT_COMMIT,
+    Signature,
+    init_repository,
+)
+
+from gitfs.cache import BlobCache, TreeResolver
+from gitfs.repository import Repository
+from gitfs.views.refs import RefsView
+
+
+class TestRefsView:
+    def commit(self, repo, ref, content, parents):
+        author = Signature("author", "author@gitfs.com")
+        builder = repo.TreeBuilder()
+        builder.insert("file", repo.create_blob(content), GIT_FILEMODE_BLOB)
+        subtree = builder.write()
+        builder.insert("dir", subtree, GIT_FILEMODE_TREE)
+        return repo.create_commit(
+            ref, author, author, "update", builder.write(), parents
+        )
+
+    def get_view(self, tmp_path):
+        author = Signature("author", "author@gitfs.com")
+        remote = init_repository(str(tmp_path / "remote.git"), bare=True)
+        first = self.commit(remote, "refs/heads/master", b"master", [])
+        self.commit(remote, "refs/heads/feature/x", b"feature", [first])
+        remote.create_tag("v1", first, GIT_OBJECT_COMMIT, author, "v1")
+
+        repo = Repository.clone(
+            str(tmp_path / "remote.git"), str(tmp_path / "local"), "master", bare=True
+        )
+        repo.all_refs = True
+        repo.fetch("origin", "master", None)
+        repo.trees = TreeResolver(repo)
+        repo.blobs = BlobCache(repo, 1024)
+
+        view = RefsView(repo=repo, uid=1, gid=1, mount_time=0)
+        return view, remote, first
+
+    def names(self, entries):
+        return [entry if isinstance(entry, str) else entry[0] for entry in entries]
+
+    def test_lists_the_refs(self, tmp_path):
+        view, _, _ = self.get_view(tmp_path)
+
+        assert view.readdir("/", None) == [".", "..", "branches", "tags"]
+        assert view.readdir("/branches", None) == [".", "..", "feature", "master"]
+        assert view.readdir("/branches/feature", None) == [".", "..", "x"]
+        assert view.readdir("/tags", None) == [".", "..", "v1"]
+
+        attrs = view.getattr("/branches/feature")
+        assert attrs["st_mode"] == S_IFDIR | 0o555
+        assert attrs["st_ino"] != view.getattr("/tags")["st_ino"]
+
+        with pytest.raises(FuseOSError) as error:
+            view.readdir("/remotes", None)
+        assert error.value.errno == ENOENT
+        with pytest.raises(FuseOSError):
+            view.getattr("/branches/missing")
+
+    def test_serves_the_trees_of_the_refs(self, tmp_path):
+        view, _, _ = self.get_view(tmp_path)
+
+        assert view.getattr("/branches/feature/x")["st_mode"] == S_IFDIR | 0o555
+        assert self.names(view.readdir("/branches/feature/x", None)) == [
+            ".",
+            "..",
+            "dir",
+            "file",
+        ]
+        assert self.names(view.readdir("/tags/v1/dir", None)) == [".", "..", "file"]
+
+        attrs = view.getattr("/branches/feature/x/dir/file")
+        assert attrs["st_mode"] == S_IFREG | 0o444
+        assert attrs["st_size"] == 7
+
+        fh = view.open("/tags/v1/file", os.O_RDONLY)
+        assert view.read("/tags/v1/file", 10, 0, fh) == b"master"
+        view.release("/tags/v1/file", fh)
+
+        with pytest.raises(FuseOSError):
+            view.getattr("/branches/master/missing")
+        with pytest.raises(FuseOSError):
+            view.open("/branches/master/file", os.O_WRONLY)
+
+    def test_follows_the_fetches(self, tmp_path):
+        view, remote, first = self.get_view(tmp_path)
+
+        self.commit(remote, "refs/heads/master", b"second", [first])
+        self.commit(remote, "refs/heads/new", b"new", [])
+        view.repo.fetch("origin", "master", None)
+
+        assert view.readdir("/branches", None) == [
+            ".",
+            "..",
+            "feature",
+            "master",
+            "new",
+        ]
+        assert view.read("/branches/master/file", 10, 0, None) == b"second"
+        assert view.read("/branches/new/file", 10, 0, None) == b"new"
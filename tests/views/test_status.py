@@ -0,0 +1,105 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from stat import S_IFREG
+from threading import Event
+from unittest.mock import patch
+
+import pytest
+from mfusepy import FuseOSError
+
+from gitfs.events.state import MERGING, SyncState
+from gitfs.metrics import Metrics
+from gitfs.views.status import StatusView
+
+
+class TestStatusView:
+    def get_events(self, remote_ok=True, local_first=False, read_only=False):
+        events = {}
+        for name, is_set in [
+            ("fetch_successful", remote_ok),
+            ("push_successful", remote_ok),
+            ("local_first", local_first),
+            ("read_only", read_only),
+        ]:
+            events[name] = Event()
+            if is_set:
+                events[name].set()
+        events["sync_state"] = SyncState()
+        return events
+
+    def test_status(self):
+        metrics = Metrics()
+        metrics.increment("pushes", 2)
+        metrics.set("unpushed_commits", 0)
+
+        with patch.multiple("gitfs.views.status", metrics=metrics, **self.get_events()):
+            assert StatusView().status() == (
+                b"remote: ok\n"
+                b"writes: accepted\n"
+                b"local_first: no\n"
+                b"sync: idle\n"
+                b"pushes: 2\n"
+                b"unpushed_commits: 0\n"
+            )
+
+    def test_status_with_degraded_remote(self):
+        events = self.get_events(remote_ok=False)
+
+        with patch.multiple("gitfs.views.status", metrics=Metrics(), **events):
+            assert StatusView().status().splitlines() == [
+                b"remote: degraded",
+                b"writes: rejected",
+                b"local_first: no",
+                b"sync: idle",
+            ]
+
+            events["sync_state"].transition(MERGING)
+            assert StatusView().status().splitlines()[3] == b"sync: merging"
+
+    def test_status_with_degraded_remote_in_local_first_mode(self):
+        events = self.get_events(remote_ok=False, local_first=True)
+
+        with patch.multiple("gitfs.views.status", metrics=Metrics(), **events):
+            assert StatusView().status().splitlines()[:2] == [
+                b"remote: degraded",
+                b"writes: accepted",
+            ]
+
+            events["read_only"].set()
+            assert StatusView().status().splitlines()[1] == b"writes: rejected"
+
+    def test_getattr(self):
+        view = StatusView(uid=1, gid=1, mount_time="now")
+        view.status = lambda: b"remote: ok\n"
+
+        attrs = view.getattr("/")
+
+        assert attrs["st_mode"] == S_IFREG | 0o444
+        assert attrs["st_size"] == 11
+        assert attrs["st_uid"] == 1
+
+        with pytest.raises(FuseOSError):
+            view.getattr("/other")
+
+    def test_read(self):
+        view = StatusView()
+        view.status = lambda: b"remote: ok\n"
+
+        assert view.read("/", 6, 0, 0) == b"remote"
+        assert view.read("/", 100, 8, 0) == b"ok\n"
+
+    def test_direct_io(self):
+        assert StatusView.direct_io is True
@@ -76,13 +76,182 @@ class TestFetchWorker:
             fetch=mocked_fetch_event,
             idle=mocked_idle,
         ):
-            worker = FetchWorker()
+            worker = FetchWorker(timeout=5, idle_timeout=20)
+            worker.backoff.delay = MagicMock(return_value=12)
             worker.fetch = mocked_fetch
-            worker.timeout = 5
-            worker.idle_timeout = 20
 
             with pytest.raises(ValueError):
                 worker.work()
 
             assert mocked_fetch.call_count == 1
-            mocked_fetch_event.wait.assert_called_once_with(20)
+            mocked_fetch_event.wait.assert_called_once_with(12)
+
+    def test_wake_up_resets_backoff(self):
+        mocked_fetch = MagicMock(side_effect=ValueError)
+        mocked_fetch_event = MagicMock()
+        mocked_fetch_event.wait.return_value = True
+
+        with patch.multiple("gitfs.worker.fetch", fetch=mocked_fetch_event):
+            worker = FetchWorker(timeout=5, idle_timeout=20)
+            worker.backoff.current = 20
+            worker.fetch = mocked_fetch
+
+            with pytest.raises(ValueError):
+                worker.work()
+
+            assert worker.backoff.current == 5
+
+    def test_fetch_backs_off_while_nothing_changes(self):
+        mocked_repo = MagicMock()
+        mocked_repo.fetch.return_value = False
+
+        with patch.multiple(
+            "gitfs.worker.fetch", fetch_successful=MagicMock(), fetch=MagicMock()
+        ):
+            worker = FetchWorker(
+                repository=mocked_repo,
+                upstream="origin",
+                credentials="credentials",
+                branch="master",
+                timeout=5,
+                idle_timeout=30,
+            )
+
+            for expected in [10, 20, 30, 30]:
+                worker.fetch()
+                assert worker.backoff.current == expected
+
+            mocked_repo.fetch.return_value = True
+            worker.fetch()
+            assert worker.backoff.current == 5
+
+    def test_fetch_backs_off_on_errors(self):
+        mocked_repo = MagicMock()
+        mocked_repo.fetch.side_effect = ValueError
+
+        with patch.multiple(
+            "gitfs.worker.fetch", fetch_successful=MagicMock(), fetch=MagicMock()
+        ):
+            worker = FetchWorker(repository=mocked_repo, timeout=5, idle_timeout=30)
+            worker.upstream = worker.branch = worker.credentials = None
+
+            worker.fetch()
+            worker.fetch()
+
+            assert worker.backoff.current == 20
+
+    def test_fetch_retries_on_a_backoff_while_in_use(self):
+        mocked_repo = MagicMock()
+        mocked_repo.fetch.side_effect = ValueError
+        mocked_idle = MagicMock()
+        mocked_idle.is_set.return_value = False
+
+        with patch.multiple(
+            "gitfs.worker.fetch",
+            fetch_successful=MagicMock(),
+            fetch=MagicMock(),
+            idle=mocked_idle,
+        ):
+            worker = FetchWorker(repository=mocked_repo, timeout=5, idle_timeout=30)
+            worker.upstream = worker.branch = worker.credentials = None
+            worker.retry_backoff.delay = MagicMock(return_value=8)
+
+            assert worker.interval() == 5
+
+            worker.fetch()
+            assert worker.interval() == 8
+            assert worker.retry_backoff.current == 10
+
+            mocked_repo.fetch.side_effect = None
+            mocked_repo.fetch.return_value = False
+            worker.fetch()
+            assert worker.interval() == 5
+            assert worker.retry_backoff.current == 5
+
+    def test_fetch_deepens_shallow_history(self):
+        mocked_repo = MagicMock(is_shallow=True)
+        mocked_deepen = MagicMock()
+        mocked_deepen.is_set.return_value = True
+        mocked_metrics = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.fetch",
+            deepen=mocked_deepen,
+            fetch_successful=MagicMock(),
+            metrics=mocked_metrics,
+        ):
+            worker = FetchWorker(
+                upstream="origin",
+                branch="main",
+                repository=mocked_repo,
+                credentials="credentials",
+                depth=10,
+            )
+            worker.fetch()
+
+            mocked_deepen.clear.assert_called_once_with()
+            mocked_repo.deepen.assert_called_once_with(
+                "origin", "main", 20, "credentials"
+            )
+            assert mocked_repo.commits.update.call_count == 1
+            assert worker.depth == 20
+            mocked_metrics.set.assert_any_call("history_depth", 20)
+
+            mocked_repo.is_shallow = False
+            worker.deepen()
+            assert mocked_repo.deepen.call_count == 1
+
+    def test_fetch_a_repository_of_a_multi_repository_mount(self):
+        mocked_repo = MagicMock(is_shallow=True)
+        mocked_remote_operation = MagicMock()
+        mocked_deepen = MagicMock()
+        lock = MagicMock()
+        deepen_request = MagicMock()
+        deepen_request.is_set.return_value = True
+
+        with patch.multiple(
+            "gitfs.worker.fetch",
+            remote_operation=mocked_remote_operation,
+            deepen=mocked_deepen,
+            fetch_successful=MagicMock(),
+            metrics=MagicMock(),
+        ):
+            worker = FetchWorker(
+                upstream="origin",
+                branch="main",
+                repository=mocked_repo,
+                credentials="credentials",
+                lock=lock,
+                deepen_request=deepen_request,
+            )
+            worker.fetch()
+
+        # its own lock and deepen request are used, not the mount-wide ones
+        assert lock.__enter__.call_count == 2
+        assert not mocked_remote_operation.__enter__.called
+        assert not mocked_deepen.is_set.called
+        deepen_request.clear.assert_called_once_with()
+        mocked_repo.deepen.assert_called_once_with("origin", "main", 2, "credentials")
+
+    def test_fetch_switches_the_head_of_a_bare_clone(self):
+        mocked_repo = MagicMock()
+        mocked_repo.fetch.return_value = True
+        mocked_repo.fast_forward.return_value = {"file"}
+        mocked_kernel_cache = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.fetch", fetch_successful=MagicMock(), metrics=MagicMock()
+        ):
+            worker = FetchWorker(
+                upstream="origin",
+                branch="main",
+                repository=mocked_repo,
+                credentials="credentials",
+                fast_forward=True,
+                kernel_cache=mocked_kernel_cache,
+            )
+            worker.fetch()
+
+        mocked_repo.fast_forward.assert_called_once_with("origin", "main")
+        mocked_repo.commits.update.assert_called_once_with()
+        mocked_kernel_cache.invalidate.assert_called_once_with({"file"})
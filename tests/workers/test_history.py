@@ -0,0 +1,33 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest.mock import MagicMock, patch
+
+from gitfs.worker.history import HistoryIndexer
+
+
+class TestHistoryIndexer:
+    def test_work(self):
+        mocked_repo = MagicMock()
+        mocked_metrics = MagicMock()
+        mocked_time = MagicMock(**{"monotonic.return_value": 15})
+
+        with patch.multiple(
+            "gitfs.worker.history", metrics=mocked_metrics, time=mocked_time
+        ):
+            HistoryIndexer(repository=mocked_repo, started=10).work()
+
+        mocked_repo.commits.update.assert_called_once_with()
+        mocked_metrics.set.assert_called_once_with("time_to_full_history", 5)
@@ -0,0 +1,198 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import subprocess
+import threading
+from unittest.mock import MagicMock, call, patch
+
+import pygit2
+
+from gitfs.worker.maintenance import MaintenanceWorker
+
+
+class TestMaintenanceWorker:
+    def test_work(self):
+        mocked_shutting_down = MagicMock()
+        mocked_shutting_down.wait.side_effect = [False, False, True]
+        mocked_shutting_down.is_set.return_value = False
+        mocked_idle = MagicMock()
+        mocked_idle.wait.side_effect = [True, False, True]
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            shutting_down=mocked_shutting_down,
+            idle=mocked_idle,
+        ):
+            worker = MaintenanceWorker(interval=600)
+            worker.maintain = MagicMock()
+            worker.work()
+
+            assert worker.maintain.call_count == 2
+            mocked_shutting_down.wait.assert_has_calls([call(600)] * 3)
+
+    def test_wait_for_idle_while_shutting_down(self):
+        mocked_shutting_down = MagicMock()
+        mocked_shutting_down.is_set.return_value = True
+        mocked_idle = MagicMock()
+        mocked_idle.wait.return_value = False
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            shutting_down=mocked_shutting_down,
+            idle=mocked_idle,
+        ):
+            assert MaintenanceWorker().wait_for_idle() is False
+
+    def test_maintain_skips_during_remote_operations(self):
+        mocked_lock = MagicMock()
+        mocked_lock.acquire.return_value = False
+
+        with patch.multiple("gitfs.worker.maintenance", remote_operation=mocked_lock):
+            worker = MaintenanceWorker()
+            worker.prune = MagicMock()
+
+            worker.maintain()
+
+            mocked_lock.acquire.assert_called_once_with(blocking=False)
+            assert not worker.prune.called
+            assert not mocked_lock.release.called
+
+    def test_maintain(self):
+        mocked_idle = MagicMock()
+        mocked_idle.is_set.return_value = True
+        mocked_shutting_down = MagicMock()
+        mocked_shutting_down.is_set.return_value = False
+
+        lock = threading.Lock()
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            idle=mocked_idle,
+            shutting_down=mocked_shutting_down,
+            remote_operation=lock,
+        ):
+            worker = MaintenanceWorker()
+            worker.prune = MagicMock()
+            worker.pack_loose_objects = MagicMock(side_effect=ValueError)
+            worker.write_commit_graph = MagicMock()
+
+            worker.maintain()
+
+            assert worker.prune.call_count == 1
+            assert worker.pack_loose_objects.call_count == 1
+            assert not worker.write_commit_graph.called
+            assert not lock.locked()
+
+    def test_maintain_stops_when_no_longer_idle(self):
+        mocked_idle = MagicMock()
+        mocked_idle.is_set.side_effect = [True, False]
+        mocked_shutting_down = MagicMock()
+        mocked_shutting_down.is_set.return_value = False
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            idle=mocked_idle,
+            shutting_down=mocked_shutting_down,
+            remote_operation=threading.Lock(),
+        ):
+            worker = MaintenanceWorker()
+            worker.prune = MagicMock()
+            worker.pack_loose_objects = MagicMock()
+
+            worker.maintain()
+
+            assert worker.prune.call_count == 1
+            assert not worker.pack_loose_objects.called
+
+    def test_pack_loose_objects_under_threshold(self):
+        mocked_repo = MagicMock()
+        worker = MaintenanceWorker(repository=mocked_repo, min_loose_objects=3)
+        worker.loose_objects = MagicMock(return_value=iter([("oid", "path")]))
+
+        worker.pack_loose_objects()
+
+        assert not mocked_repo.pack.called
+
+    def test_pack_loose_objects(self, tmp_path):
+        repo = pygit2.init_repository(str(tmp_path), bare=True)
+        oids = [repo.create_blob(f"blob {index}".encode()) for index in range(5)]
+
+        worker = MaintenanceWorker(repository=repo, min_loose_objects=5)
+        assert {oid for oid, _ in worker.loose_objects()} == set(oids)
+
+        with patch("gitfs.worker.maintenance.idle") as mocked_idle:
+            mocked_idle.is_set.return_value = True
+            worker.pack_loose_objects()
+
+        assert list(worker.loose_objects()) == []
+        assert os.listdir(os.path.join(str(tmp_path), "objects", "pack"))
+
+        reopened = pygit2.Repository(str(tmp_path))
+        for index, oid in enumerate(oids):
+            assert reopened[oid].data == f"blob {index}".encode()
+
+    def test_run_git_without_git(self):
+        mocked_subprocess = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            shutil=MagicMock(**{"which.return_value": None}),
+            subprocess=mocked_subprocess,
+        ):
+            MaintenanceWorker(repository=MagicMock()).run_git("prune")
+
+            assert not mocked_subprocess.Popen.called
+
+    def test_run_git_is_killed_when_no_longer_idle(self):
+        mocked_process = MagicMock()
+        mocked_process.wait.side_effect = [
+            subprocess.TimeoutExpired("git", 0.1),
+            None,
+        ]
+        mocked_subprocess = MagicMock(TimeoutExpired=subprocess.TimeoutExpired)
+        mocked_subprocess.Popen.return_value = mocked_process
+        mocked_idle = MagicMock()
+        mocked_idle.is_set.return_value = False
+
+        with patch.multiple(
+            "gitfs.worker.maintenance",
+            shutil=MagicMock(**{"which.return_value": "/usr/bin/git"}),
+            subprocess=mocked_subprocess,
+            idle=mocked_idle,
+        ):
+            worker = MaintenanceWorker(repository=MagicMock(path="/repo/.git/"))
+            worker.run_git("prune", "--expire=now")
+
+            mocked_subprocess.Popen.assert_called_once_with(
+                ["/usr/bin/git", "-C", "/repo/.git/", "prune", "--expire=now"],
+                stdout=mocked_subprocess.DEVNULL,
+                stderr=mocked_subprocess.DEVNULL,
+            )
+            mocked_process.kill.assert_called_once_with()
+
+    def test_git_steps(self):
+        worker = MaintenanceWorker()
+        worker.run_git = MagicMock()
+
+        worker.prune()
+        worker.write_commit_graph()
+
+        worker.run_git.assert_has_calls(
+            [
+                call("prune", "--expire=1.hour.ago"),
+                call("commit-graph", "write", "--reachable"),
+            ]
+        )
@@ -0,0 +1,173 @@
+# Copyright 2014-2016 Presslabs SRL
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+from threading import Event
+from unittest.mock import MagicMock, patch
+
+from gitfs.worker.runtime import FETCH, MAINTENANCE, SYNC, Runtime
+
+
+class TestRuntime:
+    def get_runtime(self, **kwargs):
+        sync_worker = MagicMock(timeout=0.01)
+        sync_worker.pending_jobs.return_value = []
+        fetch_worker = MagicMock(timeout=0.01)
+        fetch_worker.interval.return_value = 0.01
+        maintenance_worker = MagicMock(interval=0.01)
+
+        return Runtime(
+            sync_worker=sync_worker,
+            fetch_worker=fetch_worker,
+            maintenance_worker=maintenance_worker,
+            **kwargs,
+        )
+
+    def test_next_tick(self):
+        runtime = Runtime()
+        runtime.loop = MagicMock()
+        runtime.loop.time.return_value = 10
+
+        # ticks are kept on schedule, no matter how long the work took
+        assert runtime.next_tick(8, 5) == 13
+        # missed ticks are made up right away, once
+        assert runtime.next_tick(2, 5) == 10
+
+    def test_submit_by_priority(self):
+        runtime = self.get_runtime(max_workers=1)
+        gate = Event()
+        order = []
+
+        async def scenario():
+            runtime.prepare()
+            dispatcher = asyncio.create_task(runtime.dispatch())
+
+            busy = asyncio.create_task(runtime.submit(SYNC, "busy", gate.wait))
+            await asyncio.sleep(0.01)
+
+            jobs = [
+                asyncio.create_task(
+                    runtime.submit(priority, name, lambda name=name: order.append(name))
+                )
+                for priority, name in [(MAINTENANCE, "maintenance"), (FETCH, "fetch")]
+            ]
+            await asyncio.sleep(0.01)
+            gate.set()
+
+            results = await asyncio.gather(busy, *jobs)
+            dispatcher.cancel()
+            runtime.executor.shutdown()
+            runtime.waiters.shutdown()
+            return results
+
+        assert asyncio.run(scenario()) == [True, True, True]
+        assert order == ["fetch", "maintenance"]
+
+    def test_submit_after_deadline(self):
+        runtime = self.get_runtime()
+        job = MagicMock()
+        mocked_metrics = MagicMock()
+
+        async def scenario():
+            runtime.prepare()
+            dispatcher = asyncio.create_task(runtime.dispatch())
+
+            deadline = runtime.loop.time() - 1
+            result = await runtime.submit(FETCH, "fetch", job, deadline=deadline)
+
+            dispatcher.cancel()
+            runtime.executor.shutdown()
+            runtime.waiters.shutdown()
+            return result
+
+        with patch("gitfs.worker.runtime.metrics", mocked_metrics):
+            assert asyncio.run(scenario()) is False
+
+        assert not job.called
+        mocked_metrics.increment.assert_called_once_with("expired_jobs")
+
+    def test_failing_job(self):
+        runtime = self.get_runtime()
+
+        async def scenario():
+            runtime.prepare()
+            dispatcher = asyncio.create_task(runtime.dispatch())
+
+            result = await runtime.submit(SYNC, "sync", MagicMock(side_effect=OSError))
+
+            dispatcher.cancel()
+            runtime.executor.shutdown()
+            runtime.waiters.shutdown()
+            return result
+
+        # the job ran, even if it didn't go well
+        assert asyncio.run(scenario()) is True
+
+    def test_run_and_shutdown(self):
+        mocked_shutting_down = Event()
+        mocked_fetch = Event()
+        mocked_idle = Event()
+        mocked_idle.set()
+
+        runtime = self.get_runtime()
+        runtime.sync_worker.rest.side_effect = lambda: mocked_shutting_down.set()
+
+        with patch.multiple(
+            "gitfs.worker.runtime",
+            shutting_down=mocked_shutting_down,
+            fetch=mocked_fetch,
+            idle=mocked_idle,
+        ):
+            runtime.start()
+            assert mocked_shutting_down.wait(1)
+            mocked_fetch.set()
+            runtime.join(1)
+
+        assert not runtime.is_alive()
+        assert runtime.sync_worker.rest.call_count == 1
+        runtime.sync_worker.flush.assert_called_once_with()
+
+    def test_fetch_workers_of_a_multi_repository_mount(self):
+        mocked_shutting_down = Event()
+        fetched = []
+
+        def get_fetch_worker(name):
+            worker = MagicMock(timeout=0.1)
+            worker.interval.return_value = 0.1
+
+            def fetch():
+                fetched.append(name)
+                if len(fetched) == 4:
+                    mocked_shutting_down.set()
+
+            worker.fetch.side_effect = fetch
+            return worker
+
+        runtime = Runtime(
+            fetch_workers=[get_fetch_worker("one"), get_fetch_worker("two")]
+        )
+
+        with patch.multiple(
+            "gitfs.worker.runtime",
+            shutting_down=mocked_shutting_down,
+            idle=Event(),
+        ):
+            runtime.start()
+            assert mocked_shutting_down.wait(1)
+            runtime.join(1)
+
+        assert not runtime.is_alive()
+        # spread over their period, so they take turns
+        assert fetched[:4] == ["one", "two", "one", "two"]
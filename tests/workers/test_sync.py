@@ -11,13 +11,26 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import time
 from queue import Empty
+from threading import Event, Thread
 from unittest.mock import MagicMock, call, patch
 
 import pygit2
 import pytest
 from pygit2 import GitError
 
+from gitfs.cache import CachedIgnore
+from gitfs.events.state import (
+    COLLECTING,
+    DEGRADED,
+    IDLE,
+    SyncState,
+)
+from gitfs.metrics import Metrics
+from gitfs.repository import Repository
+from gitfs.views.current import CurrentView
+from gitfs.worker.commit_queue import CommitQueue
 from gitfs.worker.sync import SyncWorker
 
 
@@ -46,27 +59,110 @@ class TestSyncWorker:
         mocked_queue.get.assert_called_once_with(timeout=1, block=True)
         assert mocked_idle.call_count == 1
 
+    def test_work_collects_jobs(self):
+        mocked_queue = MagicMock()
+        mocked_queue.get.side_effect = [{"type": "commit"}, ValueError]
+        state = SyncState()
+
+        worker = SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            strategy="strategy",
+            commit_queue=mocked_queue,
+            state=state,
+            timeout=1,
+            min_idle_times=1,
+        )
+
+        with pytest.raises(ValueError):
+            worker.work()
+
+        assert worker.commits == [{"type": "commit"}]
+        assert state.state == COLLECTING
+
+    def test_collect_after_going_idle(self):
+        mocked_fetch = MagicMock()
+        mocked_idle = MagicMock()
+
+        with patch.multiple("gitfs.worker.sync", fetch=mocked_fetch, idle=mocked_idle):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                min_idle_times=1,
+                state=SyncState(),
+            )
+            worker.on_idle = MagicMock()
+
+            worker.rest()
+            worker.rest()
+            assert worker.idle_times == 2
+            assert not mocked_idle.set.called
+
+            worker.rest()
+            mocked_idle.set.assert_called_once_with()
+            assert worker.on_idle.call_count == 3
+
+            worker.collect({"type": "commit"})
+            mocked_fetch.set.assert_called_once_with()
+            mocked_idle.clear.assert_called_once_with()
+            assert worker.idle_times == 0
+            assert worker.commits == [{"type": "commit"}]
+
+    def test_pending_jobs(self):
+        queue = CommitQueue()
+        queue.commit(add=["a"], message="Add a")
+        queue.commit(add=["b"], message="Add b")
+
+        worker = SyncWorker(
+            "name", "email", "name", "email", strategy="strategy", commit_queue=queue
+        )
+
+        jobs = worker.pending_jobs()
+        assert [job["params"]["message"] for job in jobs] == ["Add a", "Add b"]
+        assert worker.pending_jobs() == []
+
     def test_on_idle_with_commits_and_merges(self):
         mocked_sync = MagicMock()
-        mocked_syncing = MagicMock()
         mocked_commit = MagicMock()
+        state = SyncState()
 
-        mocked_syncing.is_set.return_value = False
+        worker = SyncWorker(
+            "name", "email", "name", "email", strategy="strategy", state=state
+        )
+        worker.commits = "commits"
+        worker.commit = mocked_commit
+        worker.sync = mocked_sync
+        worker.update_backlog = MagicMock()
 
-        with patch.multiple(
-            "gitfs.worker.sync", syncing=mocked_syncing, writers=MagicMock(value=0)
-        ):
-            worker = SyncWorker("name", "email", "name", "email", strategy="strategy")
-            worker.commits = "commits"
-            worker.commit = mocked_commit
-            worker.sync = mocked_sync
+        commits = worker.on_idle()
+
+        mocked_commit.assert_called_once_with("commits")
+        assert mocked_sync.call_count == 1
+        assert commits is None
+        # writers stay held back until the sync lets them through
+        assert state.holding
+
+    def test_on_idle_waits_for_writers(self):
+        state = SyncState()
+        state.begin_write()
+
+        worker = SyncWorker(
+            "name", "email", "name", "email", strategy="strategy", state=state
+        )
+        worker.commits = ["job"]
+        worker.commit = MagicMock()
+        worker.sync = MagicMock()
 
-            commits = worker.on_idle()
+        worker.on_idle()
 
-            mocked_commit.assert_called_once_with("commits")
-            assert mocked_syncing.set.call_count == 1
-            assert mocked_sync.call_count == 1
-            assert commits is None
+        assert not worker.commit.called
+        assert not worker.sync.called
+        assert not state.holding
 
     def test_merge(self):
         mocked_strategy = MagicMock()
@@ -88,6 +184,66 @@ class TestSyncWorker:
 
         mocked_strategy.assert_called_once_with(branch, branch, upstream)
         assert mocked_repo.commits.update.call_count == 1
+        assert mocked_repo.changed_paths.call_count == 0
+
+    def test_merge_collects_changed_paths(self):
+        mocked_repo = MagicMock()
+        mocked_repo.head.target = "old"
+        mocked_repo.remote_head.return_value.id = "remote"
+        mocked_repo.changed_paths.side_effect = [{"a", "b"}, {"b", "c"}]
+
+        def merge(*args):
+            mocked_repo.head.target = "new"
+
+        worker = SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            strategy=MagicMock(side_effect=merge),
+            repository=mocked_repo,
+            upstream="origin",
+            branch="main",
+            kernel_cache=MagicMock(),
+        )
+        worker.merge()
+
+        mocked_repo.changed_paths.assert_has_calls(
+            [call("old", "remote"), call("old", "new")]
+        )
+        assert worker.changed_paths == {"a", "b", "c"}
+
+    def test_sync_invalidates_kernel_cache_after_writers_are_released(self):
+        mocked_repo = MagicMock()
+        mocked_repo.behind = False
+        mocked_repo.ahead.return_value = False
+        mocked_kernel_cache = MagicMock()
+        state = SyncState()
+        state.hold_writers()
+
+        def invalidate(paths):
+            assert not state.holding
+
+        mocked_kernel_cache.invalidate.side_effect = invalidate
+
+        worker = SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            strategy="strategy",
+            repository=mocked_repo,
+            upstream="origin",
+            branch="main",
+            kernel_cache=mocked_kernel_cache,
+            state=state,
+        )
+        worker.changed_paths = {"file"}
+
+        assert worker.sync() is True
+
+        mocked_kernel_cache.invalidate.assert_called_once_with({"file"})
+        assert worker.changed_paths == set()
 
     def test_sync(self):
         upstream = "origin"
@@ -95,19 +251,17 @@ class TestSyncWorker:
         credentials = "credentials"
         mocked_repo = MagicMock()
         mocked_merge = MagicMock()
-        mocked_sync_done = MagicMock()
-        mocked_syncing = MagicMock()
         mocked_push_successful = MagicMock()
         mocked_fetch = MagicMock()
         mocked_strategy = MagicMock()
+        state = SyncState()
+        state.hold_writers()
 
         mocked_repo.behind = True
         mocked_push_successful.set.side_effect = ValueError
 
         with patch.multiple(
             "gitfs.worker.sync",
-            sync_done=mocked_sync_done,
-            syncing=mocked_syncing,
             push_successful=mocked_push_successful,
             fetch=mocked_fetch,
         ):
@@ -121,15 +275,15 @@ class TestSyncWorker:
                 credentials=credentials,
                 upstream=upstream,
                 branch=branch,
+                state=state,
             )
             worker.merge = mocked_merge
 
             worker.sync()
 
-            assert mocked_syncing.clear.call_count == 1
+            assert not state.holding
+            assert state.state == DEGRADED
             assert mocked_push_successful.clear.call_count == 1
-            assert mocked_sync_done.clear.call_count == 1
-            assert mocked_sync_done.set.call_count == 1
             assert mocked_fetch.set.call_count == 1
             assert mocked_push_successful.set.call_count == 1
             assert mocked_repo.behind is False
@@ -141,11 +295,13 @@ class TestSyncWorker:
         credentials = "credentials"
         mocked_repo = MagicMock()
         mocked_merge = MagicMock()
-        mocked_sync_done = MagicMock()
-        mocked_syncing = MagicMock()
         mocked_push_successful = MagicMock()
         mocked_fetch = MagicMock()
         mocked_strategy = MagicMock()
+        state = SyncState()
+        state.hold_writers()
+        transitions = []
+        state.add_listener(lambda previous, current: transitions.append(current))
 
         mocked_repo.behind = True
         mocked_repo.ahead = MagicMock(1)
@@ -153,8 +309,6 @@ class TestSyncWorker:
 
         with patch.multiple(
             "gitfs.worker.sync",
-            sync_done=mocked_sync_done,
-            syncing=mocked_syncing,
             push_successful=mocked_push_successful,
             fetch=mocked_fetch,
         ):
@@ -168,16 +322,23 @@ class TestSyncWorker:
                 credentials=credentials,
                 upstream=upstream,
                 branch=branch,
+                state=state,
             )
             worker.merge = mocked_merge
 
             while not worker.sync():
-                pass
-
-            assert mocked_syncing.clear.call_count == 1
+                assert state.holding
+
+            assert not state.holding
+            assert transitions == [
+                "merging",
+                "pushing",
+                "degraded",
+                "merging",
+                "pushing",
+                "idle",
+            ]
             assert mocked_push_successful.clear.call_count == 1
-            assert mocked_sync_done.clear.call_count == 2
-            assert mocked_sync_done.set.call_count == 1
             assert mocked_fetch.set.call_count == 1
             assert mocked_push_successful.set.call_count == 1
             assert mocked_repo.behind is False
@@ -266,3 +427,513 @@ class TestSyncWorker:
             mocked_queue.get.assert_called_once_with(timeout=1, block=True)
             assert mocked_idle_event.set.call_count == 1
             assert mocked_idle.call_count == 1
+
+    def test_wake_up_fetcher_when_writes_resume(self):
+        mocked_queue = MagicMock()
+        mocked_fetch = MagicMock()
+        mocked_idle = MagicMock()
+
+        jobs = [Empty(), Empty(), {"type": "commit"}, {"type": "commit"}]
+
+        def get(**kwargs):
+            if not jobs:
+                raise ValueError
+            job = jobs.pop(0)
+            if isinstance(job, Exception):
+                raise job
+            return job
+
+        mocked_queue.get.side_effect = get
+
+        with patch.multiple("gitfs.worker.sync", idle=MagicMock(), fetch=mocked_fetch):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                commit_queue=mocked_queue,
+            )
+            worker.on_idle = mocked_idle
+            worker.timeout = 1
+            worker.min_idle_times = 0
+
+            with pytest.raises(ValueError):
+                worker.work()
+
+            assert mocked_fetch.set.call_count == 1
+            assert len(worker.commits) == 2
+
+    def test_push_due(self):
+        worker = SyncWorker(
+            "name", "email", "name", "email", strategy="strategy", push_interval=10
+        )
+        assert worker.push_due()
+
+        with patch.multiple(
+            "gitfs.worker.sync",
+            flush=MagicMock(**{"is_set.return_value": False}),
+            time=MagicMock(**{"monotonic.return_value": 105}),
+        ):
+            worker.first_pending, worker.last_pending = 90, 100
+            assert not worker.push_due()
+
+            worker.last_pending = 95
+            assert worker.push_due()
+
+            worker.last_pending, worker.push_delay = 100, 15
+            assert worker.push_due()
+
+    def test_push_due_on_flush(self):
+        worker = SyncWorker(
+            "name", "email", "name", "email", strategy="strategy", push_interval=10
+        )
+        worker.first_pending = worker.last_pending = time.monotonic()
+
+        with patch("gitfs.worker.sync.flush") as mocked_flush:
+            mocked_flush.is_set.return_value = True
+            assert worker.push_due()
+
+    def test_fsync_pushes_before_the_push_interval(self):
+        mocked_repo = MagicMock()
+        mocked_repo.behind = False
+        mocked_repo.ahead.return_value = True
+        mocked_flush = Event()
+
+        current = CurrentView(
+            repo="repo", uid=1, gid=1, repo_path="repo_path", ignore=CachedIgnore()
+        )
+        current._stage = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.sync",
+            flush=mocked_flush,
+            push_successful=MagicMock(),
+            metrics=MagicMock(),
+        ):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                repository=mocked_repo,
+                strategy="strategy",
+                credentials="credentials",
+                upstream="origin",
+                branch="main",
+                state=SyncState(),
+                push_interval=60,
+            )
+            worker.first_pending = worker.last_pending = time.monotonic()
+
+            assert worker.sync()
+            assert not mocked_repo.push.called
+
+            with (
+                patch("gitfs.views.current.flush", mocked_flush),
+                patch("gitfs.views.passthrough.os"),
+            ):
+                current.fsync("/path", False, 1)
+
+            assert worker.sync()
+            mocked_repo.push.assert_called_once_with("origin", "main", "credentials")
+            assert not mocked_flush.is_set()
+
+    def test_sync_holds_back_the_push(self):
+        mocked_repo = MagicMock()
+        mocked_repo.behind = False
+        mocked_repo.ahead.return_value = True
+        mocked_metrics = MagicMock()
+
+        with patch.multiple("gitfs.worker.sync", metrics=mocked_metrics):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                repository=mocked_repo,
+                strategy="strategy",
+                upstream="origin",
+                branch="main",
+                state=SyncState(),
+            )
+            worker.first_pending = worker.last_pending = 1
+            worker.push_due = MagicMock(return_value=False)
+
+            assert worker.sync()
+            # commits are still waiting to be pushed
+            assert worker.state.state == COLLECTING
+
+            assert not mocked_repo.push.called
+            mocked_metrics.increment.assert_called_once_with("deferred_pushes")
+
+    def test_sync_pushes_merges_right_away(self):
+        mocked_repo = MagicMock()
+        mocked_repo.behind = True
+        mocked_metrics = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.sync",
+            push_successful=MagicMock(),
+            flush=MagicMock(),
+            metrics=mocked_metrics,
+        ):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                repository=mocked_repo,
+                strategy="strategy",
+                credentials="credentials",
+                upstream="origin",
+                branch="main",
+                state=SyncState(),
+            )
+            worker.merge = MagicMock()
+            worker.push_due = MagicMock(return_value=False)
+            worker.first_pending = worker.last_pending = 1
+
+            assert worker.sync()
+
+            mocked_repo.push.assert_called_once_with("origin", "main", "credentials")
+            mocked_metrics.increment.assert_called_once_with("pushes")
+            assert worker.first_pending is None
+
+    def test_flush_on_shutdown(self):
+        mocked_queue = MagicMock()
+        mocked_queue.get.side_effect = [
+            {"type": "commit", "params": {"message": "message"}},
+            Empty(),
+        ]
+        mocked_flush = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.sync",
+            shutting_down=MagicMock(**{"is_set.return_value": True}),
+            flush=mocked_flush,
+        ):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                commit_queue=mocked_queue,
+            )
+
+            def commit(jobs):
+                assert len(jobs) == 1
+                worker.first_pending = worker.last_pending = 1
+
+            worker.commit = MagicMock(side_effect=commit)
+            worker.sync = MagicMock(return_value=True)
+
+            worker.work()
+
+            assert worker.commit.call_count == 1
+            assert worker.commits == []
+            mocked_flush.set.assert_called_once_with()
+            worker.sync.assert_called_once_with()
+
+    def test_flush_without_pending_commits(self):
+        mocked_queue = MagicMock()
+        mocked_queue.get.side_effect = Empty()
+
+        worker = SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            strategy="strategy",
+            commit_queue=mocked_queue,
+        )
+        worker.sync = MagicMock()
+
+        worker.flush()
+
+        assert not worker.sync.called
+
+    def get_in_memory_worker(self, mocked_repo, **kwargs):
+        mocked_strategy = MagicMock(in_memory=True)
+        return SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            repository=mocked_repo,
+            strategy=mocked_strategy,
+            upstream="origin",
+            branch="main",
+            timeout=1,
+            state=SyncState(),
+            **kwargs,
+        )
+
+    def test_on_idle_releases_writers_for_in_memory_merges(self):
+        worker = self.get_in_memory_worker(MagicMock())
+        worker.commit = MagicMock()
+        worker.commits = ["job"]
+        worker.update_backlog = MagicMock()
+
+        def sync():
+            # writers were let through once the commit was made
+            assert not worker.state.holding
+            return True
+
+        worker.sync = MagicMock(side_effect=sync)
+
+        worker.on_idle()
+
+        worker.commit.assert_called_once_with(["job"])
+        assert worker.sync.call_count == 1
+
+    def test_merge_in_memory_holds_writers_only_while_applying(self):
+        mocked_repo = MagicMock()
+        mocked_repo.dirty_paths.return_value = {"dirty"}
+
+        worker = self.get_in_memory_worker(mocked_repo)
+        strategy = worker.strategy
+
+        def merged_commit(*args):
+            assert not worker.state.holding
+            return "merged"
+
+        def apply(*args, **kwargs):
+            assert worker.state.holding
+
+        strategy.merged_commit.side_effect = merged_commit
+        strategy.apply.side_effect = apply
+
+        worker.merge()
+
+        strategy.merged_commit.assert_called_once_with("main", "main", "origin")
+        strategy.apply.assert_called_once_with("main", "merged", keep={"dirty"})
+        assert not strategy.called
+        assert not worker.state.holding
+
+    def test_hold_writers_times_out(self):
+        worker = self.get_in_memory_worker(MagicMock())
+        worker.timeout = 0.01
+        worker.state.begin_write()
+
+        with pytest.raises(TimeoutError):
+            with worker.hold_writers():
+                pass
+
+        assert not worker.state.holding
+
+    def test_sync_in_memory_leaves_writers_alone(self):
+        mocked_repo = MagicMock()
+        mocked_repo.behind = False
+        mocked_repo.ahead.return_value = False
+
+        worker = self.get_in_memory_worker(mocked_repo)
+
+        assert worker.sync()
+        assert not worker.state.holding
+        assert worker.state.state == IDLE
+
+    def test_on_idle_in_local_first_mode(self):
+        worker = SyncWorker(
+            "name",
+            "email",
+            "name",
+            "email",
+            strategy="strategy",
+            local_first=True,
+            state=SyncState(),
+        )
+        worker.sync_with_backoff = MagicMock()
+        worker.sync_with_retries = MagicMock()
+        worker.update_backlog = MagicMock()
+
+        worker.on_idle()
+
+        assert worker.sync_with_backoff.call_count == 1
+        assert not worker.sync_with_retries.called
+        assert worker.update_backlog.call_count == 1
+
+    def test_sync_with_retries_stops_on_shutdown(self):
+        mocked_shutting_down = MagicMock()
+        mocked_shutting_down.wait.return_value = True
+
+        with patch("gitfs.worker.sync.shutting_down", mocked_shutting_down):
+            worker = SyncWorker("name", "email", "name", "email", strategy="strategy")
+            worker.sync = MagicMock(return_value=False)
+
+            worker.sync_with_retries()
+
+            assert worker.sync.call_count == 1
+            assert mocked_shutting_down.wait.call_count == 1
+
+    def test_sync_with_backoff(self):
+        mocked_time = MagicMock()
+        mocked_time.monotonic.return_value = 100
+        state = SyncState()
+        state.hold_writers()
+
+        with patch.multiple("gitfs.worker.sync", time=mocked_time):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                timeout=5,
+                state=state,
+            )
+            worker.sync = MagicMock(return_value=False)
+
+            with patch("gitfs.utils.backoff.random") as mocked_random:
+                mocked_random.uniform.return_value = 1
+                worker.sync_with_backoff()
+
+            assert worker.next_sync == 105
+            assert worker.retry_backoff.current == 10
+            assert not state.holding
+
+            # too early for another attempt
+            worker.sync_with_backoff()
+            assert worker.sync.call_count == 1
+
+            mocked_time.monotonic.return_value = 106
+            worker.sync.return_value = True
+            worker.sync_with_backoff()
+
+            assert worker.sync.call_count == 2
+            assert worker.next_sync == 0
+            assert worker.retry_backoff.current == 5
+
+    def test_writes_go_through_while_backing_off(self):
+        mocked_time = MagicMock()
+        mocked_time.monotonic.return_value = 100
+        state = SyncState()
+
+        with patch.multiple("gitfs.worker.sync", time=mocked_time):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                local_first=True,
+                timeout=5,
+                state=state,
+            )
+            worker.sync = MagicMock(return_value=False)
+            worker.commit = MagicMock()
+            worker.update_backlog = MagicMock()
+
+            worker.on_idle()
+            assert worker.sync.call_count == 1
+
+            # within the backoff window, the commits are still made
+            worker.commits = [{"type": "commit"}]
+            worker.on_idle()
+
+            assert worker.sync.call_count == 1
+            worker.commit.assert_called_once_with([{"type": "commit"}])
+            assert not state.holding
+            assert state.state == DEGRADED
+
+            writer = Thread(target=state.begin_write)
+            writer.start()
+            writer.join(1)
+            assert not writer.is_alive()
+            assert state.writers == 1
+
+    def test_update_backlog(self):
+        mocked_repo = MagicMock()
+        mocked_repo.unpushed_commits.return_value = 3
+        mocked_read_only = MagicMock()
+        mocked_read_only.is_set.return_value = False
+        mocked_metrics = MagicMock()
+
+        with patch.multiple(
+            "gitfs.worker.sync", read_only=mocked_read_only, metrics=mocked_metrics
+        ):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                repository=mocked_repo,
+                upstream="origin",
+                branch="main",
+                max_unpushed_commits=3,
+            )
+
+            worker.update_backlog()
+
+            mocked_repo.unpushed_commits.assert_called_once_with("origin", "main")
+            mocked_metrics.set.assert_called_once_with("unpushed_commits", 3)
+            mocked_read_only.set.assert_called_once_with()
+
+            mocked_repo.unpushed_commits.return_value = 2
+            worker.update_backlog()
+
+            mocked_read_only.clear.assert_called_once_with()
+
+    def test_local_first_while_remote_is_unreachable(self, tmp_path):
+        signature = pygit2.Signature("name", "email")
+        remote_path = tmp_path / "remote.git"
+        remote = pygit2.init_repository(str(remote_path), bare=True)
+        builder = remote.TreeBuilder()
+        builder.insert("file", remote.create_blob(b"base"), pygit2.GIT_FILEMODE_BLOB)
+        remote.create_commit(
+            "refs/heads/master", signature, signature, "base", builder.write(), []
+        )
+
+        repository = Repository.clone(str(remote_path), str(tmp_path / "local"))
+        (tmp_path / "local" / "file").write_bytes(b"local")
+        repository.index.add("file")
+        repository.index.write()
+        repository.commit("Update file", ("name", "email"), ("name", "email"))
+
+        events = {
+            name: Event() for name in ["push_successful", "fetch", "flush", "read_only"]
+        }
+        metrics = Metrics()
+        state = SyncState()
+
+        with patch.multiple("gitfs.worker.sync", metrics=metrics, **events):
+            worker = SyncWorker(
+                "name",
+                "email",
+                "name",
+                "email",
+                strategy="strategy",
+                repository=repository,
+                upstream="origin",
+                branch="master",
+                credentials=None,
+                timeout=1,
+                local_first=True,
+                max_unpushed_commits=2,
+                state=state,
+            )
+
+            state.hold_writers()
+            remote_path.rename(tmp_path / "unreachable.git")
+            worker.sync_with_backoff()
+            worker.update_backlog()
+
+            assert worker.next_sync > 0
+            assert not events["push_successful"].is_set()
+            assert not state.holding
+            assert state.state == DEGRADED
+            assert metrics.get("failed_pushes") == 1
+            assert metrics.get("unpushed_commits") == 1
+            assert not events["read_only"].is_set()
+
+            (tmp_path / "unreachable.git").rename(remote_path)
+            worker.next_sync = 0
+            worker.sync_with_backoff()
+            worker.update_backlog()
+
+            assert events["push_successful"].is_set()
+            assert state.state == IDLE
+            assert metrics.get("unpushed_commits") == 0
+            assert remote.head.target == repository.head.target